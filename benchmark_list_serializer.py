@@ -0,0 +1,60 @@
+import os
+import time
+import django
+
+# Set up Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from rest_framework.renderers import JSONRenderer
+from todo_sql.models import Note, Label, ChecklistItem
+from todo_sql.serializers import NoteSerializer, NoteListSerializer
+
+RUNS = 20
+
+def prepare(user, num_notes):
+    labels = [Label.objects.create(user=user, name=f"Label {i}") for i in range(3)]
+    notes = Note.objects.bulk_create([
+        Note(user=user, title=f"Note {i}", content="Lorem ipsum " * 10, is_checklist=i % 2 == 0)
+        for i in range(num_notes)
+    ])
+    Note.labels.through.objects.bulk_create([
+        Note.labels.through(note_id=note.id, label_id=labels[i % 3].id) for i, note in enumerate(notes)
+    ])
+    ChecklistItem.objects.bulk_create([
+        ChecklistItem(note=note, text=f"Item {j}", order=j) for note in notes if note.is_checklist for j in range(5)
+    ])
+
+def measure(render):
+    render()  # Warm up
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        render()
+    return (time.perf_counter() - start) / RUNS
+
+def benchmark_list_serializer(page_size):
+    user = User.objects.create_user(username='bench_list_serializer', password='password')
+    prepare(user, page_size)
+    queryset = Note.objects.filter(user=user)
+    renderer = JSONRenderer()
+
+    def drf():
+        notes = queryset.prefetch_related('labels', 'checklist_items')[:page_size]
+        return renderer.render(NoteSerializer(notes, many=True).data)
+
+    def fast():
+        rows = NoteListSerializer.prepare(queryset)[:page_size]
+        return renderer.render(NoteListSerializer(rows).data)
+
+    assert drf() == fast(), "JSON differs"
+    drf_time, fast_time = measure(drf), measure(fast)
+    print(f"{page_size:>5} notes: NoteSerializer {drf_time * 1000:8.2f} ms | "
+          f"NoteListSerializer {fast_time * 1000:8.2f} ms | x{drf_time / fast_time:.1f}")
+
+    # Clean up
+    user.delete()
+
+if __name__ == "__main__":
+    for size in (12, 100, 1000):
+        benchmark_list_serializer(size)
@@ -0,0 +1,99 @@
+"""
+Пропускная способность записи SQLite при нескольких воркерах: стандартные
+настройки (SQLITE_TUNING=False) против профиля из todo_sql/sqlite_tuning.py.
+
+Каждый процесс, как воркер gunicorn с автосохранением, в цикле читает свою
+заметку и сохраняет ее (транзакция "прочитать и записать"). Считаются
+успешные записи и ошибки "database is locked".
+
+    python benchmark_sqlite_concurrency.py [--workers 3] [--seconds 5]
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def worker(env, seconds, start_at, results):
+    os.environ.update(env)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.db import OperationalError
+    from todo_sql.models import Note
+    from todo_sql.sqlite_tuning import is_lock_error, write_transaction
+
+    user = User.objects.create(username=f'bench_{os.getpid()}')
+    note_id = Note.objects.create(user=user, title='Benchmark', content='').pk
+
+    @write_transaction
+    def autosave(i):
+        note = Note.objects.get(pk=note_id)
+        note.content = f'{note.content[-1000:]} {i}'
+        note.save(update_fields=['content', 'updated_at'])
+
+    writes = errors = 0
+    latencies = []
+    time.sleep(max(0, start_at - time.time()))
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            autosave(writes + errors)
+        except OperationalError as exc:
+            if not is_lock_error(exc):
+                raise
+            errors += 1
+        else:
+            writes += 1
+            latencies.append(time.perf_counter() - started)
+    results.put((writes, errors, latencies))
+
+
+def run(tuning, workers, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            'SQLITE_TUNING': str(tuning),
+            'DB_ENGINE': 'django.db.backends.sqlite3',
+            'DB_NAME': os.path.join(directory, 'bench.sqlite3'),
+            'SECRET_KEY': os.getenv('SECRET_KEY', 'benchmark'),
+        }
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '-v0'],
+            cwd=BASE_DIR, env={**os.environ, **env}, check=True,
+        )
+
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        start_at = time.time() + 3
+        processes = [context.Process(target=worker, args=(env, seconds, start_at, results)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    writes = sum(total[0] for total in totals)
+    errors = sum(total[1] for total in totals)
+    latencies = sorted(latency for total in totals for latency in total[2])
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    print(
+        f"{'Профиль' if tuning else 'Стандарт'}: {writes / seconds:.0f} записей/с, "
+        f"ошибок блокировки: {errors}, p95: {p95:.1f} мс"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+    run(False, args.workers, args.seconds)
+    run(True, args.workers, args.seconds)
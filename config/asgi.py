@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Production runs on it (uvicorn worker), so the push channel in
+``todo_sql.views.note_events`` can hold connections without blocking a worker.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
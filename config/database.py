@@ -0,0 +1,109 @@
+"""
+settings.DATABASES['default'] из переменных окружения.
+
+PostgreSQL (DB_ENGINE=django.db.backends.postgresql, нужен psycopg[binary,pool]):
+- по умолчанию пул psycopg (DB_POOL=True). Под ASGI (deploy/gunicorn.service)
+  у каждого запроса свой контекст и свое соединение, поэтому постоянные
+  соединения (CONN_MAX_AGE) там не переиспользуются, а пул переиспользуется.
+  Размер пула — на один воркер (`pool_options`);
+- DB_POOL=False — постоянные соединения на DB_CONN_MAX_AGE секунд (для WSGI);
+- в обоих случаях CONN_HEALTH_CHECKS: соединение, оборванное сервером,
+  заменяется новым до первого запроса, а не падает на нем.
+
+SQLite: транзакции BEGIN IMMEDIATE, если включен профиль из todo_sql/sqlite_tuning.py.
+
+Реплики для чтения (`replicas`, маршрутизация — todo_sql/replicas.py):
+DB_REPLICAS=host1,host2:5433 для PostgreSQL или пути к файлам для SQLite.
+Остальные настройки реплики — как у основной базы.
+
+Шарды (`shards`, маршрутизация — todo_sql/shards.py): DB_SHARDS в том же
+формате, что DB_REPLICAS. Каждый шард — отдельная база со своей схемой
+(manage.py migrate --database shard_N).
+"""
+SQLITE = 'django.db.backends.sqlite3'
+POSTGRESQL = 'django.db.backends.postgresql'
+
+# Потоков фоновых задач в воркере (todo_sql/tasks.py): каждому нужно свое соединение
+TASK_THREADS = 2
+# Одновременных запросов на воркер, на которые по умолчанию рассчитан пул под ASGI
+ASGI_REQUESTS = 10
+
+
+def _int(env, name, default):
+    value = env.get(name)
+    return int(value) if value else default
+
+
+def pool_options(env):
+    """
+    Размер пула на один воркер. Соединение нужно каждому выполняющемуся запросу
+    и каждому потоку фоновых задач, плюс одно в запас. Под ASGI Django выполняет
+    каждый синхронный запрос в своем потоке (ThreadSensitiveContext) со своим
+    соединением, так что одновременных запросов столько, сколько пришло:
+    DB_POOL_REQUESTS — на сколько из них рассчитан пул (по умолчанию ASGI_REQUESTS,
+    под WSGI — GUNICORN_THREADS). Остальные ждут соединение DB_POOL_TIMEOUT секунд.
+    Push-канал соединение на время потока не держит (todo_sql/views.py).
+    DB_MAX_CONNECTIONS — сколько соединений PostgreSQL (max_connections за
+    вычетом служебных) отдано приложению: делится на WEB_CONCURRENCY воркеров,
+    чтобы все пулы вместе не превысили лимит.
+    """
+    workers = _int(env, 'WEB_CONCURRENCY', 1)
+    requests = _int(env, 'DB_POOL_REQUESTS', _int(env, 'GUNICORN_THREADS', ASGI_REQUESTS))
+    max_size = _int(env, 'DB_POOL_MAX_SIZE', requests + TASK_THREADS + 1)
+    budget = _int(env, 'DB_MAX_CONNECTIONS', 0)
+    if budget:
+        max_size = min(max_size, max(1, budget // workers))
+    return {
+        'min_size': min(_int(env, 'DB_POOL_MIN_SIZE', 1), max_size),
+        'max_size': max_size,
+        # Сколько секунд запрос ждет свободное соединение, прежде чем упасть
+        'timeout': float(env.get('DB_POOL_TIMEOUT') or 10),
+        # Простаивающие сверх min_size соединения закрываются
+        'max_idle': float(env.get('DB_POOL_MAX_IDLE') or 300),
+    }
+
+
+def build(env, base_dir, sqlite_tuning=True):
+    engine = env.get('DB_ENGINE') or SQLITE
+    config = {'ENGINE': engine, 'NAME': env.get('DB_NAME') or base_dir / 'db.sqlite3'}
+    for key in ('USER', 'PASSWORD', 'HOST', 'PORT'):
+        if env.get(f'DB_{key}'):
+            config[key] = env[f'DB_{key}']
+
+    if engine == SQLITE and sqlite_tuning:
+        config['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+    elif engine == POSTGRESQL:
+        config['CONN_HEALTH_CHECKS'] = True
+        if env.get('DB_POOL', 'True') == 'True':
+            # Соединения держит пул; Django с пулом требует CONN_MAX_AGE=0
+            config['CONN_MAX_AGE'] = 0
+            config['OPTIONS'] = {'pool': pool_options(env)}
+        else:
+            config['CONN_MAX_AGE'] = _int(env, 'DB_CONN_MAX_AGE', 600)
+    return config
+
+
+def _copies(env, variable, prefix, primary):
+    """Алиасы prefix_1, prefix_2, ... с настройками основной базы и своим адресом."""
+    result = {}
+    locations = [location.strip() for location in (env.get(variable) or '').split(',') if location.strip()]
+    for index, location in enumerate(locations, 1):
+        config = {**primary}
+        if primary['ENGINE'] == SQLITE:
+            config['NAME'] = location
+        else:
+            config['HOST'], _, port = location.partition(':')
+            if port:
+                config['PORT'] = port
+        # В тестах — та же тестовая база, что и основная
+        config['TEST'] = {'MIRROR': 'default'}
+        result[f'{prefix}_{index}'] = config
+    return result
+
+
+def replicas(env, primary):
+    return _copies(env, 'DB_REPLICAS', 'replica', primary)
+
+
+def shards(env, primary):
+    return _copies(env, 'DB_SHARDS', 'shard', primary)
@@ -3,6 +3,7 @@ import os
 import sys
 from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
+from config import database
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -51,10 +52,12 @@ LOGOUT_REDIRECT_URL = 'login'
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'todo_sql.db_timing.DatabaseTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'todo_sql.shards.ShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,28 +82,67 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.sqlite3'),
-        'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+# Профиль SQLite для нескольких воркеров (todo_sql/sqlite_tuning.py): PRAGMA на каждом
+# соединении и BEGIN IMMEDIATE для транзакций. SQLITE_TUNING=False — стандартные настройки.
+SQLITE_TUNING = os.getenv('SQLITE_TUNING', 'True') == 'True'
+
+# Пул или постоянные соединения для PostgreSQL — см. config/database.py
+DATABASES = {'default': database.build(os.environ, BASE_DIR, sqlite_tuning=SQLITE_TUNING)}
+
+# Реплики для чтения списков (todo_sql/replicas.py). После изменения пользователь
+# READ_YOUR_WRITES_SECONDS читает с основной базы: окно должно быть больше отставания реплик.
+DATABASES.update(database.replicas(os.environ, DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Шарды данных пользователей (todo_sql/shards.py): 'default' и shard_1, shard_2, ...
+shard_databases = database.shards(os.environ, DATABASES['default'])
+DATABASES.update(shard_databases)
+DATABASE_SHARDS = ['default', *shard_databases] if shard_databases else []
+DATABASE_ROUTERS = ['todo_sql.shards.ShardRouter', 'todo_sql.replicas.ReplicaRouter']
+READ_YOUR_WRITES_SECONDS = int(os.getenv('READ_YOUR_WRITES_SECONDS', '10'))
+
+SQLITE_PRAGMAS = {}
+SQLITE_LOCK_RETRIES = int(os.getenv('SQLITE_LOCK_RETRIES', '3'))
+if SQLITE_TUNING and DATABASES['default']['ENGINE'] == database.SQLITE:
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        # В WAL с NORMAL fsync только на чекпоинте: при сбое питания теряется
+        # последняя транзакция, но база не портится
+        'synchronous': 'NORMAL',
+        # Сколько ждать блокировку записи, мс (потом — повтор, см. write_transaction)
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        # Отрицательное значение — в КиБ: около 64 МБ кэша страниц на соединение
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-65536')),
+        'temp_store': 'MEMORY',
     }
-}
 
-if os.getenv('DB_USER'):
-    DATABASES['default']['USER'] = os.getenv('DB_USER')
-if os.getenv('DB_PASSWORD'):
-    DATABASES['default']['PASSWORD'] = os.getenv('DB_PASSWORD')
-if os.getenv('DB_HOST'):
-    DATABASES['default']['HOST'] = os.getenv('DB_HOST')
-if os.getenv('DB_PORT'):
-    DATABASES['default']['PORT'] = os.getenv('DB_PORT')
+# Время соединения и запросов к БД в заголовке Server-Timing (todo_sql/db_timing.py)
+DB_SERVER_TIMING = os.getenv('DB_SERVER_TIMING', str(DEBUG)) == 'True'
 
+# 'shared' — общий кэш всех воркеров. По умолчанию файл SQLite (todo_sql/cache_backends.py),
+# для нескольких серверов — Redis или memcached:
+# SHARED_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# SHARED_CACHE_LOCATION=redis://127.0.0.1:6379/1
+# 'default' — локальный L1 каждого воркера поверх 'shared' с общей инвалидацией.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'todo_sql.cache_backends.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'LOCAL_TIMEOUT': 5, 'CHECK_INTERVAL': 1},
+    },
+    'shared': {
+        'BACKEND': os.getenv('SHARED_CACHE_BACKEND', 'todo_sql.cache_backends.SQLiteCache'),
+        'LOCATION': os.getenv('SHARED_CACHE_LOCATION', str(BASE_DIR / 'cache.sqlite3')),
+    },
 }
+SYNC_CACHE_ALIAS = 'shared'
+
+# Брокер push-событий (todo_sql/push.py): через общий кэш — для нескольких воркеров
+PUSH_BROKER = os.getenv('PUSH_BROKER', 'todo_sql.push.SharedCacheBroker')
+
+# Кэш готовых ответов API по версии данных (todo_sql/response_cache.py). ETag/304 работают всегда.
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'False') == 'True'
+RESPONSE_CACHE_ALIAS = 'default'
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -133,8 +175,21 @@ STORAGES = {
     'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
 }
 
+# Сколько дней заметка лежит в корзине до автоматического удаления (manage.py purge_trash)
+TRASH_RETENTION_DAYS = int(os.getenv('TRASH_RETENTION_DAYS', '7'))
+
+# Фоновые задачи (todo_sql/tasks.py) в тестах выполняются сразу, без пула потоков
+BACKGROUND_TASKS_EAGER = False
+
 if 'test' in sys.argv:
     STORAGES['staticfiles']['BACKEND'] = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+    BACKGROUND_TASKS_EAGER = True
+    # Реплики в тестах — зеркала тестовой базы; маршрутизацию проверяет tests_replicas.py со своей репликой
+    DATABASE_REPLICAS = []
+    # Шарды — тоже зеркала; шардирование проверяет tests_shards.py со своими базами
+    DATABASE_SHARDS = []
+    if not os.getenv('SHARED_CACHE_BACKEND'):
+        CACHES['shared'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'}
 
 # ТИМЛИД: Настройки безопасности для HTTPS
 if not DEBUG:
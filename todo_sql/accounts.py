@@ -0,0 +1,112 @@
+"""
+Удаление аккаунта в фоне.
+
+user.delete() в запросе обходил коллектором ORM все заметки, пункты, метки
+и связи пользователя в одной транзакции: у активного пользователя это
+надолго занимало воркер и блокировку записи SQLite. Теперь запрос только
+выключает аккаунт (is_active=False: ни войти, ни пройти по старой сессии
+уже нельзя) и создает AccountDeletion, а данные удаляет фоновая задача
+по этапам (STAGES), пачками по CHUNK_SIZE (см. purge.py).
+
+Этап и счетчики сохраняются после каждой пачки, удаление уже удаленного
+ничего не делает, поэтому после сбоя или рестарта задачу можно просто
+запустить снова: `manage.py process_account_deletions` продолжит с того же
+места. В AccountDeletion.stats — строки и секунды по этапам.
+"""
+import logging
+import time
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+
+from . import purge, shards, tasks
+from .models import AccountDeletion, Label, Note, Tombstone
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+def _delete_notes(user_id, progress):
+    # Надгробия не нужны: синхронизировать больше некого
+    return purge.purge_notes(Note.objects.filter(user_id=user_id), CHUNK_SIZE, progress, tombstones=False)
+
+
+def _delete_labels(user_id, progress):
+    # Связи с заметками ушли вместе с заметками; остатки — на случай чужих заметок с этими метками
+    purge.delete_in_batches(Note.labels.through.objects.filter(label__user_id=user_id), CHUNK_SIZE)
+    return purge.delete_in_batches(Label.objects.filter(user_id=user_id), CHUNK_SIZE, progress)
+
+
+def _delete_tombstones(user_id, progress):
+    return purge.delete_in_batches(Tombstone.objects.filter(user_id=user_id), CHUNK_SIZE, progress)
+
+
+def _delete_user(user_id, progress):
+    # Крупные связи уже удалены, коллектору остаются группы, права и журнал админки
+    with transaction.atomic():
+        count, _ = User.objects.filter(pk=user_id).delete()
+    progress(count)
+    return count
+
+
+STAGES = [
+    (AccountDeletion.STAGE_NOTES, _delete_notes),
+    (AccountDeletion.STAGE_LABELS, _delete_labels),
+    (AccountDeletion.STAGE_TOMBSTONES, _delete_tombstones),
+    (AccountDeletion.STAGE_USER, _delete_user),
+]
+
+
+def request_deletion(user):
+    """Выключает аккаунт и ставит удаление его данных в фон."""
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        deletion, _ = AccountDeletion.objects.get_or_create(user_id=user.pk, defaults={'username': user.username})
+        schedule(deletion)
+    return deletion
+
+
+def schedule(deletion):
+    tasks.run_in_background(run, deletion.pk, key=f'account-deletion:{deletion.user_id}')
+
+
+def run(deletion_id):
+    """Выполняет (или продолжает) удаление с сохраненного этапа."""
+    deletion = AccountDeletion.objects.filter(pk=deletion_id).first()
+    if deletion is None or deletion.stage == AccountDeletion.STAGE_DONE:
+        return
+    AccountDeletion.objects.filter(pk=deletion.pk).update(
+        attempts=F('attempts') + 1, started_at=Coalesce('started_at', Now()),
+    )
+    stage_names = [name for name, _ in STAGES]
+    # Данные — в базе пользователя (shards.py), пользователь и AccountDeletion — в 'default'
+    shard = shards.placement(deletion.user_id)[0]
+    try:
+        with shards.use(shard):
+            for name, delete in STAGES[stage_names.index(deletion.stage):]:
+                stats = deletion.stats.setdefault(name, {'rows': 0, 'seconds': 0.0})
+                rows_before, seconds_before = stats['rows'], stats['seconds']
+                started = time.monotonic()
+
+                def progress(rows):
+                    stats.update(rows=rows_before + rows, seconds=round(seconds_before + time.monotonic() - started, 3))
+                    AccountDeletion.objects.filter(pk=deletion.pk).update(stats=deletion.stats)
+
+                progress(delete(deletion.user_id, progress) or 0)
+                next_index = stage_names.index(name) + 1
+                deletion.stage = stage_names[next_index] if next_index < len(stage_names) else AccountDeletion.STAGE_DONE
+                deletion.save(update_fields=['stage', 'stats'])
+    except Exception as exc:
+        AccountDeletion.objects.filter(pk=deletion.pk).update(last_error=repr(exc))
+        raise
+
+    deletion.finished_at = timezone.now()
+    deletion.save(update_fields=['finished_at'])
+    logger.info(
+        'Аккаунт %s (id=%s) удален за %.2f с: %s', deletion.username, deletion.user_id,
+        sum(stats['seconds'] for stats in deletion.stats.values()), deletion.stats,
+    )
@@ -1,5 +1,20 @@
 from django.contrib import admin
-from .models import Note
+from .models import AccountDeletion, Note, ShardAssignment
 
 # Регистрируем модель в админке
 admin.site.register(Note)
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display = ['username', 'user_id', 'stage', 'requested_at', 'finished_at', 'attempts']
+    list_filter = ['stage']
+    readonly_fields = [field.name for field in AccountDeletion._meta.fields]
+
+
+# Перенос между шардами — только командой rebalance_shards: она копирует данные
+@admin.register(ShardAssignment)
+class ShardAssignmentAdmin(admin.ModelAdmin):
+    list_display = ['user', 'shard', 'moving', 'updated_at']
+    list_filter = ['shard', 'moving']
+    readonly_fields = [field.name for field in ShardAssignment._meta.fields]
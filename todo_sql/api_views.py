@@ -1,107 +1,513 @@
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, filters, serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.settings import api_settings
 from django.db.models import F, Case, When, Value
+from django.db.models.functions import Coalesce
+from django.http import QueryDict
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Note, Label, ChecklistItem
-from .serializers import NoteSerializer, LabelSerializer, ChecklistItemSerializer
+from . import checklist_ops, mutations, purge, ranking, response_cache, search, shards, summaries, sync
+from .models import Note, Label, ChecklistItem, Tombstone
+from .pagination import KeysetPaginationMixin
+from .replicas import replica_reads
+from .sqlite_tuning import write_transaction
+from .serializers import (
+    NoteSerializer, NoteListSerializer, NoteRepresentation, LabelSerializer, ChecklistItemSerializer, ChecklistOpsSerializer,
+)
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 12
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class NoteViewSet(viewsets.ModelViewSet):
-    pagination_class = StandardResultsSetPagination
+class NotePagination(KeysetPaginationMixin, StandardResultsSetPagination):
+    pass
+
+class ChecklistPagination(KeysetPaginationMixin, StandardResultsSetPagination):
+    page_size = 100
+    max_page_size = 500
+
+class NoteSearchFilter(filters.SearchFilter):
+    """SearchFilter поверх полнотекстового индекса (см. search.py) вместо LIKE '%...%'."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        queryset = search.filter_notes(queryset, query)
+        # Без явного ?ordering= сортируем по релевантности
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-search_rank', *view.ordering)
+        return queryset
+
+class ChangeNotificationMixin:
+    """После успешного изменяющего запроса сообщает клиентам пользователя об изменениях."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and request.user.is_authenticated:
+            sync.mark_changed(request.user.pk)
+        return response
+
+class ShardMoving(APIException):
+    status_code = 503
+    default_detail = 'Данные переносятся, повторите запрос позже.'
+    default_code = 'shard_moving'
+    wait = shards.RETRY_AFTER
+
+class ShardMixin:
+    """
+    База пользователя (shards.py) для запросов с аутентификацией DRF:
+    ShardMiddleware видит только пользователя сессии.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with shards.use(shards.current()):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        try:
+            alias = shards.shard_for(request.user, request.method)
+        except shards.UserMoving:
+            raise ShardMoving()
+        if alias is not None:
+            shards.activate(alias)
+
+class WriteTransactionMixin:
+    """
+    Изменения через стандартные create/update/destroy — одной пишущей транзакцией
+    с повтором при занятой базе (см. sqlite_tuning.py). Свои изменяющие действия
+    помечаются @write_transaction.
+    """
+
+    @write_transaction
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @write_transaction
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    @write_transaction
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
+class NoteViewSet(ShardMixin, ChangeNotificationMixin, WriteTransactionMixin, viewsets.ModelViewSet):
+    pagination_class = NotePagination
     serializer_class = NoteSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, NoteSearchFilter]
     filterset_fields = ['is_pinned', 'is_archived', 'is_trashed', 'color', 'is_checklist', 'labels']
     search_fields = ['title', 'content', 'checklist_items__text']
     ordering_fields = ['updated_at', 'created_at']
-    ordering = ['-is_pinned', 'order', '-updated_at']
+    ordering = ['-is_pinned', 'position', '-updated_at']
+
+    # Массовые действия: поля для UPDATE (кроме меток и цвета, см. bulk)
+    BULK_ACTIONS = {
+        'archive': {'is_archived': True, 'is_trashed': False},
+        'unarchive': {'is_archived': False},
+        'trash': {'is_trashed': True, 'is_archived': False, 'is_pinned': False},
+        'restore': {'is_trashed': False, 'is_archived': False},
+        'pin': {'is_pinned': True},
+        'unpin': {'is_pinned': False},
+        'recolor': {},
+        'add_label': {},
+        'remove_label': {},
+    }
 
     def get_queryset(self):
-        queryset = Note.objects.filter(user=self.request.user).prefetch_related('labels', 'checklist_items')
+        queryset = Note.objects.filter(user=self.request.user)
 
         if self.action == 'list':
-            if 'is_archived' not in self.request.query_params:
-                queryset = queryset.filter(is_archived=False)
+            # Метки и пункты грузит NoteListSerializer
+            return self.apply_list_defaults(queryset, self.request.query_params)
+        if self.action == 'checklist':
+            return queryset
+        if self.action == 'checklist_ops':
+            return queryset.only('id', 'user_id')
+        if self.action == 'retrieve':
+            # Читаем только колонки и связи, которые попадут в ответ
+            representation = self.representation
+            prefetch = [name for name in ('labels', 'checklist_items') if name in representation]
+            if self.lazy_checklist and 'checklist_items' in prefetch:
+                prefetch.remove('checklist_items')
+            return queryset.only(*representation.columns()).prefetch_related(*prefetch)
+
+        if self.is_delta_update:
+            # Ответ на дельту не содержит меток и пунктов (см. partial_update)
+            return queryset
+        return queryset.prefetch_related('labels', 'checklist_items')
 
-            if 'is_trashed' not in self.request.query_params:
-                queryset = queryset.filter(is_trashed=False)
+    @property
+    def is_delta_update(self):
+        return self.action == 'partial_update' and 'content_delta' in self.request.data
+
+    @property
+    def lazy_checklist(self):
+        return self.action == 'retrieve' and self.request.query_params.get('checklist') == 'lazy'
+
+    @cached_property
+    def representation(self):
+        """?fields=, ?expand=, ?preview= для чтения (см. NoteRepresentation)."""
+        return NoteRepresentation.from_query_params(self.request.query_params)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['lazy_checklist'] = self.lazy_checklist
+        if self.action in ('list', 'retrieve'):
+            context['representation'] = self.representation
+        return context
+
+    @replica_reads
+    @response_cache.conditional
+    def list(self, request, *args, **kwargs):
+        # Для чтения списка — быстрое представление без полей DRF (см. NoteListSerializer)
+        representation = self.representation
+        queryset = NoteListSerializer.prepare(self.filter_queryset(self.get_queryset()), representation)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(NoteListSerializer(page, representation).data)
+        return Response(NoteListSerializer(queryset, representation).data)
+
+    @replica_reads
+    @response_cache.conditional
+    def retrieve(self, request, *args, **kwargs):
+        # ?checklist=lazy — без пунктов, только счетчики; пункты — через checklist().
+        # ?fields= и ?preview= — как у списка
+        return super().retrieve(request, *args, **kwargs)
+
+    def partial_update(self, request, *args, **kwargs):
+        if not self.is_delta_update:
+            return super().partial_update(request, *args, **kwargs)
+        return self.delta_update(request)
+
+    @write_transaction
+    def delta_update(self, request):
+        # Клиент с дельтой текст уже знает: отвечаем только новой версией,
+        # чтобы ответ не рос вместе с заметкой
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        return Response({
+            'id': instance.pk,
+            'updated_at': serializer.fields['updated_at'].to_representation(instance.updated_at),
+            'content_length': len(instance.content),
+        })
+
+    @action(detail=True, methods=['get'])
+    @response_cache.conditional
+    def checklist(self, request, pk=None):
+        """Пункты чеклиста заметки постранично (?cursor= или ?page=), для очень длинных списков."""
+        note = self.get_object()
+        items = ChecklistItem.objects.filter(note=note).order_by(*summaries.ITEM_ORDERING)
+        paginator = ChecklistPagination()
+        page = paginator.paginate_queryset(items, request, view=self)
+        return paginator.get_paginated_response(ChecklistItemSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'], url_path='checklist/ops')
+    @write_transaction
+    def checklist_ops(self, request, pk=None):
+        """
+        Пакет операций над чеклистом одной транзакцией:
+        {"ops": [{"op": "toggle", "id": 5}, {"op": "add", "text": "Хлеб"}, {"op": "delete_checked"}]}.
+        В ответе — только измененные пункты и ID удаленных.
+        """
+        note = self.get_object()
+        serializer = ChecklistOpsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            changed, deleted = checklist_ops.apply(note, serializer.validated_data['ops'])
+        except checklist_ops.UnknownItems as exc:
+            return Response(
+                {'ops': [f'Пункты не найдены в этой заметке: {", ".join(map(str, exc.ids))}.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        summary = Note.objects.filter(pk=note.pk).values('checklist_total', 'checklist_checked').get()
+        return Response({
+            'items': ChecklistItemSerializer(changed, many=True).data,
+            'deleted': deleted,
+            **summary,
+        })
+
+    @staticmethod
+    def apply_list_defaults(queryset, params):
+        if 'is_archived' not in params:
+            queryset = queryset.filter(is_archived=False)
+
+        if 'is_trashed' not in params:
+            queryset = queryset.filter(is_trashed=False)
 
         return queryset
 
+    def get_bulk_queryset(self, data):
+        """Выборка для массового действия: список `ids` или `filter` с параметрами списка."""
+        queryset = Note.objects.filter(user=self.request.user)
+        if 'ids' in data:
+            ids = data['ids']
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                raise ValidationError({'ids': 'Ожидается список ID заметок.'})
+            return queryset.filter(id__in=ids)
+
+        params = data.get('filter')
+        if not isinstance(params, dict):
+            raise ValidationError({'detail': 'Укажите ids или filter.'})
+        query = QueryDict(mutable=True)
+        for key, value in params.items():
+            values = value if isinstance(value, list) else [value]
+            query.setlist(key, [str(v).lower() if isinstance(v, bool) else str(v) for v in values])
+
+        queryset = self.apply_list_defaults(queryset, query)
+        filterset = DjangoFilterBackend().get_filterset_class(self, queryset)(query, queryset=queryset, request=self.request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        queryset = filterset.qs
+        search_query = query.get(filters.SearchFilter.search_param, '').strip()
+        if search_query:
+            queryset = search.filter_notes(queryset, search_query, annotate=False)
+        return queryset
+
+    @action(detail=False, methods=['post'])
+    @write_transaction
+    def bulk(self, request):
+        """
+        Массовое действие над выборкой заметок фиксированным числом запросов:
+        {"action": "archive", "ids": [1, 2]} или {"action": "trash", "filter": {"color": "red"}}.
+        """
+        action_name = request.data.get('action')
+        if action_name not in self.BULK_ACTIONS:
+            return Response(
+                {'action': f"Допустимые действия: {', '.join(self.BULK_ACTIONS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        queryset = self.get_bulk_queryset(request.data)
+        values = dict(self.BULK_ACTIONS[action_name], updated_at=timezone.now())
+        if values.get('is_trashed'):
+            # Срок хранения в корзине считается с первого попадания туда (см. purge.py)
+            values['trashed_at'] = Coalesce('trashed_at', Value(values['updated_at']))
+        elif 'is_trashed' in values:
+            values['trashed_at'] = None
+
+        if action_name == 'recolor':
+            color = request.data.get('color')
+            if color not in dict(Note.COLOR_CHOICES):
+                return Response({'color': 'Неизвестный цвет.'}, status=status.HTTP_400_BAD_REQUEST)
+            values['color'] = color
+
+        if action_name in ('add_label', 'remove_label'):
+            try:
+                label = Label.objects.get(pk=request.data.get('label_id'), user=request.user)
+            except (Label.DoesNotExist, ValueError, TypeError):
+                return Response({'label_id': 'Метка не найдена.'}, status=status.HTTP_400_BAD_REQUEST)
+            apply = mutations.add_label if action_name == 'add_label' else mutations.remove_label
+            updated = apply(queryset, label, **values)
+        else:
+            updated = queryset.update(**values)
+
+        return Response({'action': action_name, 'updated': updated})
+
 
     @action(detail=False, methods=['get'])
     def check_updates(self, request):
+        """Есть ли изменения: одно чтение версии из кэша, без запросов к заметкам."""
+        version, changed_at = sync.get_state(request.user.pk)
+        since_version = request.query_params.get('version')
         last_sync = request.query_params.get('last_sync')
-        if last_sync:
-            has_updates = Note.objects.filter(user=request.user, updated_at__gt=last_sync).exists()
-            return Response({'has_updates': has_updates})
-        return Response({'has_updates': False})
+        if since_version is not None:
+            has_updates = since_version != str(version)
+        elif last_sync:
+            # Старые клиенты присылают время последней синхронизации
+            moment = parse_datetime(last_sync)
+            if moment is not None and timezone.is_naive(moment):
+                moment = timezone.make_aware(moment)
+            has_updates = moment is None or changed_at > moment.timestamp()
+        else:
+            has_updates = False
+        return Response({
+            'has_updates': has_updates,
+            'version': version,
+            'poll_interval': sync.poll_interval(changed_at),
+        })
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Дельта изменений после курсора: измененные объекты и ID удаленных."""
+        now = timezone.now()
+        cursor = request.query_params.get('cursor')
+        payload = {
+            'cursor': sync.encode_cursor(now),
+            'reset': False,
+            'notes': [], 'labels': [], 'checklist_items': [],
+            'deleted': {'notes': [], 'labels': [], 'checklist_items': []},
+        }
+        if not cursor:
+            # Первый запрос: клиент уже загрузил актуальный список, ему нужен только курсор
+            return Response(payload)
+        try:
+            since = sync.decode_cursor(cursor)
+        except sync.InvalidCursor:
+            return Response({'cursor': ['Некорректный курсор синхронизации.']}, status=status.HTTP_400_BAD_REQUEST)
+        if sync.needs_reset(since, now):
+            payload['reset'] = True
+            return Response(payload)
+
+        changes = sync.collect_changes(request.user, since)
+        context = self.get_serializer_context()
+        payload.update(
+            notes=NoteSerializer(changes['notes'], many=True, context=context).data,
+            labels=LabelSerializer(changes['labels'], many=True, context=context).data,
+            checklist_items=ChecklistItemSerializer(changes['checklist_items'], many=True, context=context).data,
+            deleted=changes['deleted'],
+        )
+        return Response(payload)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.save(user=self.request.user, position=ranking.first_key(self.request.user))
+
+    def perform_destroy(self, instance):
+        note_id = instance.pk
+        instance.delete()
+        sync.record_tombstones(self.request.user.pk, Tombstone.KIND_NOTE, [note_id])
 
     @action(detail=True, methods=['post'])
+    @write_transaction
     def archive(self, request, pk=None):
-        # Используем оптимизированный метод обновления (без лишнего запроса в БД)
-        updated = Note.objects.filter(pk=pk, user=request.user).update(
-            is_archived=Case(When(is_archived=True, then=Value(False)), default=Value(True)),
-            is_trashed=Case(When(is_archived=False, then=Value(False)), default=F('is_trashed')),
-            updated_at=timezone.now()
+        # Переключение и чтение новых флагов одним запросом (UPDATE ... RETURNING)
+        note = mutations.update_returning(
+            Note.objects.filter(pk=pk, user=request.user),
+            {
+                'is_archived': Case(When(is_archived=True, then=Value(False)), default=Value(True)),
+                'is_trashed': Case(When(is_archived=False, then=Value(False)), default=F('is_trashed')),
+                'trashed_at': Case(When(is_archived=False, then=Value(None)), default=F('trashed_at')),
+                'updated_at': timezone.now(),
+            },
+            ['is_archived', 'is_trashed'],
         )
-        if updated == 0:
+        if note is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
-
-        note = Note.objects.get(pk=pk)
-        return Response({'is_archived': note.is_archived, 'is_trashed': note.is_trashed})
+        return Response(note)
 
     @action(detail=True, methods=['post'])
+    @write_transaction
     def trash(self, request, pk=None):
-        try:
-            note = Note.objects.get(pk=pk, user=request.user)
-        except Note.DoesNotExist:
-             return Response(status=status.HTTP_404_NOT_FOUND)
-
-        if note.is_trashed:
-            # Restore
-            note.is_trashed = False
-            note.is_archived = False
-        else:
-            # Trash
-            note.is_trashed = True
-            note.is_archived = False
-            note.is_pinned = False
-
-        note.updated_at = timezone.now()
-        note.save()
-        return Response({'is_trashed': note.is_trashed, 'is_archived': note.is_archived})
+        # В корзину — с откреплением, из корзины — на главную (не в архив)
+        note = mutations.update_returning(
+            Note.objects.filter(pk=pk, user=request.user),
+            {
+                'is_trashed': Case(When(is_trashed=True, then=Value(False)), default=Value(True)),
+                'is_archived': Value(False),
+                'is_pinned': Case(When(is_trashed=False, then=Value(False)), default=F('is_pinned')),
+                'trashed_at': Case(When(is_trashed=False, then=Value(timezone.now())), default=Value(None)),
+                'updated_at': timezone.now(),
+            },
+            ['is_trashed', 'is_archived'],
+        )
+        if note is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(note)
 
     @action(detail=True, methods=['post'])
+    @write_transaction
     def pin(self, request, pk=None):
-        updated = Note.objects.filter(pk=pk, user=request.user).update(
-            is_pinned=Case(When(is_pinned=True, then=Value(False)), default=Value(True)),
-            updated_at=timezone.now()
+        note = mutations.update_returning(
+            Note.objects.filter(pk=pk, user=request.user),
+            {
+                'is_pinned': Case(When(is_pinned=True, then=Value(False)), default=Value(True)),
+                'updated_at': timezone.now(),
+            },
+            ['is_pinned'],
         )
-        if updated == 0:
+        if note is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(note)
 
-        note = Note.objects.get(pk=pk)
-        return Response({'is_pinned': note.is_pinned})
-
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['get', 'post'])
     def empty_trash(self, request):
-        count, _ = Note.objects.filter(user=request.user, is_trashed=True).delete()
-        return Response({'status': 'Корзина очищена', 'deleted_count': count})
+        """
+        POST — очистить корзину: заметки удаляются в фоне пачками (см. purge.py),
+        ответ сразу, 202 с числом заметок. GET — прогресс последней очистки.
+        """
+        if request.method == 'GET':
+            return Response(purge.get_progress(request.user.pk) or {'total': 0, 'deleted': 0, 'finished': True})
+        progress = purge.schedule_empty_trash(request.user.pk)
+        return Response({'status': 'Очистка корзины запущена', **progress}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    @write_transaction
+    def move(self, request, pk=None):
+        """
+        Перенос заметки между соседями `prev_id` и `next_id` (любой можно не
+        передавать — край списка). Меняется одна строка.
+        """
+        try:
+            neighbour_ids = {
+                side: int(request.data[f'{side}_id'])
+                for side in ('prev', 'next') if request.data.get(f'{side}_id') is not None
+            }
+        except (TypeError, ValueError):
+            return Response({'detail': 'Неверный ID соседней заметки.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def load():
+            return {
+                row['id']: row for row in Note.objects.filter(
+                    user=request.user, id__in=[pk, *neighbour_ids.values()]
+                ).values('id', 'position', 'is_pinned')
+            }
+
+        if not str(pk).isdigit():
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        rows = load()
+        note = rows.get(int(pk))
+        if note is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        if any(neighbour_id not in rows for neighbour_id in neighbour_ids.values()):
+            return Response({'detail': 'Соседняя заметка не найдена.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        is_pinned = request.data.get('is_pinned')
+        if is_pinned is None:
+            neighbours = [rows[neighbour_id] for neighbour_id in neighbour_ids.values()]
+            is_pinned = neighbours[0]['is_pinned'] if neighbours else note['is_pinned']
+        # bool('false') — True: формы присылают строки
+        is_pinned = serializers.BooleanField().to_internal_value(is_pinned)
+
+        def bounds():
+            # Соседи из другой группы (закрепленные/остальные) границей не считаются
+            return [
+                rows[neighbour_ids[side]]['position']
+                if side in neighbour_ids and rows[neighbour_ids[side]]['is_pinned'] == is_pinned else None
+                for side in ('prev', 'next')
+            ]
+
+        try:
+            position = ranking.key_between(*bounds())
+        except ranking.RankError:
+            # Ранги соседей совпали (параллельные переносы или заметки без ранга)
+            ranking.rebalance(request.user.pk)
+            rows = load()
+            before, after = bounds()
+            if before is not None and after is not None and before >= after:
+                # Порядок у клиента устарел: ставим сразу после prev
+                after = Note.objects.filter(
+                    user=request.user, is_pinned=is_pinned, position__gt=before
+                ).exclude(pk=note['id']).order_by('position').values_list('position', flat=True).first()
+            position = ranking.key_between(before, after)
+
+        Note.objects.filter(pk=note['id']).update(position=position, is_pinned=is_pinned, updated_at=timezone.now())
+        if len(position) > ranking.MAX_KEY_LENGTH:
+            ranking.schedule_rebalance(request.user.pk)
+        return Response({'id': note['id'], 'position': position, 'is_pinned': is_pinned})
 
     @action(detail=False, methods=['post'])
+    @write_transaction
     def reorder(self, request):
+        """Устаревший полный пересчет порядка для старых клиентов; новым нужен `move`."""
         pinned_ids = request.data.get('pinned_ids', [])
         other_ids = request.data.get('other_ids', [])
 
@@ -114,23 +520,31 @@ class NoteViewSet(viewsets.ModelViewSet):
         pinned_map = {int(pid): i for i, pid in enumerate(pinned_ids)}
         other_map = {int(pid): i for i, pid in enumerate(other_ids)}
 
+        now = timezone.now()
+        positions = dict(zip(
+            [int(pid) for pid in pinned_ids + other_ids], ranking.spread_keys(len(all_ids))
+        ))
         updates = []
         for note in notes:
             if note.id in pinned_map:
                 note.is_pinned = True
                 note.order = pinned_map[note.id]
+                note.position = positions[note.id]
+                note.updated_at = now
                 updates.append(note)
             elif note.id in other_map:
                 note.is_pinned = False
                 note.order = other_map[note.id]
+                note.position = positions[note.id]
+                note.updated_at = now
                 updates.append(note)
 
         if updates:
-            Note.objects.bulk_update(updates, ['is_pinned', 'order'])
+            Note.objects.bulk_update(updates, ['is_pinned', 'order', 'position', 'updated_at'])
 
         return Response({'status': 'порядок обновлен'})
 
-class LabelViewSet(viewsets.ModelViewSet):
+class LabelViewSet(ShardMixin, ChangeNotificationMixin, WriteTransactionMixin, viewsets.ModelViewSet):
     pagination_class = StandardResultsSetPagination
     serializer_class = LabelSerializer
     permission_classes = [IsAuthenticated]
@@ -138,14 +552,40 @@ class LabelViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Label.objects.filter(user=self.request.user)
 
+    @replica_reads
+    @response_cache.conditional
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @replica_reads
+    @response_cache.conditional
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class ChecklistItemViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        label_id = instance.pk
+        note_ids = list(Note.objects.filter(labels=instance).values_list('id', flat=True))
+        # У заметок меняется список меток — отмечаем их как измененные для синхронизации
+        Note.objects.filter(id__in=note_ids).update(updated_at=timezone.now())
+        instance.delete()
+        summaries.refresh(note_ids)
+        sync.record_tombstones(self.request.user.pk, Tombstone.KIND_LABEL, [label_id])
+
+class ChecklistItemViewSet(ShardMixin, ChangeNotificationMixin, WriteTransactionMixin, viewsets.ModelViewSet):
     pagination_class = StandardResultsSetPagination
     serializer_class = ChecklistItemSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         # Гарантируем, что пользователь видит только свои пункты списка
-        return ChecklistItem.objects.filter(note__user=self.request.user)
\ No newline at end of file
+        return ChecklistItem.objects.filter(note__user=self.request.user)
+
+    def perform_destroy(self, instance):
+        item_id = instance.pk
+        instance.delete()
+        search.update_index([instance.note_id])
+        summaries.refresh([instance.note_id])
+        sync.record_tombstones(self.request.user.pk, Tombstone.KIND_CHECKLIST_ITEM, [item_id])
\ No newline at end of file
@@ -1,5 +1,24 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    # SQLite пересоздаёт таблицу при части миграций и теряет навешенные на неё
+    # триггеры, поэтому после каждого migrate проверяем, что индекс на месте.
+    from . import search
+    search.create_index(connections[using])
 
 
 class TodoConfig(AppConfig):
     name = 'todo_sql'
+    default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(ensure_search_index, sender=self)
+        from .shards import prepare_shard
+        post_migrate.connect(prepare_shard, sender=self)
+        from .sqlite_tuning import apply_pragmas
+        connection_created.connect(apply_pragmas, dispatch_uid='todo_sql.sqlite_pragmas')
@@ -0,0 +1,372 @@
+"""
+Кэш, общий для всех воркеров.
+
+SQLiteCache — общий кэш в файле SQLite: работает на одной машине без Redis
+и memcached, все воркеры видят одни и те же ключи, `incr` атомарен между
+процессами. Для нескольких серверов вместо него подключается Redis или
+memcached (SHARED_CACHE_BACKEND).
+
+TieredCache — маленький локальный кэш процесса (L1) перед общим (L2).
+Чтение горячих ключей не ходит в L2, а записи попадают в журнал
+инвалидаций в L2: остальные воркеры не реже раза в CHECK_INTERVAL секунд
+читают журнал и выбрасывают у себя измененные ключи. Поэтому в L1 значения
+живут недолго (LOCAL_TIMEOUT) и могут отставать от L2 на CHECK_INTERVAL —
+для счетчиков, от которых нужна точность (версии синхронизации), берите L2
+напрямую.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class SQLiteCache(BaseCache):
+    """LOCATION — путь к файлу базы кэша (создается при первом обращении)."""
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    CULL_EVERY = 100
+    # У LocMemCache по умолчанию 300 записей; общему кэшу нужно больше: в нем версии всех пользователей
+    DEFAULT_MAX_ENTRIES = 100000
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._max_entries = params.get('OPTIONS', {}).get('MAX_ENTRIES', self.DEFAULT_MAX_ENTRIES)
+        self._path = str(location)
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or getattr(self._local, 'pid', None) != os.getpid():
+            # Соединение свое у каждого потока и у каждого процесса после fork
+            db = sqlite3.connect(self._path, timeout=10, isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL) WITHOUT ROWID'
+            )
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _load(self, row, now):
+        value, expires = row
+        if expires is not None and expires <= now:
+            return None
+        return pickle.loads(value)
+
+    def _dump(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db.execute('SELECT value, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        value = None if row is None else self._load(row, time.time())
+        return default if value is None else value
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        placeholders = ', '.join('?' * len(key_map))
+        rows = self._db.execute(
+            f'SELECT key, value, expires FROM cache_entries WHERE key IN ({placeholders})', list(key_map)
+        ).fetchall()
+        now = time.time()
+        return {
+            key_map[key]: pickle.loads(value)
+            for key, value, expires in rows
+            if expires is None or expires > now
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self.make_and_validate_key(key, version=version), self._dump(value), expires) for key, value in data.items()]
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany('INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)', rows)
+            # COUNT(*) по всей таблице на каждую запись дорог, чистим раз в CULL_EVERY записей
+            self._local.writes = getattr(self._local, 'writes', 0) + 1
+            if self._local.writes % self.CULL_EVERY == 0:
+                self._cull(db)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db
+        # Перезаписываем только просроченную запись: одна команда, без гонки между воркерами
+        cursor = db.execute(
+            'INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache_entries.expires IS NOT NULL AND cache_entries.expires <= ?',
+            (key, self._dump(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._db.execute(
+            'UPDATE cache_entries SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db
+        # IMMEDIATE сразу берет блокировку записи: параллельный incr из другого воркера подождет
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT value, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            value = None if row is None else self._load(row, time.time())
+            if value is None:
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            db.execute('UPDATE cache_entries SET value = ? WHERE key = ?', (self._dump(value), key))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db.execute(
+            'SELECT 1 FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        return self._delete([key], version) > 0
+
+    def delete_many(self, keys, version=None):
+        self._delete(keys, version)
+
+    def _delete(self, keys, version):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if not keys:
+            return 0
+        placeholders = ', '.join('?' * len(keys))
+        return self._db.execute(f'DELETE FROM cache_entries WHERE key IN ({placeholders})', keys).rowcount
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache_entries')
+
+    def _cull(self, db):
+        # Как у DatabaseCache: сначала просроченные, при переполнении — каждая N-я запись
+        db.execute('DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        if count > self._max_entries:
+            if self._cull_frequency == 0:
+                db.execute('DELETE FROM cache_entries')
+                return
+            db.execute(
+                'DELETE FROM cache_entries WHERE key < '
+                '(SELECT key FROM cache_entries ORDER BY key LIMIT 1 OFFSET ?)',
+                (count // self._cull_frequency,),
+            )
+
+
+# Состояние L1 общее для всех потоков процесса, как и хранилище LocMemCache
+_local_states = {}
+_local_states_lock = threading.Lock()
+
+
+class _LocalState:
+    def __init__(self):
+        self.origin = f'{os.getpid()}:{uuid.uuid4().hex}'
+        self.pid = os.getpid()
+        self.seen = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """
+    LOCATION — алиас общего кэша (L2). OPTIONS:
+    LOCAL_TIMEOUT — сколько секунд значение живет в L1 (по умолчанию 5),
+    CHECK_INTERVAL — как часто читать журнал инвалидаций (по умолчанию 1),
+    LOCAL_MAX_ENTRIES — размер L1 (по умолчанию 1000).
+    """
+    LOG_TIMEOUT = 300
+    LOG_LIMIT = 500
+    CLEAR = '*'
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        # Журнал общий для всех воркеров, L1 у каждого процесса свой
+        self._log_name = f'tiered:{location}:{self.key_prefix}'
+        self._name = options.get('LOCAL_NAME', self._log_name)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.check_interval = options.get('CHECK_INTERVAL', 1)
+        self._l1 = LocMemCache(self._name, {
+            'TIMEOUT': self.local_timeout,
+            'KEY_PREFIX': self.key_prefix,
+            'VERSION': self.version,
+            'OPTIONS': {'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000)},
+        })
+        self._seq_key = f'{self._log_name}:seq'
+
+    @property
+    def _l2(self):
+        return caches[self._shared_alias]
+
+    @property
+    def _state(self):
+        state = _local_states.get(self._name)
+        if state is None or state.pid != os.getpid():
+            with _local_states_lock:
+                state = _local_states.get(self._name)
+                if state is None or state.pid != os.getpid():
+                    # После fork локальный кэш родителя мог устареть
+                    self._l1.clear()
+                    state = _local_states[self._name] = _LocalState()
+        return state
+
+    def _version(self, version):
+        return self.version if version is None else version
+
+    def _shared_timeout(self, timeout):
+        return self.default_timeout if timeout == DEFAULT_TIMEOUT else timeout
+
+    def _local_timeout(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    # --- Журнал инвалидаций ---
+
+    def _log_key(self, seq):
+        return f'{self._log_name}:{seq}'
+
+    def _publish(self, keys):
+        if not keys:
+            return
+        l2 = self._l2
+        try:
+            seq = l2.incr(self._seq_key, len(keys))
+        except ValueError:
+            l2.add(self._seq_key, 0, None)
+            seq = l2.incr(self._seq_key, len(keys))
+        origin = self._state.origin
+        l2.set_many(
+            {self._log_key(seq - len(keys) + 1 + i): (origin, key) for i, key in enumerate(keys)},
+            self.LOG_TIMEOUT,
+        )
+
+    def _sync(self):
+        state = self._state
+        now = time.monotonic()
+        if now - state.checked_at < self.check_interval:
+            return
+        with state.lock:
+            if now - state.checked_at < self.check_interval:
+                return
+            state.checked_at = now
+            seq = self._l2.get(self._seq_key, 0)
+            seen, state.seen = state.seen, seq
+            if seen is None or seq == seen:
+                return
+            if seq < seen or seq - seen > self.LOG_LIMIT:
+                # Журнал сброшен или мы слишком отстали: проще забыть все
+                self._l1.clear()
+                return
+            entries = self._l2.get_many([self._log_key(n) for n in range(seen + 1, seq + 1)])
+            if len(entries) < seq - seen:
+                self._l1.clear()
+                return
+            for origin, key in entries.values():
+                if key == self.CLEAR:
+                    self._l1.clear()
+                    return
+                if origin != state.origin:
+                    self._l1.delete(*key)
+
+    # --- API кэша ---
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        version = self._version(version)
+        found = self._l1.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = self._l2.get_many(missing, version=version)
+            if fetched:
+                self._l1.set_many(fetched, version=version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        version = self._version(version)
+        failed = self._l2.set_many(data, self._shared_timeout(timeout), version=version)
+        stored = {key: value for key, value in data.items() if key not in failed}
+        self._l1.set_many(stored, self._local_timeout(timeout), version=version)
+        self._publish([(key, version) for key in stored])
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        version = self._version(version)
+        if not self._l2.add(key, value, self._shared_timeout(timeout), version=version):
+            return False
+        self._l1.set(key, value, self._local_timeout(timeout), version=version)
+        self._publish([(key, version)])
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        version = self._version(version)
+        self._l1.touch(key, self._local_timeout(timeout), version=version)
+        return self._l2.touch(key, self._shared_timeout(timeout), version=version)
+
+    def incr(self, key, delta=1, version=None):
+        version = self._version(version)
+        value = self._l2.incr(key, delta, version=version)
+        self._l1.delete(key, version=version)
+        self._publish([(key, version)])
+        return value
+
+    def has_key(self, key, version=None):
+        self._sync()
+        version = self._version(version)
+        return self._l1.has_key(key, version=version) or self._l2.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        version = self._version(version)
+        self._l1.delete(key, version=version)
+        deleted = self._l2.delete(key, version=version)
+        self._publish([(key, version)])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        version = self._version(version)
+        keys = list(keys)
+        self._l1.delete_many(keys, version=version)
+        self._l2.delete_many(keys, version=version)
+        self._publish([(key, version) for key in keys])
+
+    def clear(self):
+        self._l1.clear()
+        self._l2.clear()
+        self._publish([self.CLEAR])
@@ -0,0 +1,164 @@
+"""
+Пакет операций над чеклистом одной заметки.
+
+Клиент копит клики (отметки, правки, перестановки) и шлет их одним запросом.
+Операции применяются по порядку в одной транзакции, но подряд идущие
+операции одного типа склеиваются в один SQL-запрос на множество пунктов:
+десяток отметок — это один-два UPDATE ... WHERE id IN (...), а не десяток
+PATCH к /checklist-items/. В ответ уходят только измененные пункты.
+
+Операции ({"op": ..., ...}):
+    add            text, is_checked?, order? (по умолчанию — в конец)
+    edit           id, text
+    toggle         id, is_checked? (без значения — инвертировать)
+    move           id, order
+    delete         id
+    check_all, uncheck_all, delete_checked
+"""
+from django.db import router, transaction
+from django.db.models import Case, Max, Value, When
+from django.utils import timezone
+
+from . import search, summaries, sync
+from .models import ChecklistItem, Note, Tombstone
+
+OPS = ('add', 'edit', 'toggle', 'move', 'delete', 'check_all', 'uncheck_all', 'delete_checked')
+ITEM_OPS = ('edit', 'toggle', 'move', 'delete')
+MAX_OPS = 500
+
+
+class UnknownItems(Exception):
+    """Операции ссылаются на пункты, которых нет в заметке."""
+
+    def __init__(self, ids):
+        super().__init__(ids)
+        self.ids = sorted(ids)
+
+
+def _runs(ops):
+    """Подряд идущие операции одного типа."""
+    run = []
+    for op in ops:
+        if run and (op['op'] != run[0]['op'] or op['op'] not in ('add', *ITEM_OPS)):
+            yield run[0]['op'], run
+            run = []
+        run.append(op)
+    if run:
+        yield run[0]['op'], run
+
+
+class _Batch:
+    def __init__(self, note):
+        self.note = note
+        self.items = ChecklistItem.objects.filter(note=note)
+        self.now = timezone.now()
+        self.changed = set()
+        self.deleted = set()
+        self._next_order = None
+
+    def next_order(self):
+        if self._next_order is None:
+            top = self.items.aggregate(top=Max('order'))['top']
+            self._next_order = 0 if top is None else top + 1
+        self._next_order += 1
+        return self._next_order - 1
+
+    def add(self, ops):
+        created = ChecklistItem.objects.bulk_create([
+            ChecklistItem(
+                note=self.note, text=op['text'], is_checked=op.get('is_checked', False),
+                order=op['order'] if 'order' in op else self.next_order(), updated_at=self.now,
+            )
+            for op in ops
+        ])
+        self.changed.update(item.pk for item in created)
+
+    def _bulk_update(self, values, field):
+        # Повторная операция над тем же пунктом перекрывает предыдущую
+        items = [ChecklistItem(pk=pk, updated_at=self.now, **{field: value}) for pk, value in values.items()]
+        self.items.bulk_update(items, [field, 'updated_at'])
+        self.changed.update(values)
+
+    def edit(self, ops):
+        self._bulk_update({op['id']: op['text'] for op in ops}, 'text')
+
+    def move(self, ops):
+        self._bulk_update({op['id']: op['order'] for op in ops}, 'order')
+        if self._next_order is not None:
+            self._next_order = max(self._next_order, *(op['order'] + 1 for op in ops))
+
+    def toggle(self, ops):
+        # Итог по пункту: явное значение (bool) или число инверсий (четное — ничего не меняет)
+        targets = {}
+        for op in ops:
+            pk = op['id']
+            if 'is_checked' in op:
+                targets[pk] = op['is_checked']
+            elif isinstance(targets.get(pk), bool):
+                targets[pk] = not targets[pk]
+            else:
+                targets[pk] = targets.get(pk, 0) + 1
+        for value in (True, False):
+            ids = [pk for pk, target in targets.items() if target is value]
+            if ids:
+                self.items.filter(id__in=ids).update(is_checked=value, updated_at=self.now)
+        flip = [pk for pk, target in targets.items() if not isinstance(target, bool) and target % 2]
+        if flip:
+            self.items.filter(id__in=flip).update(
+                is_checked=Case(When(is_checked=True, then=Value(False)), default=Value(True)),
+                updated_at=self.now,
+            )
+        self.changed.update(pk for pk, target in targets.items() if isinstance(target, bool) or target % 2)
+
+    def _delete(self, queryset):
+        ids = set(queryset.order_by().values_list('id', flat=True))
+        if ids:
+            self.items.filter(id__in=ids).delete()
+        self.deleted |= ids
+
+    def delete(self, ops):
+        self._delete(self.items.filter(id__in={op['id'] for op in ops}))
+
+    def delete_checked(self, ops):
+        self._delete(self.items.filter(is_checked=True))
+
+    def _check(self, value):
+        ids = list(self.items.exclude(is_checked=value).order_by().values_list('id', flat=True))
+        if ids:
+            self.items.filter(id__in=ids).update(is_checked=value, updated_at=self.now)
+        self.changed.update(ids)
+
+    def check_all(self, ops):
+        self._check(True)
+
+    def uncheck_all(self, ops):
+        self._check(False)
+
+
+def apply(note, ops):
+    """
+    Применяет проверенные операции (см. ChecklistOpSerializer) к пунктам заметки.
+    Возвращает (измененные пункты по порядку, ID удаленных пунктов).
+    Если операция ссылается на чужой или несуществующий пункт — UnknownItems,
+    и ничего не меняется.
+    """
+    batch = _Batch(note)
+    with transaction.atomic(using=router.db_for_write(Note, instance=note)):
+        referenced = {op['id'] for op in ops if op['op'] in ITEM_OPS}
+        if referenced:
+            missing = referenced - set(batch.items.filter(id__in=referenced).order_by().values_list('id', flat=True))
+            if missing:
+                raise UnknownItems(missing)
+
+        for name, run in _runs(ops):
+            getattr(batch, name)(run)
+
+        # bulk-операции не вызывают post_save, поэтому индекс и сводку обновляем явно
+        search.update_index([note.pk])
+        summaries.refresh([note.pk])
+        if batch.deleted:
+            sync.record_tombstones(note.user_id, Tombstone.KIND_CHECKLIST_ITEM, sorted(batch.deleted))
+        changed = list(
+            batch.items.filter(id__in=batch.changed - batch.deleted).order_by(*summaries.ITEM_ORDERING)
+        )
+    return changed, sorted(batch.deleted)
@@ -1,6 +1,10 @@
-from .models import Label
+from django.utils.functional import SimpleLazyObject
+
+from . import sidebar
 
 def user_labels(request):
     if request.user.is_authenticated:
-        return {'user_labels': Label.objects.filter(user=request.user)}
+        # Лениво: страницы без бокового меню (вход, 404) не трогают даже кэш
+        user_id = request.user.pk
+        return {'user_labels': SimpleLazyObject(lambda: sidebar.get_labels(user_id))}
     return {}
@@ -0,0 +1,102 @@
+"""
+Время работы с БД на каждый запрос.
+
+`DatabaseTimingMiddleware` меряет для соединения 'default':
+- db-connect — получение соединения перед синхронным представлением: новое
+  подключение, выдача из пула или проверка постоянного соединения
+  (CONN_HEALTH_CHECKS). С пулом и постоянными соединениями это доли
+  миллисекунды, без них — полноценное подключение к серверу;
+- db — суммарное время и число SQL-запросов.
+
+Итог пишется в лог todo_sql.db_timing (уровень DEBUG), а при
+settings.DB_SERVER_TIMING — в заголовок Server-Timing (вкладка Network
+в браузере). Асинхронные представления (push-канал) соединение заранее
+не получают, а взятое для проверки пользователя сразу возвращают: иначе
+поток событий держал бы его до конца соединения (views._release_connections).
+"""
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTimer:
+    """Обертка выполнения запросов (connection.execute_wrapper): считает запросы и время."""
+
+    def __init__(self):
+        self.connect = None
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        metrics = [f'db;dur={self.seconds * 1000:.1f};desc="{self.queries} SQL"']
+        if self.connect is not None:
+            metrics.insert(0, f'db-connect;dur={self.connect * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+class DatabaseTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.db_timer = timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        return self.finish(request, response, timer)
+
+    async def __acall__(self, request):
+        # Соединения у каждого потока свои, а синхронное представление выполняется
+        # не в потоке event loop: обертку ставит process_view в потоке представления
+        request.db_timer = timer = QueryTimer()
+        try:
+            response = await self.get_response(request)
+        finally:
+            conn = getattr(request, 'db_timer_connection', None)
+            if conn is not None and timer in conn.execute_wrappers:
+                conn.execute_wrappers.remove(timer)
+        return self.finish(request, response, timer)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = getattr(request, 'db_timer', None)
+        if timer is None or iscoroutinefunction(view_func):
+            return None
+        if iscoroutinefunction(self):
+            # Под ASGI process_view выполняется в том же потоке, что и представление
+            request.db_timer_connection = connections[DEFAULT_DB_ALIAS]
+            request.db_timer_connection.execute_wrappers.append(timer)
+        started = time.perf_counter()
+        # То же, что ORM делает перед первым запросом, только с замером
+        connection.close_if_health_check_failed()
+        connection.ensure_connection()
+        timer.connect = time.perf_counter() - started
+        return None
+
+    def finish(self, request, response, timer):
+        logger.debug(
+            '%s %s: соединение %s, %s SQL за %.1f мс', request.method, request.path,
+            'нет' if timer.connect is None else f'{timer.connect * 1000:.1f} мс', timer.queries, timer.seconds * 1000,
+        )
+        if settings.DB_SERVER_TIMING:
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {timer.server_timing()}' if existing else timer.server_timing()
+        return response
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todo_sql import accounts
+from todo_sql.models import AccountDeletion
+
+
+class Command(BaseCommand):
+    help = 'Продолжает незавершенные удаления аккаунтов (после сбоя или рестарта).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=10,
+            help='Брать удаления, запрошенные больше стольких минут назад (свежие еще идут в фоне).',
+        )
+
+    def handle(self, *args, **options):
+        threshold = timezone.now() - timedelta(minutes=options['older_than'])
+        pending = AccountDeletion.objects.exclude(stage=AccountDeletion.STAGE_DONE).filter(requested_at__lt=threshold)
+        count = 0
+        for deletion in pending.order_by('requested_at'):
+            self.stdout.write(f'{deletion.username} (id={deletion.user_id}): этап {deletion.stage}')
+            accounts.run(deletion.pk)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано удалений: {count}.'))
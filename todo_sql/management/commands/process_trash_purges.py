@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from todo_sql import purge, shards
+from todo_sql.models import TrashPurge
+
+
+class Command(BaseCommand):
+    help = 'Доводит до конца очистки корзины, прерванные сбоем или рестартом.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=10,
+            help='Брать очистки, запрошенные больше стольких минут назад (свежие еще идут в фоне).',
+        )
+
+    def handle(self, *args, **options):
+        threshold = timezone.now() - timedelta(minutes=options['older_than'])
+        count = 0
+        for request in TrashPurge.objects.filter(requested_at__lt=threshold).order_by('requested_at'):
+            # Заметки — в базе пользователя (shards.py), TrashPurge — в 'default'
+            with shards.use(shards.placement(request.user_id)[0]):
+                purge.empty_trash(request.user_id, request.requested_at)
+            self.stdout.write(f'Пользователь {request.user_id}: корзина очищена')
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано очисток: {count}.'))
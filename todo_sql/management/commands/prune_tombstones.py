@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from todo_sql import shards, sync
+
+
+class Command(BaseCommand):
+    help = 'Удаляет журнал удалений (tombstones) старше срока, после которого клиенту нужна полная синхронизация.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help='По умолчанию — все шарды (или только default).')
+
+    def handle(self, *args, **options):
+        deleted = 0
+        for alias in [options['database']] if options['database'] else shards.aliases() or [DEFAULT_DB_ALIAS]:
+            deleted += sync.prune_tombstones(using=alias)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей журнала старше {sync.TOMBSTONE_RETENTION.days} дн.: {deleted}.'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from todo_sql import purge, shards
+
+
+class Command(BaseCommand):
+    help = 'Безвозвратно удаляет заметки, лежащие в корзине дольше TRASH_RETENTION_DAYS (пачками).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Срок хранения в корзине, дней.')
+        parser.add_argument('--batch-size', type=int, default=purge.BATCH_SIZE)
+        parser.add_argument('--database', default=None, help='По умолчанию — все шарды (или только default).')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else purge.retention().days
+
+        def progress(deleted):
+            self.stdout.write(f'Удалено заметок: {deleted}')
+
+        deleted = 0
+        for alias in [options['database']] if options['database'] else shards.aliases() or [DEFAULT_DB_ALIAS]:
+            # Надгробия пишутся в ту же базу, что и заметки
+            with shards.use(alias):
+                deleted += purge.purge_expired(
+                    days=days, batch_size=options['batch_size'], progress=progress, using=alias,
+                )
+        self.stdout.write(self.style.SUCCESS(f'Удалено заметок из корзины старше {days} дн.: {deleted}.'))
@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from todo_sql import shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит пользователей между шардами без остановки (см. todo_sql/shards.py): '
+        '--user ID --to ALIAS — одного пользователя, --auto — всех, чей шард не совпадает с хэшем '
+        '(после добавления шарда или для пользователей, созданных до включения шардов).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID пользователя.')
+        parser.add_argument('--to', help='Целевой шард для --user.')
+        parser.add_argument('--auto', action='store_true', help='Перенести всех на шард по хэшу ID.')
+        parser.add_argument('--limit', type=int, default=None, help='Не больше стольких пользователей за запуск.')
+        parser.add_argument('--batch-size', type=int, default=shards.COPY_BATCH_SIZE)
+        parser.add_argument(
+            '--grace', type=float, default=2,
+            help='Сколько секунд ждать начатые запросы пользователя перед копированием.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, кого и куда перенести.')
+
+    def plan(self, options):
+        if options['user'] is not None:
+            if options['auto'] or not options['to']:
+                raise CommandError('Укажите либо --user ID --to ALIAS, либо --auto.')
+            if options['to'] not in shards.aliases():
+                raise CommandError(f'Неизвестный шард {options["to"]}: {", ".join(shards.aliases())}.')
+            return [(options['user'], options['to'])]
+        if not options['auto']:
+            raise CommandError('Укажите либо --user ID --to ALIAS, либо --auto.')
+        moves = []
+        for user_id in User.objects.order_by('pk').values_list('pk', flat=True).iterator():
+            target = shards.hashed(user_id)
+            if shards.placement(user_id)[0] != target:
+                moves.append((user_id, target))
+                if options['limit'] is not None and len(moves) >= options['limit']:
+                    break
+        return moves
+
+    def handle(self, *args, **options):
+        if not shards.enabled():
+            raise CommandError('Шардирование выключено: задайте DB_SHARDS.')
+        moves = self.plan(options)
+        for user_id, target in moves:
+            source = shards.placement(user_id)[0]
+            self.stdout.write(f'Пользователь {user_id}: {source} → {target}')
+            if not options['dry_run']:
+                copied = shards.move_user(user_id, target, batch_size=options['batch_size'], grace=options['grace'])
+                self.stdout.write(f'  перенесено строк: {sum(copied.values())}')
+        self.stdout.write(self.style.SUCCESS(f'Пользователей {"к переносу" if options["dry_run"] else "перенесено"}: {len(moves)}.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from todo_sql import search
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересобирает полнотекстовый индекс заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        search.rebuild_index(using=options['database'])
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран.'))
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from todo_sql import search
+    search.create_index(schema_editor.connection)
+    search.rebuild_index(using=schema_editor.connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    from todo_sql import search
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo_sql", "0005_alter_label_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+def backfill_positions(apps, schema_editor):
+    from todo_sql.ranking import spread_keys
+    Note = apps.get_model('todo_sql', 'Note')
+    db = schema_editor.connection.alias
+    user_ids = Note.objects.using(db).values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        ids = list(
+            Note.objects.using(db).filter(user_id=user_id)
+            .order_by('-is_pinned', 'order', '-updated_at', 'id').values_list('id', flat=True)
+        )
+        Note.objects.using(db).bulk_update(
+            [Note(id=pk, position=key) for pk, key in zip(ids, spread_keys(len(ids)))],
+            ['position'], batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_sql', '0007_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='note',
+            options={'ordering': ['-is_pinned', 'position', '-updated_at'], 'verbose_name': 'Заметка', 'verbose_name_plural': 'Заметки'},
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='position',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255, verbose_name='Позиция'),
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+    ]
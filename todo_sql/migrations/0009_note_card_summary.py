@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:35
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def backfill_summaries(apps, schema_editor):
+    Note = apps.get_model('todo_sql', 'Note')
+    ChecklistItem = apps.get_model('todo_sql', 'ChecklistItem')
+    db = schema_editor.connection.alias
+    labels, items = {}, {}
+    for note_id, label_id, name in (
+        Note.labels.through.objects.using(db).order_by('label__name', 'label_id')
+        .values_list('note_id', 'label_id', 'label__name')
+    ):
+        labels.setdefault(note_id, []).append({'id': label_id, 'name': name})
+    for note_id, item_id, text, is_checked, order in (
+        ChecklistItem.objects.using(db).order_by('note_id', 'order', 'id')
+        .values_list('note_id', 'id', 'text', 'is_checked', 'order')
+    ):
+        items.setdefault(note_id, []).append({'id': item_id, 'text': text, 'is_checked': is_checked, 'order': order})
+
+    notes = []
+    for note in Note.objects.using(db).only('id', 'content').iterator():
+        note_items = items.get(note.id, [])
+        note.content_preview = Truncator(note.content).chars(300)
+        note.label_summary = labels.get(note.id, [])
+        note.checklist_total = len(note_items)
+        note.checklist_checked = sum(1 for item in note_items if item['is_checked'])
+        note.checklist_preview = note_items[:5]
+        notes.append(note)
+    Note.objects.using(db).bulk_update(
+        notes, ['content_preview', 'label_summary', 'checklist_total', 'checklist_checked', 'checklist_preview'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_sql', '0008_note_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='checklist_checked',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Выполнено пунктов'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='checklist_preview',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Первые пункты чеклиста'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='checklist_total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Пунктов в чеклисте'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='content_preview',
+            field=models.CharField(blank=True, default='', editable=False, max_length=300, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='label_summary',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Метки (id, имя)'),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:56
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_trashed_at(apps, schema_editor):
+    # Точная дата не сохранялась; последнее изменение — ближайшая оценка
+    Note = apps.get_model('todo_sql', 'Note')
+    Note.objects.using(schema_editor.connection.alias).filter(is_trashed=True).update(trashed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_sql', '0009_note_card_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='trashed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Дата удаления в корзину'),
+        ),
+        migrations.RunPython(backfill_trashed_at, migrations.RunPython.noop),
+    ]
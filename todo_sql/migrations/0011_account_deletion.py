@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_sql', '0010_note_trashed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.PositiveIntegerField(unique=True, verbose_name='ID пользователя')),
+                ('username', models.CharField(max_length=150, verbose_name='Имя пользователя')),
+                ('stage', models.CharField(choices=[('notes', 'Заметки'), ('labels', 'Метки'), ('tombstones', 'Надгробия синхронизации'), ('user', 'Пользователь'), ('done', 'Завершено')], default='notes', max_length=20, verbose_name='Этап')),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата запроса')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало удаления')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание удаления')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Запусков')),
+                ('stats', models.JSONField(blank=True, default=dict, verbose_name='Строк и секунд по этапам')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Удаление аккаунта',
+                'verbose_name_plural': 'Удаления аккаунтов',
+            },
+        ),
+    ]
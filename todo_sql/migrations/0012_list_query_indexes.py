@@ -0,0 +1,125 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+SINGLE_COLUMN_INDEXES = ['is_pinned', 'is_archived', 'is_trashed', 'created_at', 'updated_at', 'order', 'position', 'trashed_at']
+
+
+def drop_single_column_indexes(apps, schema_editor):
+    Note = apps.get_model('todo_sql', 'Note')
+    for name in SINGLE_COLUMN_INDEXES:
+        column = Note._meta.get_field(name).column
+        # Вместе с PostgreSQL-индексом *_like для varchar
+        for index_name in schema_editor._constraint_names(Note, [column], index=True, unique=False):
+            schema_editor.execute(schema_editor._delete_index_sql(Note, index_name))
+
+
+def create_single_column_indexes(apps, schema_editor):
+    Note = apps.get_model('todo_sql', 'Note')
+    for name in SINGLE_COLUMN_INDEXES:
+        schema_editor.execute(schema_editor._create_index_sql(Note, fields=[Note._meta.get_field(name)]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_sql', '0011_account_deletion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # AlterField в SQLite пересоздал бы всю таблицу заметок восемь раз;
+        # меняется только db_index, поэтому в БД просто удаляем индексы
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='note',
+                    name='created_at',
+                    field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+                ),
+                migrations.AlterField(
+                    model_name='note',
+                    name='is_archived',
+                    field=models.BooleanField(default=False, verbose_name='В архиве'),
+                ),
+                migrations.AlterField(
+                    model_name='note',
+                    name='is_pinned',
+                    field=models.BooleanField(default=False, verbose_name='Закреплено'),
+                ),
+                migrations.AlterField(
+                    model_name='note',
+                    name='is_trashed',
+                    field=models.BooleanField(default=False, verbose_name='В корзине'),
+                ),
+                migrations.AlterField(
+                    model_name='note',
+                    name='order',
+                    field=models.PositiveIntegerField(default=0, verbose_name='Порядок'),
+                ),
+                migrations.AlterField(
+                    model_name='note',
+                    name='position',
+                    field=models.CharField(blank=True, default='', max_length=255, verbose_name='Позиция'),
+                ),
+                migrations.AlterField(
+                    model_name='note',
+                    name='trashed_at',
+                    field=models.DateTimeField(blank=True, null=True, verbose_name='Дата удаления в корзину'),
+                ),
+                migrations.AlterField(
+                    model_name='note',
+                    name='updated_at',
+                    field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(drop_single_column_indexes, create_single_column_indexes),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='checklistitem',
+            index=models.Index(fields=['note', 'order', 'id'], name='item_note_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checklistitem',
+            index=models.Index(fields=['note', 'updated_at'], name='item_note_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='label',
+            index=models.Index(fields=['user', 'updated_at'], name='label_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_archived', False), ('is_trashed', False)), fields=['user', '-is_pinned', 'position', '-updated_at', 'id'], name='note_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_archived', True), ('is_trashed', False)), fields=['user', '-is_pinned', 'position', '-updated_at', 'id'], name='note_archive_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_trashed', True)), fields=['user', '-is_pinned', 'position', '-updated_at', 'id'], name='note_trash_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_archived', False), ('is_trashed', False), ('reminder_date__isnull', False)), fields=['user', 'reminder_date', 'id'], name='note_reminder_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'updated_at'], name='note_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'created_at'], name='note_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'position'], name='note_user_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(condition=models.Q(('is_trashed', True)), fields=['trashed_at'], name='note_trash_expiry_idx'),
+        ),
+    ]
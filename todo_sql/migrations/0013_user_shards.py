@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Снятие внешних ключей на пользователя: при шардировании заметки, метки и надгробия
+# лежат не в той базе, что auth_user (см. shards.py). На SQLite это пересоздает таблицы;
+# триггер поискового индекса восстанавливается после migrate (apps.ensure_search_index).
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo_sql', '0012_list_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='label',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='labels', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='notes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='object_id',
+            field=models.PositiveBigIntegerField(verbose_name='ID объекта'),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.CreateModel(
+            name='ShardAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.CharField(max_length=50, verbose_name='База')),
+                ('moving', models.BooleanField(default=False, verbose_name='Переносится')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='shard_assignment', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Шард пользователя',
+                'verbose_name_plural': 'Шарды пользователей',
+            },
+        ),
+    ]
@@ -1,15 +1,20 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils.text import Truncator
+from django.utils import timezone
 
 class Label(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='labels', verbose_name="Пользователь")
+    # db_constraint=False: при шардировании (shards.py) метки лежат не в той базе, что пользователи
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='labels', db_constraint=False, verbose_name="Пользователь")
     name = models.CharField(max_length=50, verbose_name="Название")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     class Meta:
         unique_together = ('user', 'name')
         verbose_name = 'Метка'
         verbose_name_plural = 'Метки'
         ordering = ['name']
+        indexes = [models.Index(fields=['user', 'updated_at'], name='label_user_updated_idx')]
 
     def __str__(self):
         return self.name
@@ -30,40 +35,203 @@ class Note(models.Model):
         ('gray', 'Серый'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notes', verbose_name="Пользователь")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notes', db_constraint=False, verbose_name="Пользователь")
     title = models.CharField(max_length=200, blank=True, verbose_name="Заголовок")
     content = models.TextField(verbose_name="Содержимое", blank=True)
     color = models.CharField(max_length=20, choices=COLOR_CHOICES, default='white', verbose_name="Цвет")
-    is_pinned = models.BooleanField(default=False, verbose_name="Закреплено", db_index=True)
-    is_archived = models.BooleanField(default=False, verbose_name="В архиве", db_index=True)
-    is_trashed = models.BooleanField(default=False, verbose_name="В корзине", db_index=True)
+    # Флаги без собственных индексов: они входят в составные индексы списков (Meta.indexes)
+    is_pinned = models.BooleanField(default=False, verbose_name="Закреплено")
+    is_archived = models.BooleanField(default=False, verbose_name="В архиве")
+    is_trashed = models.BooleanField(default=False, verbose_name="В корзине")
+    # Когда заметка попала в корзину: по нему purge_trash удаляет старые (см. purge.py)
+    trashed_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата удаления в корзину")
     is_checklist = models.BooleanField(default=False, verbose_name="Режим чеклиста")
     labels = models.ManyToManyField(Label, related_name='notes', blank=True, verbose_name="Метки")
     reminder_date = models.DateTimeField(null=True, blank=True, verbose_name="Напоминание")
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания", db_index=True)
-    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления", db_index=True)
-    order = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Порядок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Старый порядок до ranking.py; запросы по нему больше не сортируют
+    order = models.PositiveIntegerField(default=0, verbose_name="Порядок")
+    # Ранг для ручной сортировки, см. ranking.py. Сравнивается как строка.
+    position = models.CharField(max_length=255, default='', blank=True, verbose_name="Позиция")
+
+    # Сводка для карточки в сетке (см. summaries.py): страница читается без JOIN'ов и без content
+    CONTENT_PREVIEW_LENGTH = 300
+    content_preview = models.CharField(max_length=CONTENT_PREVIEW_LENGTH, blank=True, default='', editable=False, verbose_name="Начало текста")
+    label_summary = models.JSONField(default=list, blank=True, editable=False, verbose_name="Метки (id, имя)")
+    checklist_total = models.PositiveIntegerField(default=0, editable=False, verbose_name="Пунктов в чеклисте")
+    checklist_checked = models.PositiveIntegerField(default=0, editable=False, verbose_name="Выполнено пунктов")
+    checklist_preview = models.JSONField(default=list, blank=True, editable=False, verbose_name="Первые пункты чеклиста")
 
     def __str__(self):
         return self.title if self.title else (self.content[:20] if self.content else "Note")
 
+    def save(self, *args, **kwargs):
+        # Как фильтр truncatechars:300, которым карточка раньше обрезала текст
+        self.content_preview = Truncator(self.content or '').chars(self.CONTENT_PREVIEW_LENGTH)
+        if self.is_trashed and self.trashed_at is None:
+            self.trashed_at = timezone.now()
+        elif not self.is_trashed:
+            self.trashed_at = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            if 'content' in update_fields:
+                update_fields = {*update_fields, 'content_preview'}
+            if 'is_trashed' in update_fields:
+                update_fields = {*update_fields, 'trashed_at'}
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
     @property
     def preview_checklist_items(self):
-        # Use list() to take advantage of prefetch_related if available
-        return list(self.checklist_items.all())[:5]
+        return self.checklist_preview
 
+    # Индексы под формы горячих запросов: пользователь + флаги раздела в условии
+    # частичного индекса, затем ровно порядок сортировки списка (с id из курсора).
+    # Страница читается проходом по индексу без сортировки в памяти.
+    # Проверяются через EXPLAIN в tests_indexes.py.
     class Meta:
         verbose_name = 'Заметка'
         verbose_name_plural = 'Заметки'
-        ordering = ['-is_pinned', 'order', '-updated_at']
+        ordering = ['-is_pinned', 'position', '-updated_at']
+        indexes = [
+            # Главная (NoteListView, API-список по умолчанию)
+            models.Index(
+                fields=['user', '-is_pinned', 'position', '-updated_at', 'id'],
+                condition=models.Q(is_archived=False, is_trashed=False), name='note_active_order_idx',
+            ),
+            models.Index(
+                fields=['user', '-is_pinned', 'position', '-updated_at', 'id'],
+                condition=models.Q(is_archived=True, is_trashed=False), name='note_archive_order_idx',
+            ),
+            models.Index(
+                fields=['user', '-is_pinned', 'position', '-updated_at', 'id'],
+                condition=models.Q(is_trashed=True), name='note_trash_order_idx',
+            ),
+            models.Index(
+                fields=['user', 'reminder_date', 'id'],
+                condition=models.Q(reminder_date__isnull=False, is_archived=False, is_trashed=False),
+                name='note_reminder_idx',
+            ),
+            # Дельта-синхронизация (sync.collect_changes), ?ordering=updated_at/created_at
+            models.Index(fields=['user', 'updated_at'], name='note_user_updated_idx'),
+            models.Index(fields=['user', 'created_at'], name='note_user_created_idx'),
+            # Ранг для новой заметки (ranking.first_key) и перестановки
+            models.Index(fields=['user', 'position'], name='note_user_position_idx'),
+            # Удаление из корзины по сроку (purge.purge_expired)
+            models.Index(fields=['trashed_at'], condition=models.Q(is_trashed=True), name='note_trash_expiry_idx'),
+        ]
 
 class ChecklistItem(models.Model):
     note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='checklist_items', verbose_name="Заметка")
     text = models.CharField(max_length=255, verbose_name="Текст")
     is_checked = models.BooleanField(default=False, verbose_name="Выполнено")
     order = models.PositiveIntegerField(default=0, verbose_name="Порядок")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     class Meta:
         ordering = ['order']
         verbose_name = 'Пункт чеклиста'
         verbose_name_plural = 'Пункты чеклиста'
+        indexes = [
+            # Пункты заметки по порядку (summaries.ITEM_ORDERING, /notes/{id}/checklist/)
+            models.Index(fields=['note', 'order', 'id'], name='item_note_order_idx'),
+            # Дельта-синхронизация (sync.collect_changes)
+            models.Index(fields=['note', 'updated_at'], name='item_note_updated_idx'),
+        ]
+
+
+class Tombstone(models.Model):
+    """Запись о безвозвратном удалении объекта для дельта-синхронизации клиентов."""
+    KIND_NOTE = 'note'
+    KIND_LABEL = 'label'
+    KIND_CHECKLIST_ITEM = 'checklist_item'
+    KIND_CHOICES = [
+        (KIND_NOTE, 'Заметка'),
+        (KIND_LABEL, 'Метка'),
+        (KIND_CHECKLIST_ITEM, 'Пункт чеклиста'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones', db_constraint=False, verbose_name="Пользователь")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Тип объекта")
+    # ID на шардах начинаются с shards.ID_STEP * номер шарда — больше 32 бит
+    object_id = models.PositiveBigIntegerField(verbose_name="ID объекта")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="Дата удаления")
+
+    class Meta:
+        verbose_name = 'Удаленный объект'
+        verbose_name_plural = 'Удаленные объекты'
+        indexes = [models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx')]
+
+
+class AccountDeletion(models.Model):
+    """
+    Удаление аккаунта в фоне (см. accounts.py). Запись переживает самого
+    пользователя: по ней задача продолжает работу после сбоя, а в stats
+    остаются время и число строк по этапам.
+    """
+    STAGE_NOTES = 'notes'
+    STAGE_LABELS = 'labels'
+    STAGE_TOMBSTONES = 'tombstones'
+    STAGE_USER = 'user'
+    STAGE_DONE = 'done'
+    STAGE_CHOICES = [
+        (STAGE_NOTES, 'Заметки'),
+        (STAGE_LABELS, 'Метки'),
+        (STAGE_TOMBSTONES, 'Надгробия синхронизации'),
+        (STAGE_USER, 'Пользователь'),
+        (STAGE_DONE, 'Завершено'),
+    ]
+
+    # Не ForeignKey: строка пользователя удаляется последней, а запись остается
+    user_id = models.PositiveIntegerField(unique=True, verbose_name="ID пользователя")
+    username = models.CharField(max_length=150, verbose_name="Имя пользователя")
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default=STAGE_NOTES, verbose_name="Этап")
+    requested_at = models.DateTimeField(default=timezone.now, verbose_name="Дата запроса")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начало удаления")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Окончание удаления")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Запусков")
+    stats = models.JSONField(default=dict, blank=True, verbose_name="Строк и секунд по этапам")
+    last_error = models.TextField(blank=True, default='', verbose_name="Последняя ошибка")
+
+    class Meta:
+        verbose_name = 'Удаление аккаунта'
+        verbose_name_plural = 'Удаления аккаунтов'
+
+    def __str__(self):
+        return f'{self.username} ({self.get_stage_display()})'
+
+
+class TrashPurge(models.Model):
+    """
+    Запрошенная очистка корзины (см. purge.py). Фоновая задача теряется при
+    рестарте; по записи команда process_trash_purges доводит очистку до конца.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='trash_purge', verbose_name="Пользователь")
+    requested_at = models.DateTimeField(default=timezone.now, verbose_name="Дата запроса")
+
+    class Meta:
+        verbose_name = 'Очистка корзины'
+        verbose_name_plural = 'Очистки корзины'
+
+    def __str__(self):
+        return f'{self.user_id} ({self.requested_at:%Y-%m-%d %H:%M})'
+
+
+class ShardAssignment(models.Model):
+    """
+    Каталог шардов (см. shards.py): в какой базе лежат заметки пользователя.
+    Хранится в основной базе. Пользователи без записи — в 'default'.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='shard_assignment', verbose_name="Пользователь")
+    shard = models.CharField(max_length=50, verbose_name="База")
+    # Идет перенос (rebalance_shards): изменения пользователя временно отклоняются
+    moving = models.BooleanField(default=False, verbose_name="Переносится")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = 'Шард пользователя'
+        verbose_name_plural = 'Шарды пользователей'
+
+    def __str__(self):
+        return f'{self.user_id} → {self.shard}'
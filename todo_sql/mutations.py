@@ -0,0 +1,100 @@
+"""
+Изменения заметок фиксированным числом SQL-запросов.
+
+`update_returning` меняет строку и читает результат одним UPDATE ... RETURNING
+(PostgreSQL и SQLite >= 3.35; для остальных СУБД — .update() и отдельный SELECT).
+`add_label` / `remove_label` работают со всей выборкой сразу, без цикла по заметкам
+(и пересчитывают сводки карточек затронутых заметок, см. summaries.py).
+"""
+from django.db import connections, transaction
+from django.db.models import sql
+
+from . import summaries
+
+
+def supports_returning(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def _convert(connection, field, value):
+    # Те же конвертеры, что применяет ORM при чтении (bool в SQLite, aware datetime и т.д.)
+    col = field.get_col(field.model._meta.db_table)
+    for converter in connection.ops.get_db_converters(col) + col.get_db_converters(connection):
+        value = converter(value, col, connection)
+    return value
+
+
+def update_returning(queryset, values, returning):
+    """
+    Выполняет queryset.update(**values) и возвращает dict с полями `returning`
+    первой измененной строки или None, если ни одна строка не подошла.
+
+    Рассчитан на queryset, выбирающий одну строку (например, по pk).
+    """
+    connection = connections[queryset.db]
+    if not supports_returning(connection):
+        if not queryset.update(**values):
+            return None
+        return queryset.values(*returning).first()
+
+    model = queryset.model
+    fields = [model._meta.get_field(name) for name in returning]
+    query = queryset.query.chain(sql.UpdateQuery)
+    query.add_update_values(values)
+    compiler = query.get_compiler(queryset.db)
+    compiler.pre_sql_setup()
+    update_sql, params = compiler.as_sql()
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'{update_sql} RETURNING {columns}', params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return {field.name: _convert(connection, field, value) for field, value in zip(fields, row)}
+
+
+def add_label(queryset, label, **values):
+    """
+    Вешает метку на все заметки выборки фиксированным числом запросов:
+    UPDATE тех, у кого метки еще нет, INSERT ... SELECT в связь и пересчет сводок.
+    Возвращает число заметок, получивших метку.
+    """
+    through = queryset.model.labels.through
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    note_column = qn(through._meta.get_field('note').column)
+    label_column = qn(through._meta.get_field('label').column)
+
+    missing = queryset.exclude(labels=label)
+    with transaction.atomic(using=queryset.db):
+        note_ids = list(missing.order_by().values_list('pk', flat=True))
+        count = missing.update(**values) if values else len(note_ids)
+        select_sql, params = missing.order_by().values_list('pk', flat=True).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {qn(through._meta.db_table)} ({note_column}, {label_column}) '
+                f'SELECT selection.pk, %s FROM ({select_sql}) selection',
+                [label.pk, *params],
+            )
+        summaries.refresh(note_ids, using=queryset.db)
+    return count
+
+
+def remove_label(queryset, label, **values):
+    """Снимает метку с заметок выборки: UPDATE и один DELETE по связи."""
+    through = queryset.model.labels.through
+    labelled = queryset.filter(labels=label)
+    with transaction.atomic(using=queryset.db):
+        note_ids = list(labelled.order_by().values_list('pk', flat=True))
+        count = labelled.update(**values) if values else len(note_ids)
+        # У связи нет сигналов и зависимых моделей, поэтому ORM удаляет одним DELETE
+        through.objects.using(queryset.db).filter(
+            label=label, note__in=queryset.order_by().values('pk')
+        ).delete()
+        summaries.refresh(note_ids, using=queryset.db)
+    return count
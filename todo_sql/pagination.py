@@ -0,0 +1,224 @@
+"""
+Keyset-пагинация (по курсору) для списков заметок.
+
+Вместо OFFSET и COUNT(*) следующая страница выбирается условием «после ключа
+сортировки последней строки», поэтому глубокие страницы не медленнее первой,
+а вставки и удаления заметок не сдвигают уже показанные строки.
+
+Ключ сортировки берется из order_by самого queryset (или Meta.ordering), к нему
+всегда добавляется id для однозначности. Поля сортировки не должны быть NULL.
+Встроенная CursorPagination из DRF не подходит: она ведет позицию только
+по первому полю сортировки, а у заметок их несколько и в разных направлениях.
+"""
+import base64
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.http import Http404
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    # DjangoJSONEncoder обрезает микросекунды, а для сравнения нужна точная позиция
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(position, reverse=False):
+    payload = {'p': [_encode_value(value) for value in position]}
+    if reverse:
+        payload['r'] = 1
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (позиция, назад ли)."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        position = payload['p']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if not isinstance(position, list):
+        raise InvalidCursor(cursor)
+    return position, bool(payload.get('r'))
+
+
+def get_ordering(queryset):
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    if not all(isinstance(name, str) for name in ordering):
+        raise ValueError('Keyset-пагинация поддерживает только сортировку по именам полей.')
+    pk_name = queryset.model._meta.pk.name
+    ordering = [name.replace('pk', pk_name) if name.lstrip('-') == 'pk' else name for name in ordering]
+    if not any(name.lstrip('-') == pk_name for name in ordering):
+        ordering.append(pk_name)
+    return ordering
+
+
+def _output_field(queryset, name):
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    try:
+        return queryset.model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _coerce(queryset, ordering, position, cursor):
+    """
+    Значения курсора — к типам полей сортировки. Курсор приходит от клиента:
+    чужие типы дали бы ошибку в фильтре (500), поэтому любое несоответствие
+    — InvalidCursor.
+    """
+    if len(position) != len(ordering):
+        raise InvalidCursor(cursor)
+    values = []
+    for name, value in zip(ordering, position):
+        if value is None or isinstance(value, (dict, list)):
+            raise InvalidCursor(cursor)
+        field = _output_field(queryset, name.lstrip('-'))
+        if field is not None:
+            try:
+                value = field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise InvalidCursor(cursor)
+            # encode_cursor пишет время со смещением; без него позиция неоднозначна
+            if isinstance(value, datetime.datetime) and timezone.is_naive(value):
+                raise InvalidCursor(cursor)
+        values.append(value)
+    return values
+
+
+def _flip(name):
+    return name[1:] if name.startswith('-') else f'-{name}'
+
+
+def _position(row, ordering):
+    names = [name.lstrip('-') for name in ordering]
+    if isinstance(row, dict):
+        return [row[name] for name in names]
+    return [getattr(row, name) for name in names]
+
+
+def _after(ordering, position, reverse):
+    """(a, b, c) > (x, y, z) с учетом направления каждого поля."""
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, position):
+        field = name.lstrip('-')
+        lookup = 'gt' if name.startswith('-') == reverse else 'lt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    return condition
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate(queryset, cursor, page_size):
+    """Возвращает KeysetPage; пустой cursor — первая страница."""
+    ordering = get_ordering(queryset)
+    position, reverse = decode_cursor(cursor) if cursor else (None, False)
+    if position is not None:
+        position = _coerce(queryset, ordering, position, cursor)
+        queryset = queryset.filter(_after(ordering, position, reverse))
+    queryset = queryset.order_by(*([_flip(name) for name in ordering] if reverse else ordering))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    # Вперед: «дальше» есть, если выбрали лишнюю строку, «назад» — если пришли по курсору.
+    # Назад — наоборот.
+    has_next = position is not None if reverse else has_more
+    has_previous = has_more if reverse else position is not None
+    next_cursor = encode_cursor(_position(rows[-1], ordering)) if has_next and rows else None
+    previous_cursor = encode_cursor(_position(rows[0], ordering), reverse=True) if has_previous and rows else None
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """
+    Для PageNumberPagination: с параметром ?cursor= (можно пустым) список
+    отдается по курсору, без count и OFFSET. Без него — прежние номера страниц.
+    """
+    cursor_query_param = 'cursor'
+    keyset_page = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.keyset_page = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        try:
+            self.keyset_page = paginate(
+                queryset, request.query_params[self.cursor_query_param], self.get_page_size(request)
+            )
+        except InvalidCursor:
+            raise NotFound('Неверный курсор.')
+        return list(self.keyset_page)
+
+    def get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.keyset_page is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_cursor_link(self.keyset_page.next_cursor),
+            'previous': self.get_cursor_link(self.keyset_page.previous_cursor),
+            'results': data,
+        })
+
+
+class KeysetListMixin:
+    """Для ListView: страницы по ?cursor= с тем же курсором, что и в API."""
+    paginate_by = 12
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        try:
+            page = paginate(queryset, cursor, page_size)
+        except InvalidCursor:
+            raise Http404('Неверный курсор.')
+        return None, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,140 @@
+"""
+Безвозвратное удаление заметок пачками.
+
+QuerySet.delete() загружает каждую заметку и ее связи в память и держит
+блокировку записи все время удаления: на тысячах заметок в корзине это
+секунды заблокированного воркера (а в SQLite — и всех остальных писателей).
+Здесь заметки удаляются пачками по BATCH_SIZE, каждая — в своей короткой
+транзакции: сначала пункты чеклистов и связи с метками, потом сами заметки,
+по одному DELETE ... WHERE note_id IN (...) на таблицу. Строки поискового
+индекса удаляет сама БД (см. search.create_index).
+
+Очистка корзины из API идет в фоне (tasks.py), прогресс лежит в общем кэше.
+Фоновая задача теряется при рестарте, поэтому запрос записан в TrashPurge:
+прерванную очистку доводит команда process_trash_purges (deploy/trash-purges.timer).
+Заметки, пролежавшие в корзине дольше TRASH_RETENTION_DAYS, удаляет команда
+purge_trash (запускается по расписанию, см. deploy/purge-trash.timer).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from . import sync, tasks
+from .models import ChecklistItem, Note, Tombstone, TrashPurge
+
+BATCH_SIZE = 500
+PROGRESS_KEY = 'purge:trash:{}'
+PROGRESS_TIMEOUT = 60 * 60
+
+
+def retention():
+    return timedelta(days=getattr(settings, 'TRASH_RETENTION_DAYS', 7))
+
+
+def delete_in_batches(queryset, batch_size=BATCH_SIZE, progress=None):
+    """
+    Удаляет строки выборки пачками по pk одним DELETE на пачку, без загрузки
+    объектов и каскадов: зависимые строки вызывающий удаляет сам, раньше.
+    """
+    using = queryset.db
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            queryset.model.objects.using(using).filter(pk__in=pks)._raw_delete(using)
+        deleted += len(pks)
+        if progress is not None:
+            progress(deleted)
+    return deleted
+
+
+def purge_notes(queryset, batch_size=BATCH_SIZE, progress=None, tombstones=True):
+    """
+    Удаляет заметки выборки пачками, пишет надгробия для синхронизации
+    (tombstones=False — при удалении аккаунта, синхронизировать некого).
+    progress(deleted) вызывается после каждой пачки. Возвращает число удаленных.
+    """
+    using = queryset.db
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            # Блокировка: заметку, восстановленную из корзины между SELECT и DELETE,
+            # удалять нельзя. В PostgreSQL восстановление ждет конца пачки (или пачка
+            # перечитает строку и пропустит ее); SQLite и так пишет под BEGIN IMMEDIATE
+            rows = list(queryset.select_for_update().order_by('pk').values_list('pk', 'user_id')[:batch_size])
+            if not rows:
+                break
+            note_ids = [pk for pk, _ in rows]
+            # _raw_delete — тот же один DELETE, что Collector делает для fast delete,
+            # но без загрузки объектов и проверки сигналов (у связи с метками есть m2m_changed)
+            for model, field in ((ChecklistItem, 'note_id'), (Note.labels.through, 'note_id'), (Note, 'pk')):
+                model.objects.using(using).filter(**{f'{field}__in': note_ids})._raw_delete(using)
+
+            if tombstones:
+                by_user = defaultdict(list)
+                for pk, user_id in rows:
+                    by_user[user_id].append(pk)
+                for user_id, ids in by_user.items():
+                    sync.record_tombstones(user_id, Tombstone.KIND_NOTE, ids)
+                    sync.mark_changed(user_id)
+        deleted += len(rows)
+        if progress is not None:
+            progress(deleted)
+    return deleted
+
+
+def purge_expired(days=None, now=None, batch_size=BATCH_SIZE, progress=None, using=None):
+    """Удаляет заметки, лежащие в корзине дольше срока хранения (по умолчанию TRASH_RETENTION_DAYS)."""
+    now = now or timezone.now()
+    threshold = now - (retention() if days is None else timedelta(days=days))
+    return purge_notes(
+        Note.objects.using(using).filter(is_trashed=True, trashed_at__lt=threshold),
+        batch_size=batch_size, progress=progress,
+    )
+
+
+# --- Очистка корзины из API ---
+
+def _progress_cache():
+    return caches[getattr(settings, 'SYNC_CACHE_ALIAS', 'default')]
+
+
+def get_progress(user_id):
+    """{'total', 'deleted', 'finished'} последней очистки корзины или None."""
+    return _progress_cache().get(PROGRESS_KEY.format(user_id))
+
+
+def _set_progress(user_id, total, deleted, finished=False):
+    progress = {'total': total, 'deleted': deleted, 'finished': finished}
+    _progress_cache().set(PROGRESS_KEY.format(user_id), progress, PROGRESS_TIMEOUT)
+    return progress
+
+
+def _trash_before(user_id, requested_at):
+    # Только то, что лежало в корзине на момент запроса: удаленное в корзину
+    # позже (во время очистки или до ее возобновления) остается
+    return Note.objects.filter(user_id=user_id, is_trashed=True, trashed_at__lte=requested_at)
+
+
+def empty_trash(user_id, requested_at):
+    trashed = _trash_before(user_id, requested_at)
+    total = trashed.count()
+    deleted = purge_notes(trashed, progress=lambda deleted: _set_progress(user_id, total, deleted))
+    _set_progress(user_id, max(total, deleted), deleted, finished=True)
+    # Запрос, пришедший во время очистки, остается для process_trash_purges
+    TrashPurge.objects.filter(user_id=user_id, requested_at__lte=requested_at).delete()
+
+
+def schedule_empty_trash(user_id):
+    """Ставит очистку корзины в фон. Повторный вызов во время очистки ничего не добавляет."""
+    requested_at = timezone.now()
+    total = _trash_before(user_id, requested_at).count()
+    TrashPurge.objects.update_or_create(user_id=user_id, defaults={'requested_at': requested_at})
+    tasks.run_in_background(empty_trash, user_id, requested_at, key=f'purge:{user_id}')
+    return _set_progress(user_id, total, 0)
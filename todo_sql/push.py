@@ -0,0 +1,224 @@
+"""
+Push-уведомления клиентам об изменении заметок (SSE и long-poll поверх ASGI).
+
+Брокер раздает события подпискам пользователя. Реализация задается
+настройкой PUSH_BROKER:
+- SharedCacheBroker (по умолчанию) — события между воркерами через общий
+  кэш (settings.SYNC_CACHE_ALIAS: файл SQLite или Redis), поэтому воркеров
+  может быть сколько угодно;
+- InProcessBroker — только внутри процесса (один воркер, тесты).
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER = 'todo_sql.push.SharedCacheBroker'
+
+# Сколько событий копим для медленного клиента: события означают только
+# «что-то изменилось», поэтому лишние можно схлопывать.
+QUEUE_SIZE = 16
+
+
+class Subscription:
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Вызывается в потоке event loop подписчика
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """Раздает события подпискам в пределах одного процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+        self._sequences = defaultdict(int)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    async def asubscribe(self, user_id):
+        """Подписка из async view: брокер, которому нужен ввод-вывод, не блокирует event loop."""
+        return self.subscribe(user_id)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def sequence(self, user_id):
+        with self._lock:
+            return self._sequences[user_id]
+
+    def publish(self, user_id, event):
+        with self._lock:
+            self._sequences[user_id] += 1
+            event = dict(event, seq=self._sequences[user_id])
+        self._dispatch(user_id, event)
+        return event
+
+    def _dispatch(self, user_id, event):
+        # Публикация может прийти из любого потока (синхронные view под ASGI),
+        # поэтому события передаются в loop подписчика потокобезопасно.
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # loop уже закрыт — соединение оборвалось
+                self.unsubscribe(subscription)
+
+
+class SharedCacheBroker(InProcessBroker):
+    """
+    События между воркерами через общий кэш. Публикация увеличивает счетчик
+    пользователя и кладет последнее событие в кэш; фоновый поток каждого
+    воркера раз в POLL_INTERVAL секунд одним get_many читает последние
+    события пользователей, подписанных в этом воркере, и раздает новые.
+    Промежуточные события при этом могут схлопнуться — клиенту важно только
+    «что-то изменилось» и последняя версия. В своем воркере событие
+    доставляется сразу.
+    """
+    POLL_INTERVAL = 0.5
+    EVENT_TIMEOUT = 60 * 60 * 24
+
+    def __init__(self):
+        super().__init__()
+        self._delivered = {}
+        self._poller = None
+
+    def _cache(self):
+        return caches[settings.SYNC_CACHE_ALIAS]
+
+    def _event_key(self, user_id):
+        return f'push:event:{user_id}'
+
+    def subscribe(self, user_id):
+        return self._subscribe(user_id, self.sequence(user_id))
+
+    async def asubscribe(self, user_id):
+        # Чтение кэша блокирует (файл SQLite или сеть): не в потоке event loop
+        sequence = await sync_to_async(self.sequence, thread_sensitive=False)(user_id)
+        return self._subscribe(user_id, sequence)
+
+    def _subscribe(self, user_id, sequence):
+        # Счетчик прочитан до подписки: событие между ними доставит поток опроса
+        subscription = super().subscribe(user_id)
+        with self._lock:
+            # Доставлять только события после подписки
+            self._delivered.setdefault(user_id, sequence)
+        self._start_poller()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        super().unsubscribe(subscription)
+        with self._lock:
+            if subscription.user_id not in self._subscriptions:
+                self._delivered.pop(subscription.user_id, None)
+
+    def sequence(self, user_id):
+        event = self._cache().get(self._event_key(user_id))
+        return event['seq'] if event else 0
+
+    def publish(self, user_id, event):
+        cache = self._cache()
+        key = f'push:seq:{user_id}'
+        try:
+            seq = cache.incr(key)
+        except ValueError:
+            cache.add(key, 0, None)
+            seq = cache.incr(key)
+        event = dict(event, seq=seq)
+        cache.set(self._event_key(user_id), event, self.EVENT_TIMEOUT)
+        self._dispatch(user_id, event)
+        return event
+
+    def _dispatch(self, user_id, event):
+        with self._lock:
+            if user_id not in self._delivered or event['seq'] <= self._delivered[user_id]:
+                return
+            self._delivered[user_id] = event['seq']
+        super()._dispatch(user_id, event)
+
+    def _start_poller(self):
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name='push-broker', daemon=True)
+                self._poller.start()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.POLL_INTERVAL)
+            with self._lock:
+                user_ids = list(self._subscriptions)
+                if not user_ids:
+                    # Подписчиков нет — поток не нужен, следующий subscribe запустит новый
+                    self._poller = None
+                    return
+            try:
+                events = self._cache().get_many([self._event_key(user_id) for user_id in user_ids])
+            except Exception:
+                logger.exception('Не удалось прочитать события из общего кэша')
+                continue
+            for user_id in user_ids:
+                event = events.get(self._event_key(user_id))
+                if event is not None:
+                    self._dispatch(user_id, event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'PUSH_BROKER', DEFAULT_BROKER))()
+    return _broker
+
+
+def reset_broker():
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+def notify_user(user_id, **payload):
+    """
+    Сообщает подключенным клиентам пользователя, что его данные изменились.
+
+    Вызывается после коммита (см. `sync.mark_changed`).
+    """
+    return get_broker().publish(user_id, dict(payload, type='changed'))
+
+
+def format_sse(event):
+    return f"event: {event['type']}\nid: {event.get('seq', '')}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,101 @@
+"""
+Ранги заметок для ручной сортировки (drag-and-drop).
+
+Ранг — строка из цифр base36, которая сравнивается лексикографически, как
+дробь 0.xxx. Между любыми двумя рангами помещается третий, поэтому перенос
+карточки меняет одну строку. Ранги не оканчиваются на '0': иначе перед
+таким рангом могло бы не найтись места.
+
+При частых вставках в одно место ранги удлиняются; тогда `rebalance`
+раскладывает их заново, сохраняя порядок.
+"""
+from django.db import router, transaction
+
+from . import sync, tasks
+from .models import Note
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+# Ранг длиннее этого — повод пересчитать ранги пользователя в фоне
+MAX_KEY_LENGTH = 24
+
+
+class RankError(ValueError):
+    pass
+
+
+def _midpoint(a, b):
+    # a < b; '' — начало шкалы, None — конец
+    if b is not None:
+        n = 0
+        while (a[n] if n < len(a) else '0') == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def key_between(before=None, after=None):
+    """Ранг строго между `before` и `after` (None — край списка)."""
+    a = before or ''
+    if a.endswith('0') or (after and after.endswith('0')):
+        raise RankError(f'Некорректный ранг: {before!r}, {after!r}')
+    if after is not None and a >= after:
+        # В т.ч. пустой ранг справа: такой строке ранг еще не назначен
+        raise RankError(f'Ранги не упорядочены: {before!r} >= {after!r}')
+    return _midpoint(a, after)
+
+
+def spread_keys(count):
+    """`count` возрастающих рангов минимальной длины, равномерно по шкале."""
+    width = 1
+    while BASE ** width <= count * 2:
+        width += 1
+    step = BASE ** width // (count + 1)
+    keys = []
+    for i in range(1, count + 1):
+        value, digits = i * step, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append(''.join(reversed(digits)).rstrip('0'))
+    return keys
+
+
+def first_key(user):
+    """Ранг для новой заметки: выше всех остальных, как раньше order=0."""
+    first = (
+        Note.objects.filter(user=user).exclude(position='')
+        .order_by('position').values_list('position', flat=True).first()
+    )
+    key = key_between(None, first)
+    if len(key) > MAX_KEY_LENGTH:
+        schedule_rebalance(user.pk)
+    return key
+
+
+def rebalance(user_id):
+    """Раскладывает ранги пользователя заново в текущем порядке заметок."""
+    with transaction.atomic(using=router.db_for_write(Note)):
+        ids = list(
+            Note.objects.select_for_update().filter(user_id=user_id)
+            .order_by(*Note._meta.ordering, 'id').values_list('id', flat=True)
+        )
+        # updated_at не трогаем: порядок не меняется, клиентам синхронизировать нечего
+        Note.objects.bulk_update(
+            [Note(id=pk, position=key) for pk, key in zip(ids, spread_keys(len(ids)))],
+            ['position'], batch_size=500,
+        )
+        # Но ранги в курсорах страниц и закэшированные ответы (ключ — версия) устарели
+        sync.mark_changed(user_id)
+
+
+def schedule_rebalance(user_id):
+    tasks.run_in_background(rebalance, user_id, key=f'rebalance:{user_id}')
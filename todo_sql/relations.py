@@ -0,0 +1,95 @@
+"""
+Поля-ссылки по PK для сериализаторов записи.
+
+PrimaryKeyRelatedField из DRF ищет каждый PK отдельным запросом по всей
+таблице, а принадлежность пользователю приходилось проверять еще одним
+запросом. UserScopedRelatedField ищет только среди объектов текущего
+пользователя и разрешает все PK запроса одним IN-запросом: найденные объекты
+кэшируются в контексте корневого сериализатора, поэтому вложенные списки
+(пункты чеклиста) тоже не ходят в БД по одному разу на элемент.
+Чужой PK неотличим от несуществующего.
+"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    """many=True: все PK списка одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        self.child_relation.prefetch(data)
+        return [self.child_relation.to_internal_value(item) for item in data]
+
+
+class UserScopedRelatedField(serializers.PrimaryKeyRelatedField):
+    user_field = 'user'
+    cache_key = '_related_objects'
+
+    def __init__(self, **kwargs):
+        self.user_field = kwargs.pop('user_field', self.user_field)
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(**{self.user_field: request.user})
+
+    def _to_pk(self, data):
+        if isinstance(data, bool):
+            return None
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError, ValueError):
+            return None
+
+    def _found(self):
+        # Кэш общий для всего дерева сериализаторов одного запроса
+        cache = self.context.setdefault(self.cache_key, {})
+        return cache.setdefault(self.get_queryset().model._meta.label, {})
+
+    def prefetch(self, values):
+        """Загружает объекты для всех PK из values одним запросом."""
+        found = self._found()
+        missing = {pk for pk in map(self._to_pk, values) if pk is not None} - found.keys()
+        if missing:
+            found.update((obj.pk, obj) for obj in self.get_queryset().filter(pk__in=missing))
+        return found
+
+    def to_internal_value(self, data):
+        pk = self._to_pk(data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.prefetch([pk]).get(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class ScopedItemListSerializer(serializers.ListSerializer):
+    """
+    Вложенный список (many=True), чьи элементы ссылаются на объекты через
+    UserScopedRelatedField: перед разбором элементов PK всех ссылок
+    загружаются одним запросом на поле.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            for name, field in self.child.fields.items():
+                if isinstance(field, UserScopedRelatedField) and not field.read_only:
+                    field.prefetch([item[name] for item in data if isinstance(item, dict) and item.get(name) is not None])
+        return super().to_internal_value(data)
@@ -0,0 +1,112 @@
+"""
+Чтение с реплик.
+
+`ReplicaRouter` (settings.DATABASE_ROUTERS) пишет всегда в 'default' и
+читает тоже оттуда — кроме представлений с `replica_reads`: внутри них
+чтение идет на одну реплику из settings.DATABASE_REPLICAS (одну на весь
+запрос, чтобы страница и ее счетчики были согласованы). Фоновые задачи,
+команды и изменяющие запросы реплик не видят.
+
+Реплика отстает от основной базы, поэтому после изменения пользователь
+на READ_YOUR_WRITES_SECONDS "прилипает" к основной базе: sync.mark_changed
+вызывает `mark_wrote`, и все устройства пользователя в это время читают
+свежие данные. Окно должно быть больше отставания реплик: иначе ETag
+по версии из кэша (response_cache.py) закрепит у клиента старый ответ.
+
+Сессии, пользователи и права (PRIMARY_APPS) всегда читаются с основной
+базы: по ним проверяется вход, и отставание реплики разлогинило бы
+пользователя сразу после входа.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.template.response import TemplateResponse
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_APPS = {'auth', 'sessions', 'contenttypes', 'admin'}
+
+_replica = ContextVar('replica', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _cache():
+    return caches[settings.SYNC_CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f'db-primary:{user_id}'
+
+
+def mark_wrote(user_id):
+    """Следующие READ_YOUR_WRITES_SECONDS пользователь читает с основной базы."""
+    if replicas():
+        _cache().set(_key(user_id), 1, settings.READ_YOUR_WRITES_SECONDS)
+
+
+def recently_wrote(user_id):
+    return _cache().get(_key(user_id)) is not None
+
+
+def replica_reads(view):
+    """
+    Декоратор для представлений, которые только читают: функции (request, ...)
+    и методы (self, request, ...). GET/HEAD без недавних изменений у
+    пользователя читают с реплики, остальные запросы — с основной базы.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args[:2] if hasattr(arg, 'META'))
+        names = replicas()
+        if (
+            not names or request.method not in SAFE_METHODS
+            or (request.user.is_authenticated and recently_wrote(request.user.pk))
+        ):
+            return view(*args, **kwargs)
+        token = _replica.set(random.choice(names))
+        try:
+            response = view(*args, **kwargs)
+            # TemplateResponse читает данные при рендеринге — рендерим здесь, пока выбрана реплика
+            if isinstance(response, TemplateResponse):
+                response.render()
+            return response
+        finally:
+            _replica.reset(token)
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """Для представлений Django: GET через replica_reads."""
+
+    @replica_reads
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None:
+            return None
+        if model._meta.app_label in PRIMARY_APPS:
+            # Явно: хинт instance может указывать на объект с реплики (note.user)
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # Явно: иначе объект, прочитанный с реплики, сохранился бы туда же (instance._state.db)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема приходит на реплики вместе с данными
+        return db not in replicas()
@@ -0,0 +1,80 @@
+"""
+Условные ответы API по версии данных пользователя (см. sync.get_version).
+
+Пока версия не изменилась, ответ на тот же запрос тот же самый, поэтому:
+- ETag = версия + отпечаток запроса, на If-None-Match отвечаем 304 без запросов к БД;
+- по желанию (RESPONSE_CACHE_ENABLED) готовое тело ответа хранится в кэше
+  под ключом (пользователь, версия, запрос) и отдается без сериализации.
+Инвалидация не нужна: любое изменение поднимает версию и меняет ключ —
+запросы API, сохранения и удаления через ORM (signals.py), а массовые
+update()/bulk_* вызывают sync.mark_changed сами.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import sync
+
+CACHE_TIMEOUT = 300
+
+
+def _fingerprint(request):
+    query = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+    raw = repr((request.get_host(), request.path, query, request.accepted_renderer.format))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _not_modified(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def conditional(view_method):
+    """Декоратор для list/retrieve: ETag, 304 и необязательный кэш тела ответа."""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        user_id = request.user.pk
+        # Версию читаем до построения ответа: если данные изменятся параллельно,
+        # ETag окажется «старее» тела, и клиент просто перезапросит его позже.
+        version = sync.get_version(user_id)
+        fingerprint = _fingerprint(request)
+        etag = quote_etag(f'{version}-{fingerprint}')
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if _not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cache_enabled = getattr(settings, 'RESPONSE_CACHE_ENABLED', False)
+        key = f'response:{user_id}:{version}:{fingerprint}'
+        if cache_enabled:
+            cached = _cache().get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                for name, value in headers.items():
+                    response[name] = value
+                return response
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            for name, value in headers.items():
+                response[name] = value
+            if cache_enabled:
+                def store(rendered):
+                    _cache().set(key, (rendered.content, rendered['Content-Type']), CACHE_TIMEOUT)
+                response.add_post_render_callback(store)
+        return response
+    return wrapper
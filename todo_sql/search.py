@@ -0,0 +1,208 @@
+"""
+Полнотекстовый поиск по заметкам.
+
+Индекс хранится в отдельной таблице рядом с `todo_sql_note`:
+- SQLite: виртуальная таблица FTS5 (rowid = id заметки);
+- PostgreSQL: таблица с колонкой tsvector и GIN-индексом.
+
+Индекс обновляется из приложения (`update_index`) при записи заметок и пунктов
+чеклиста, а удаление строк индекса делает сама БД (триггер / ON DELETE CASCADE),
+поэтому каскадные удаления заметок не требуют сигналов.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import FloatField, Q, TextField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Note, ChecklistItem
+
+FTS_TABLE = 'todo_sql_note_fts'
+PG_TABLE = 'todo_sql_note_search'
+PG_CONFIG = 'simple'
+
+# Маркеры подсветки: управляющие символы не встречаются в пользовательском вводе,
+# поэтому текст сниппета можно безопасно экранировать, а маркеры заменить на <mark>.
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+SNIPPET_TOKENS = 12
+BATCH_SIZE = 500
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _connection(using=None):
+    return connections[using or router.db_for_write(Note)]
+
+
+def is_supported(conn):
+    return conn.vendor in ('sqlite', 'postgresql')
+
+
+def _tables():
+    return Note._meta.db_table, ChecklistItem._meta.db_table
+
+
+# --- Схема индекса (вызывается из миграции) ---
+
+def create_index(conn):
+    note_table, _ = _tables()
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(title, content, checklist, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_note_delete AFTER DELETE ON {note_table} "
+                f"BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+            )
+        elif conn.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+                f"note_id bigint PRIMARY KEY REFERENCES {note_table} (id) "
+                f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                f"title text NOT NULL, body text NOT NULL, document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_gin ON {PG_TABLE} USING GIN (document)"
+            )
+
+
+def drop_index(conn):
+    note_table, _ = _tables()
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_note_delete")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+
+# --- Наполнение индекса ---
+
+def _index_sql(conn, where):
+    note_table, item_table = _tables()
+    checklist = (
+        f"(SELECT string_agg(i.text, ' ' ORDER BY i.\"order\") FROM {item_table} i WHERE i.note_id = n.id)"
+        if conn.vendor == 'postgresql' else
+        f"(SELECT group_concat(i.text, ' ') FROM {item_table} i WHERE i.note_id = n.id)"
+    )
+    if conn.vendor == 'sqlite':
+        return (
+            f"INSERT INTO {FTS_TABLE} (rowid, title, content, checklist) "
+            f"SELECT n.id, n.title, n.content, COALESCE({checklist}, '') FROM {note_table} n {where}"
+        )
+    return (
+        f"INSERT INTO {PG_TABLE} (note_id, title, body, document) "
+        f"SELECT n.id, n.title, n.content || ' ' || COALESCE({checklist}, ''), "
+        f"setweight(to_tsvector('{PG_CONFIG}', n.title), 'A') || "
+        f"setweight(to_tsvector('{PG_CONFIG}', n.content), 'B') || "
+        f"setweight(to_tsvector('{PG_CONFIG}', COALESCE({checklist}, '')), 'C') "
+        f"FROM {note_table} n {where} "
+        f"ON CONFLICT (note_id) DO UPDATE SET title = EXCLUDED.title, "
+        f"body = EXCLUDED.body, document = EXCLUDED.document"
+    )
+
+
+def update_index(note_ids, using=None):
+    """Пересобирает строки индекса для указанных заметок."""
+    conn = _connection(using)
+    if not is_supported(conn):
+        return
+    note_ids = [int(pk) for pk in note_ids if pk is not None]
+    with conn.cursor() as cursor:
+        for start in range(0, len(note_ids), BATCH_SIZE):
+            batch = note_ids[start:start + BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            if conn.vendor == 'sqlite':
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", batch)
+            cursor.execute(_index_sql(conn, f"WHERE n.id IN ({placeholders})"), batch)
+
+
+def rebuild_index(using=None):
+    conn = _connection(using)
+    if not is_supported(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE if conn.vendor == 'sqlite' else PG_TABLE}")
+        cursor.execute(_index_sql(conn, ''))
+
+
+# --- Поиск ---
+
+def tokenize(query):
+    return TOKEN_RE.findall((query or '').lower())
+
+
+def _search_sql(conn, tokens):
+    """Возвращает (ids_sql, rank_sql, snippet_sql, params) для текущей БД."""
+    note_table, _ = _tables()
+    if conn.vendor == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        lookup = f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        row = f"AND {FTS_TABLE}.rowid = {note_table}.id"
+        return (
+            f"SELECT rowid {lookup}",
+            # bm25 возвращает отрицательные значения: чем меньше, тем релевантнее.
+            f"SELECT -bm25({FTS_TABLE}, 10.0, 5.0, 1.0) {lookup} {row}",
+            f"SELECT snippet({FTS_TABLE}, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', {SNIPPET_TOKENS}) "
+            f"{lookup} {row}",
+            [match],
+        )
+    tsquery = ' & '.join(f'{token}:*' for token in tokens)
+    query = f"to_tsquery('{PG_CONFIG}', %s)"
+    row = f"WHERE s.note_id = {note_table}.id"
+    return (
+        f"SELECT note_id FROM {PG_TABLE} WHERE document @@ {query}",
+        f"SELECT ts_rank(s.document, {query}) FROM {PG_TABLE} s {row}",
+        f"SELECT ts_headline('{PG_CONFIG}', s.title || ' ' || s.body, {query}, "
+        f"'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords={SNIPPET_TOKENS}, "
+        f"MinWords=4, MaxFragments=1') FROM {PG_TABLE} s {row}",
+        [tsquery],
+    )
+
+
+def filter_notes(queryset, query, annotate=True):
+    """
+    Оставляет в queryset заметки, подходящие под поисковую строку.
+
+    С annotate=True добавляет `search_rank` (больше — релевантнее) и
+    `search_snippet` (фрагмент с маркерами подсветки, см. `highlight`).
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+
+    conn = connections[queryset.db]
+    if not is_supported(conn):
+        # Запасной вариант для остальных СУБД: прежний поиск через LIKE.
+        condition = Q()
+        for token in tokens:
+            condition &= (
+                Q(title__icontains=token) | Q(content__icontains=token) |
+                Q(checklist_items__text__icontains=token)
+            )
+        return queryset.filter(condition).distinct()
+
+    ids_sql, rank_sql, snippet_sql, params = _search_sql(conn, tokens)
+    queryset = queryset.filter(id__in=RawSQL(ids_sql, params))
+    if annotate:
+        queryset = queryset.annotate(
+            search_rank=RawSQL(rank_sql, params, output_field=FloatField()),
+            search_snippet=RawSQL(snippet_sql, params, output_field=TextField()),
+        )
+    return queryset
+
+
+def highlight(snippet):
+    """Экранирует сниппет и превращает маркеры совпадений в <mark>."""
+    if not snippet:
+        return None
+    return (
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
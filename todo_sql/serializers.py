@@ -1,6 +1,13 @@
-from rest_framework import serializers
-from django.utils import formats
-from .models import Note, Label, ChecklistItem
+from collections import defaultdict
+
+from rest_framework import exceptions, serializers
+from rest_framework.settings import ISO_8601, api_settings
+from django.conf import settings
+from django.utils import formats, timezone
+from . import checklist_ops, search, summaries, sync, text_delta
+from .pagination import get_ordering
+from .relations import ScopedItemListSerializer, UserScopedRelatedField
+from .models import Note, Label, ChecklistItem, Tombstone
 
 class LabelSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,42 +22,208 @@ class LabelSerializer(serializers.ModelSerializer):
 
 class ChecklistItemSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(required=False)
-    note = serializers.PrimaryKeyRelatedField(queryset=Note.objects.all(), required=False)
+    # Только заметки пользователя: чужая заметка для него «не существует»
+    note = UserScopedRelatedField(queryset=Note.objects.all(), required=False)
 
     class Meta:
         model = ChecklistItem
         fields = ['id', 'text', 'is_checked', 'order', 'note']
+        list_serializer_class = ScopedItemListSerializer
 
-    def validate_note(self, value):
-        if value and value.user != self.context['request'].user:
-            raise serializers.ValidationError("Вы не можете добавлять пункты в заметку другого пользователя.")
-        return value
+class ChecklistOpSerializer(serializers.Serializer):
+    """Одна операция пакета над чеклистом (см. checklist_ops.py)."""
+    REQUIRED = {
+        'add': ('text',),
+        'edit': ('id', 'text'),
+        'toggle': ('id',),
+        'move': ('id', 'order'),
+        'delete': ('id',),
+    }
+
+    op = serializers.ChoiceField(choices=checklist_ops.OPS)
+    id = serializers.IntegerField(required=False)
+    text = serializers.CharField(max_length=ChecklistItem._meta.get_field('text').max_length, required=False)
+    is_checked = serializers.BooleanField(required=False)
+    order = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        missing = [name for name in self.REQUIRED.get(attrs['op'], ()) if name not in attrs]
+        if missing:
+            raise serializers.ValidationError({name: 'Обязательное поле для этой операции.' for name in missing})
+        return attrs
+
+class ChecklistOpsSerializer(serializers.Serializer):
+    ops = ChecklistOpSerializer(many=True, allow_empty=False, max_length=checklist_ops.MAX_OPS)
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
+class NoteRepresentation:
+    """
+    Форма ответа о заметках из параметров запроса:
+    ?fields=id,title — только эти поля (id отдается всегда);
+    ?expand=checklist_items — в списке весь чеклист, а не первые пункты;
+    ?preview=1 — content обрезан на сервере (content_preview), полный текст не читается.
+    От формы зависят и колонки, которые читаются из БД (`columns`).
+    """
+    FIELDS = (
+        'id', 'title', 'content', 'color', 'is_pinned', 'is_archived', 'is_trashed', 'is_checklist',
+        'labels', 'checklist_items', 'checklist_total', 'checklist_checked', 'reminder_date',
+        'formatted_reminder_date', 'search_snippet', 'content_preview', 'created_at', 'updated_at',
+    )
+    EXPANDABLE = ('checklist_items',)
+    # Колонки Note, из которых строится поле (если не совпадают с его именем)
+    SOURCES = {
+        'labels': ('label_summary',),
+        'checklist_items': ('checklist_preview',),
+        'formatted_reminder_date': ('reminder_date',),
+        'search_snippet': (),
+    }
+
+    def __init__(self, fields=None, expand=(), preview=False):
+        self.fields = self.FIELDS if fields is None else tuple(
+            name for name in self.FIELDS if name == 'id' or name in fields
+        )
+        self.expand = frozenset(expand)
+        self.preview = preview
+
+    @classmethod
+    def from_query_params(cls, params):
+        fields = _split(params.get('fields')) or None
+        expand = _split(params.get('expand'))
+        errors = {}
+        unknown = set(fields or ()) - set(cls.FIELDS)
+        if unknown:
+            errors['fields'] = f"Неизвестные поля: {', '.join(sorted(unknown))}."
+        unknown = set(expand) - set(cls.EXPANDABLE)
+        if unknown:
+            errors['expand'] = f"Нельзя раскрыть: {', '.join(sorted(unknown))}."
+        if errors:
+            raise serializers.ValidationError(errors)
+        preview = params.get('preview', '').lower() in ('1', 'true', 'yes')
+        return cls(fields, expand, preview)
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def source(self, name):
+        if name == 'content' and self.preview:
+            return ('content_preview',)
+        if name == 'checklist_items' and name in self.expand:
+            # Полный чеклист читается отдельно, колонка сводки не нужна
+            return ()
+        return self.SOURCES.get(name, (name,))
+
+    def columns(self):
+        """Колонки Note, нужные для выбранных полей."""
+        columns = []
+        for name in self.fields:
+            columns.extend(column for column in self.source(name) if column not in columns)
+        return columns
+
+
+class EditConflict(exceptions.APIException):
+    status_code = 409
+    default_detail = 'Заметка изменилась после загрузки базовой версии.'
+    default_code = 'conflict'
 
 class NoteSerializer(serializers.ModelSerializer):
     checklist_items = ChecklistItemSerializer(many=True, required=False)
     labels = LabelSerializer(many=True, read_only=True)
-    label_ids = serializers.PrimaryKeyRelatedField(
+    label_ids = UserScopedRelatedField(
         many=True, queryset=Label.objects.all(), write_only=True, source='labels', required=False
     )
     reminder_date = serializers.DateTimeField(required=False, allow_null=True, input_formats=['%Y-%m-%dT%H:%M', 'iso-8601'])
     formatted_reminder_date = serializers.SerializerMethodField()
+    search_snippet = serializers.SerializerMethodField()
+    # Правка длинного текста: замены относительно версии base_updated_at (см. text_delta.py)
+    content_delta = serializers.JSONField(write_only=True, required=False)
+    base_updated_at = serializers.DateTimeField(write_only=True, required=False)
 
     class Meta:
         model = Note
         fields = [
             'id', 'title', 'content', 'color', 'is_pinned',
             'is_archived', 'is_trashed', 'is_checklist',
-            'labels', 'label_ids', 'checklist_items', 'reminder_date',
-            'formatted_reminder_date', 'created_at', 'updated_at'
+            'labels', 'label_ids', 'checklist_items', 'checklist_total', 'checklist_checked', 'reminder_date',
+            'formatted_reminder_date', 'search_snippet', 'content_preview', 'created_at', 'updated_at',
+            'content_delta', 'base_updated_at',
         ]
-        read_only_fields = ['created_at', 'updated_at', 'formatted_reminder_date']
+        read_only_fields = [
+            'created_at', 'updated_at', 'formatted_reminder_date', 'search_snippet',
+            'checklist_total', 'checklist_checked', 'content_preview',
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ленивый чеклист: пункты запрашиваются отдельно, постранично (/notes/<id>/checklist/)
+        if self.context.get('lazy_checklist'):
+            self.fields.pop('checklist_items')
+        representation = self.context.get('representation')
+        if representation is not None:
+            for name in [name for name, field in self.fields.items() if not field.write_only]:
+                if name not in representation:
+                    self.fields.pop(name)
+            if representation.preview and 'content' in self.fields:
+                self.fields['content'] = serializers.CharField(source='content_preview', read_only=True)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        items = data.get('checklist_items')
+        if items is not None:
+            # Экземпляр в ответе на запись мог прочитать сводку до summaries.refresh,
+            # а пункты загружены заново — считаем по ним
+            data['checklist_total'] = len(items)
+            data['checklist_checked'] = sum(1 for item in items if item['is_checked'])
+        return data
+
+    def validate(self, attrs):
+        base_updated_at = attrs.get('base_updated_at')
+        if base_updated_at is not None and self.instance is not None:
+            # Ранняя проверка, чтобы не собирать текст зря; атомарно версию захватывает update()
+            self.check_version(self.instance.updated_at, base_updated_at)
+        if 'content_delta' in attrs:
+            if self.instance is None or base_updated_at is None:
+                raise serializers.ValidationError({'content_delta': 'Дельта применяется только к существующей заметке с base_updated_at.'})
+            if 'content' in attrs:
+                raise serializers.ValidationError({'content_delta': 'Передайте либо content, либо content_delta.'})
+            try:
+                attrs['content'] = text_delta.apply(self.instance.content, text_delta.parse(attrs.pop('content_delta')))
+            except text_delta.DeltaError as exc:
+                raise serializers.ValidationError({'content_delta': str(exc)})
+        return attrs
+
+    def check_version(self, current, base_updated_at):
+        if current != base_updated_at:
+            raise EditConflict({
+                'detail': EditConflict.default_detail,
+                'updated_at': self.fields['updated_at'].to_representation(current),
+            })
+
+    def claim_version(self, instance, base_updated_at):
+        """
+        Сравнение и запись версии одним UPDATE: из двух правок от одной базы
+        пройдет только первая, вторая получит 409.
+        """
+        now = timezone.now()
+        claimed = Note.objects.filter(pk=instance.pk, updated_at=base_updated_at).update(updated_at=now)
+        if not claimed:
+            current = Note.objects.filter(pk=instance.pk).values_list('updated_at', flat=True).first()
+            self.check_version(current, base_updated_at)
+        instance.updated_at = now
 
     def get_formatted_reminder_date(self, obj):
         if obj.reminder_date:
             return formats.date_format(obj.reminder_date, "M j, H:i")
         return None
 
+    def get_search_snippet(self, obj):
+        # Аннотация есть только у результатов поиска (см. search.filter_notes)
+        return search.highlight(getattr(obj, 'search_snippet', None))
+
     def create(self, validated_data):
+        validated_data.pop('base_updated_at', None)
         checklist_items_data = validated_data.pop('checklist_items', [])
 
         # labels are handled automatically by label_ids source due to ManyToMany
@@ -70,10 +243,15 @@ class NoteSerializer(serializers.ModelSerializer):
         ]
         if checklist_items_to_create:
             ChecklistItem.objects.bulk_create(checklist_items_to_create)
+            search.update_index([note.pk])
+            summaries.refresh([note.pk])
 
         return note
 
     def update(self, instance, validated_data):
+        base_updated_at = validated_data.pop('base_updated_at', None)
+        if base_updated_at is not None:
+            self.claim_version(instance, base_updated_at)
         checklist_items_data = validated_data.pop('checklist_items', None)
         labels = validated_data.pop('labels', None)
 
@@ -85,6 +263,7 @@ class NoteSerializer(serializers.ModelSerializer):
         if checklist_items_data is not None:
             # Smart update
             existing_items = {item.id: item for item in instance.checklist_items.all()}
+            now = timezone.now()
             new_items_to_create = []
             items_to_update = []
 
@@ -99,6 +278,7 @@ class NoteSerializer(serializers.ModelSerializer):
                     item = existing_items.pop(item_id)
                     for attr, value in item_data.items():
                         setattr(item, attr, value)
+                    item.updated_at = now
                     items_to_update.append(item)
                 else:
                     # Create new
@@ -110,7 +290,7 @@ class NoteSerializer(serializers.ModelSerializer):
 
             # Bulk update existing items
             if items_to_update:
-                ChecklistItem.objects.bulk_update(items_to_update, ['text', 'is_checked', 'order'])
+                ChecklistItem.objects.bulk_update(items_to_update, ['text', 'is_checked', 'order', 'updated_at'])
 
             # Bulk create new items
             if new_items_to_create:
@@ -122,5 +302,93 @@ class NoteSerializer(serializers.ModelSerializer):
             # Delete remaining
             if existing_items:
                 instance.checklist_items.filter(id__in=existing_items.keys()).delete()
+                sync.record_tombstones(instance.user_id, Tombstone.KIND_CHECKLIST_ITEM, existing_items.keys())
+
+            # bulk-операции не вызывают post_save, поэтому индекс и сводку обновляем явно
+            search.update_index([instance.pk])
+            summaries.refresh([instance.pk])
 
         return instance
+
+
+class NoteListSerializer:
+    """
+    Быстрое представление списка заметок (только чтение) для NoteViewSet.list.
+
+    Строится из строк .values() со сводкой карточки (summaries.py) — одним
+    запросом, без полей DRF и экземпляров моделей. JSON совпадает с NoteSerializer,
+    но пунктов чеклиста не больше summaries.PREVIEW_ITEMS (счетчики — полные).
+    Набор полей и читаемые колонки задает NoteRepresentation.
+    """
+    search_fields = ('search_rank', 'search_snippet')
+
+    def __init__(self, rows, representation=None):
+        self.rows = rows
+        self.representation = representation or NoteRepresentation()
+
+    @classmethod
+    def prepare(cls, queryset, representation=None):
+        """Превращает queryset заметок в queryset строк только с нужными колонками."""
+        representation = representation or NoteRepresentation()
+        annotations = [name for name in cls.search_fields if name in queryset.query.annotations]
+        # Поля сортировки нужны keyset-пагинации для курсора
+        ordering = [name.lstrip('-') for name in get_ordering(queryset) if name.lstrip('-') not in annotations]
+        columns = dict.fromkeys(['id', *representation.columns(), *ordering])
+        return queryset.prefetch_related(None).values(*columns, *annotations)
+
+    @staticmethod
+    def _datetime_formatter():
+        field = serializers.DateTimeField()
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if not settings.USE_TZ or output_format is None or output_format.lower() != ISO_8601:
+            return field.to_representation
+        tz = field.default_timezone()
+
+        def to_representation(value):
+            # То же, что DateTimeField.to_representation для ISO 8601
+            if not value:
+                return None
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return to_representation
+
+    def _checklists(self, note_ids):
+        items = defaultdict(list)
+        rows = (
+            ChecklistItem.objects.filter(note_id__in=note_ids)
+            .order_by('note_id', *summaries.ITEM_ORDERING)
+            .values_list('note_id', 'id', 'text', 'is_checked', 'order')
+        )
+        for note_id, item_id, text, is_checked, order in rows:
+            items[note_id].append({'id': item_id, 'text': text, 'is_checked': is_checked, 'order': order})
+        return items
+
+    @property
+    def data(self):
+        rows = list(self.rows)
+        representation = self.representation
+        to_datetime = self._datetime_formatter()
+
+        if 'checklist_items' in representation.expand and 'checklist_items' in representation:
+            full_items = self._checklists([row['id'] for row in rows])
+            items = lambda row: full_items[row['id']]
+        else:
+            items = lambda row: row['checklist_preview']
+
+        builders = {
+            'content': lambda row: row['content_preview'] if representation.preview else row['content'],
+            'labels': lambda row: row['label_summary'],
+            'checklist_items': lambda row: [{**item, 'note': row['id']} for item in items(row)],
+            'reminder_date': lambda row: to_datetime(row['reminder_date']),
+            'formatted_reminder_date': lambda row: (
+                formats.date_format(row['reminder_date'], "M j, H:i") if row['reminder_date'] else None
+            ),
+            'search_snippet': lambda row: search.highlight(row.get('search_snippet')),
+            'created_at': lambda row: to_datetime(row['created_at']),
+            'updated_at': lambda row: to_datetime(row['updated_at']),
+        }
+        fields = [(name, builders.get(name)) for name in representation.fields]
+        return [
+            {name: build(row) if build else row[name] for name, build in fields}
+            for row in rows
+        ]
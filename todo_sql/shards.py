@@ -0,0 +1,406 @@
+"""
+Шардирование данных пользователей.
+
+С DB_SHARDS (config/database.py) заметки, метки, пункты чеклистов и
+надгробия пользователя лежат в одной из баз settings.DATABASE_SHARDS
+('default' и shard_1, shard_2, ...). Пользователи, права, сессии и сам
+каталог шардов (ShardAssignment) остаются в 'default'.
+
+- Новый пользователь получает базу по стабильному хэшу ID (`hashed`,
+  rendezvous hashing: при добавлении шарда переезжает только ~1/N
+  пользователей) и запись в каталоге. Пользователи без записи (созданные
+  до включения шардов) — в 'default'.
+- `ShardMiddleware` и `ShardMixin` (DRF) выбирают базу пользователя на
+  весь запрос, `ShardRouter` направляет туда все запросы к моделям из
+  SHARDED_MODELS: представлениям и сериализаторам ничего менять не нужно.
+  Фоновые задачи (tasks.py) продолжают в базе запроса.
+- Команды и админка работают без выбранного шарда и видят только
+  'default' (кроме объектов, полученных из шарда); команда, которой нужны
+  все шарды, обходит их сама (`aliases`, `use`), как purge_trash.
+- `move_user` (команда rebalance_shards) переносит пользователя без
+  остановки: на время копирования его изменения отклоняются (503), чтение
+  идет со старой базы. ID строк сохраняются: автоинкремент каждого шарда
+  начинается с index * ID_STEP (`prepare_shard`), поэтому диапазоны не
+  пересекаются. Диапазоны выше MAX_SHARDS * ID_STEP отданы таблицам SQLite,
+  которым перенос принес чужие ID.
+
+Реплики для чтения (replicas.py) шардированные модели не используют.
+"""
+import logging
+import time
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import JsonResponse
+from rest_framework.permissions import SAFE_METHODS
+
+from .models import ChecklistItem, Label, Note, ShardAssignment, Tombstone
+
+logger = logging.getLogger(__name__)
+
+SHARDED_MODELS = {'label', 'note', 'note_labels', 'checklistitem', 'tombstone'}
+
+# Диапазон ID на шард: у шарда с индексом i автоинкремент начинается с i * ID_STEP
+ID_STEP = 10 ** 12
+# Диапазоны с номера MAX_SHARDS — не шардам, а таблицам SQLite после переноса
+# (`_skip_foreign_ids`): иначе новый шард начал бы с уже занятых ID
+MAX_SHARDS = 1000
+COPY_BATCH_SIZE = 500
+# Сколько секунд клиенту ждать окончания переноса
+RETRY_AFTER = 5
+PLACEMENT_TIMEOUT = 60 * 60
+
+_shard = ContextVar('shard', default=None)
+
+
+class UserMoving(Exception):
+    """Пользователь переносится в другую базу: изменения временно отклоняются."""
+
+
+def aliases():
+    return getattr(settings, 'DATABASE_SHARDS', [])
+
+
+def enabled():
+    return bool(aliases())
+
+
+def current():
+    """База пользователя текущего запроса или задачи (None — не выбрана или шардов нет)."""
+    return _shard.get() if enabled() else None
+
+
+@contextmanager
+def use(alias):
+    token = _shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _shard.reset(token)
+
+
+def activate(alias):
+    """Выбирает базу до выхода из объемлющего use() (api_views.ShardMixin)."""
+    _shard.set(alias)
+
+
+def bind(func):
+    """func, которая выполнится в базе текущего шарда (для фоновых задач)."""
+    alias = current()
+    if alias is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with use(alias):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def commit_alias(using=None):
+    """База, где открыта транзакция: `using` (или шард запроса), иначе 'default'."""
+    alias = using or current()
+    if alias is None or not transaction.get_connection(alias).in_atomic_block:
+        alias = DEFAULT_DB_ALIAS
+    return alias
+
+
+def on_commit(func, using=None):
+    """transaction.on_commit в базе, где открыта транзакция: шарда или 'default'."""
+    transaction.on_commit(func, using=commit_alias(using))
+
+
+# --- Каталог ---
+
+def hashed(user_id, names=None):
+    """База по хэшу ID: у каждой базы свой вес crc32('база:id'), выбирается наибольший."""
+    return max(names or aliases(), key=lambda alias: zlib.crc32(f'{alias}:{user_id}'.encode()))
+
+
+def _cache():
+    return caches[settings.SYNC_CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f'shard:{user_id}'
+
+
+def placement(user_id):
+    """(база, идет ли перенос) по каталогу; каталог кэшируется в общем кэше."""
+    if not enabled():
+        return DEFAULT_DB_ALIAS, False
+    cached = _cache().get(_key(user_id))
+    if cached is None:
+        row = ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).values_list('shard', 'moving').first()
+        cached = tuple(row) if row else (DEFAULT_DB_ALIAS, False)
+        _cache().set(_key(user_id), cached, PLACEMENT_TIMEOUT)
+    return tuple(cached)
+
+
+def forget(user_id):
+    _cache().delete(_key(user_id))
+
+
+def assign(user):
+    """Новому пользователю — база по хэшу (signals.py)."""
+    if enabled():
+        ShardAssignment.objects.using(DEFAULT_DB_ALIAS).create(user_id=user.pk, shard=hashed(user.pk))
+        forget(user.pk)
+
+
+def shard_for(user, method=None):
+    """База для запроса пользователя. Изменяющий запрос во время переноса — UserMoving."""
+    if not enabled() or user is None or not user.is_authenticated:
+        return None
+    alias, moving = placement(user.pk)
+    if moving and method is not None and method not in SAFE_METHODS:
+        raise UserMoving(user.pk)
+    return alias
+
+
+def count(queryset):
+    """Число строк выборки во всех шардах (для статистики по всем пользователям)."""
+    if not enabled():
+        return queryset.count()
+    return sum(queryset.using(alias).count() for alias in aliases())
+
+
+# --- Запросы ---
+
+def moving_response():
+    response = JsonResponse({'detail': 'Данные переносятся, повторите запрос позже.'}, status=503)
+    response['Retry-After'] = str(RETRY_AFTER)
+    return response
+
+
+class ShardMiddleware:
+    """Выбирает базу пользователя сессии на весь запрос (после AuthenticationMiddleware)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+        try:
+            alias = shard_for(request.user, request.method)
+        except UserMoving:
+            return moving_response()
+        with use(alias):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+        try:
+            # Каталог и пользователь сессии читаются синхронно
+            alias = await sync_to_async(shard_for)(request.user, request.method)
+        except UserMoving:
+            return moving_response()
+        with use(alias):
+            return await self.get_response(request)
+
+
+class ShardRouter:
+    """
+    Шардированные модели — в базу текущего шарда. Без него (команды, админка)
+    — в базу объекта-подсказки или пользователя, к которому он относится.
+    Перед ReplicaRouter в settings.DATABASE_ROUTERS.
+    """
+
+    def _sharded(self, model):
+        return model._meta.app_label == Note._meta.app_label and model._meta.model_name in SHARDED_MODELS
+
+    def _db(self, model, hints):
+        if not enabled():
+            return None
+        instance = hints.get('instance')
+        if not self._sharded(model):
+            # note.user: пользователь в 'default', а не в базе заметки
+            if instance is not None and instance._state.db not in (None, DEFAULT_DB_ALIAS):
+                return DEFAULT_DB_ALIAS
+            return None
+        alias = current()
+        if alias is not None:
+            return alias
+        if instance is None:
+            return None
+        if isinstance(instance, User):
+            return placement(instance.pk)[0]
+        if instance._state.db is not None:
+            return instance._state.db
+        user_id = getattr(instance, 'user_id', None)
+        return placement(user_id)[0] if user_id else None
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if enabled() and self._sharded(type(obj1)) and self._sharded(type(obj2)):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема во всех шардах одинаковая
+        return None
+
+
+# --- Последовательности ID ---
+
+def _tables():
+    return [model._meta.db_table for model in (Label, Note, Note.labels.through, ChecklistItem, Tombstone)]
+
+
+def _sqlite_sequences(using):
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT name, seq FROM sqlite_sequence')
+        return {table: seq for table, seq in cursor.fetchall() if table in _tables()}
+
+
+def _set_sqlite_sequence(cursor, table, value):
+    cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [value, table])
+    if not cursor.rowcount:
+        cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, value])
+
+
+def prepare_shard(sender, using, **kwargs):
+    """post_migrate: автоинкремент шарда с индексом i начинается не ниже i * ID_STEP."""
+    if using not in aliases() or not aliases().index(using):
+        return
+    if aliases().index(using) >= MAX_SHARDS:
+        raise ImproperlyConfigured(f'Не больше {MAX_SHARDS} шардов: дальше ID заняты переносами.')
+    conn = connections[using]
+    start = aliases().index(using) * ID_STEP
+    current = _sqlite_sequences(using) if conn.vendor == 'sqlite' else {}
+    with conn.cursor() as cursor:
+        for table in _tables():
+            if conn.vendor == 'sqlite' and current.get(table, 0) < start:
+                _set_sqlite_sequence(cursor, table, start)
+            elif conn.vendor == 'postgresql':
+                cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f'SELECT last_value FROM {sequence}')
+                if cursor.fetchone()[0] < start:
+                    cursor.execute('SELECT setval(%s, %s)', [sequence, start])
+
+
+def _skip_foreign_ids(using, before):
+    """
+    После переноса в SQLite: следующий ID там — больше максимального в
+    таблице, а перенесенные строки могли прийти из диапазона другого шарда.
+    Тогда таблица получает новый диапазон — выше счетчиков всех шардов и
+    выше диапазонов шардов, которые еще могут добавить.
+    В PostgreSQL ручная вставка счетчик не трогает, там это не нужно.
+    """
+    with connections[using].cursor() as cursor:
+        for table in _tables():
+            cursor.execute(f'SELECT MAX(id) FROM {table}')
+            if (cursor.fetchone()[0] or 0) > before.get(table, 0):
+                highest = max(_sqlite_sequences(alias).get(table, 0) for alias in aliases())
+                _set_sqlite_sequence(cursor, table, max(highest // ID_STEP + 1, MAX_SHARDS) * ID_STEP)
+
+
+# --- Перенос ---
+
+def _set_moving(user_id, moving, shard=None):
+    values = {'moving': moving}
+    if shard is not None:
+        values['shard'] = shard
+    ShardAssignment.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        user_id=user_id, defaults=values, create_defaults={'shard': DEFAULT_DB_ALIAS, **values},
+    )
+    forget(user_id)
+
+
+def _user_rows(user_id):
+    through = Note.labels.through
+    # Порядок важен для PostgreSQL: сначала строки, на которые ссылаются внешние ключи
+    return [
+        (Label, {'user_id': user_id}),
+        (Note, {'user_id': user_id}),
+        (through, {'note__user_id': user_id}),
+        (ChecklistItem, {'note__user_id': user_id}),
+        (Tombstone, {'user_id': user_id}),
+    ]
+
+
+def _copy(model, lookup, source, target, batch_size):
+    fields = model._meta.concrete_fields
+    queryset = model._base_manager.using(source).filter(**lookup).order_by('pk')
+    copied, last = 0, None
+    while True:
+        batch = list((queryset.filter(pk__gt=last) if last is not None else queryset)[:batch_size])
+        if not batch:
+            return copied
+        # raw=True: как при loaddata — без auto_now и сигналов, значения полей как есть
+        model._base_manager.using(target)._insert(batch, fields=fields, raw=True, using=target)
+        copied += len(batch)
+        last = batch[-1].pk
+
+
+def move_user(user_id, target, batch_size=COPY_BATCH_SIZE, grace=2):
+    """
+    Переносит данные пользователя в базу target. Возвращает {модель: строк}.
+
+    1. Каталог: moving=True — изменения пользователя отклоняются; grace секунд
+       ждем запросы, которые начались до этого.
+    2. Копирование в target одной транзакцией (сбой ничего не оставляет),
+       сверка числа строк, поисковый индекс.
+    3. Каталог: новая база, moving=False. Со старой базы данные удаляются
+       пачками (purge.py).
+    """
+    from . import purge, search
+
+    if target not in aliases():
+        raise ValueError(f'Неизвестный шард: {target}')
+    source, _ = placement(user_id)
+    if source == target:
+        return {}
+
+    _set_moving(user_id, True)
+    try:
+        time.sleep(grace)
+        copied = {}
+        sqlite = connections[target].vendor == 'sqlite'
+        with transaction.atomic(using=target):
+            before = _sqlite_sequences(target) if sqlite else None
+            for model, lookup in _user_rows(user_id):
+                copied[model._meta.model_name] = _copy(model, lookup, source, target, batch_size)
+                expected = model._base_manager.using(source).filter(**lookup).count()
+                if model._base_manager.using(target).filter(**lookup).count() != expected:
+                    raise RuntimeError(f'{model._meta.label}: в {target} не совпало число строк')
+            search.update_index(
+                Note.objects.using(target).filter(user_id=user_id).values_list('id', flat=True), using=target,
+            )
+            if sqlite:
+                _skip_foreign_ids(target, before)
+    except BaseException:
+        _set_moving(user_id, False)
+        raise
+
+    _set_moving(user_id, False, shard=target)
+    logger.info('Пользователь %s перенесен из %s в %s: %s', user_id, source, target, copied)
+
+    with use(source):
+        purge.purge_notes(Note.objects.filter(user_id=user_id), batch_size, tombstones=False)
+        purge.delete_in_batches(Note.labels.through.objects.filter(label__user_id=user_id), batch_size)
+        purge.delete_in_batches(Label.objects.filter(user_id=user_id), batch_size)
+        purge.delete_in_batches(Tombstone.objects.filter(user_id=user_id), batch_size)
+    return copied
@@ -0,0 +1,41 @@
+"""
+Метки для бокового меню с числом активных заметок.
+
+Список нужен почти каждой HTML-странице, поэтому он хранится в кэше вместе
+с версией данных пользователя (sync.get_version) и считается заново одним
+агрегирующим запросом, только когда версия сменилась или запись сброшена.
+API поднимает версию на каждое изменение; правки через ORM (админка, shell)
+сбрасывают запись сигналами (см. signals.py).
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import sync
+from .models import Label
+
+CACHE_KEY = 'sidebar:labels:{}'
+CACHE_TIMEOUT = 60 * 60
+
+
+def _load(user_id):
+    return list(
+        Label.objects.filter(user_id=user_id)
+        .annotate(note_count=Count('notes', filter=Q(notes__is_archived=False, notes__is_trashed=False)))
+        .order_by('name').values('id', 'name', 'note_count')
+    )
+
+
+def get_labels(user_id):
+    """Список dict с id, name и note_count, отсортированный по имени."""
+    version = sync.get_version(user_id)
+    key = CACHE_KEY.format(user_id)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    labels = _load(user_id)
+    cache.set(key, (version, labels), CACHE_TIMEOUT)
+    return labels
+
+
+def invalidate(user_id):
+    cache.delete(CACHE_KEY.format(user_id))
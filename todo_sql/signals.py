@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import search, shards, sidebar, summaries, sync
+from .models import Note, Label, ChecklistItem
+
+
+# Поисковый индекс обновляется при сохранении заметки и её пунктов.
+# Удаления обрабатывает сама БД (см. search.create_index), поэтому
+# delete-сигналы здесь намеренно не используются: они отключили бы
+# быстрое каскадное удаление в ORM.
+@receiver(post_save, sender=Note)
+def index_note(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        search.update_index([instance.pk], using=using)
+        sidebar.invalidate(instance.user_id)
+        sync.mark_changed(instance.user_id, using=using)
+
+
+@receiver(post_save, sender=ChecklistItem)
+def index_checklist_item(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        search.update_index([instance.note_id], using=using)
+        summaries.refresh([instance.note_id], using=using)
+        sync.mark_changed(instance.note.user_id, using=using)
+
+
+# Боковое меню (sidebar.py): сигналы сбрасывают кэш и при правках мимо API.
+# Удаление метки через ORM без API сбросит кэш по версии (ниже) или таймауту.
+@receiver(post_save, sender=Label)
+def reset_sidebar_for_label(sender, instance, created=False, raw=False, using=None, **kwargs):
+    if not raw:
+        sidebar.invalidate(instance.user_id)
+        sync.mark_changed(instance.user_id, using=using)
+        if not created:
+            # Имя метки хранится в сводках ее заметок (summaries.py)
+            summaries.refresh_label(instance, using=using)
+
+
+@receiver(m2m_changed, sender=Note.labels.through)
+def reset_sidebar_for_note_labels(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    # instance — заметка или метка (note.labels.add / label.notes.add), у обеих есть user_id
+    if action == 'pre_clear' and reverse:
+        # После clear() заметок метки уже не найти
+        instance._cleared_note_ids = list(instance.notes.values_list('id', flat=True))
+    if not action.startswith('post_'):
+        return
+    sidebar.invalidate(instance.user_id)
+    sync.mark_changed(instance.user_id, using=using)
+    if not reverse:
+        note_ids = [instance.pk]
+    elif action == 'post_clear':
+        note_ids = getattr(instance, '_cleared_note_ids', [])
+    else:
+        note_ids = pk_set or []
+    summaries.refresh(note_ids, using=using)
+
+
+# Версия данных (sync.py) — ключ ETag и кэша ответов (response_cache.py): правки
+# мимо API (админка, shell) тоже должны ее поднять. Сохранения выше уже делают это,
+# здесь — удаления заметок и меток. У пунктов и связей с метками delete-сигналов
+# по-прежнему нет: каскад при удалении заметки остается быстрым. update() и bulk_*
+# сигналов не шлют: такие места вызывают sync.mark_changed сами (API, purge, ranking).
+@receiver(post_delete, sender=Note)
+@receiver(post_delete, sender=Label)
+def mark_deleted(sender, instance, using=None, **kwargs):
+    sync.mark_changed(instance.user_id, using=using)
+
+
+# Шард новому пользователю выбирается сразу: первая же заметка пойдет туда (shards.py)
+@receiver(post_save, sender=User)
+def assign_shard(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        shards.assign(instance)
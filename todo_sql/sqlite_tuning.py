@@ -0,0 +1,89 @@
+"""
+Профиль SQLite для нескольких воркеров.
+
+С журналом по умолчанию (DELETE) читатели и писатель мешают друг другу,
+каждая запись ждет fsync, а транзакция, которая сначала читает и потом
+пишет (BEGIN DEFERRED), при повышении блокировки сразу получает
+"database is locked": обработчик ожидания в этом случае не вызывается.
+
+Поэтому:
+- `apply_pragmas` на каждом новом соединении (сигнал connection_created)
+  выставляет settings.SQLITE_PRAGMAS: WAL, synchronous=NORMAL, mmap,
+  кэш страниц, временные таблицы в памяти и busy_timeout;
+- транзакции открываются как BEGIN IMMEDIATE (OPTIONS['transaction_mode']
+  в settings.DATABASES): блокировка записи берется в начале транзакции,
+  ожидание идет через busy_timeout, а взаимных блокировок нет;
+- `write_transaction` открывает такую транзакцию и, если за busy_timeout
+  блокировку получить не удалось, повторяет попытку с паузой не больше
+  settings.SQLITE_LOCK_RETRIES раз. Повторяется только BEGIN: тело
+  функции выполняется один раз.
+
+Отключается переменной окружения SQLITE_TUNING=False (для сравнения,
+см. benchmark_sqlite_concurrency.py).
+"""
+import logging
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+from . import shards
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повтором: RETRY_DELAY * 2**попытка, со случайным разбросом
+RETRY_DELAY = 0.05
+
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and any(message in str(exc) for message in LOCK_ERRORS)
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через sqlite3: запросы соединения еще не должны попадать в журнал и отладку
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name}={value}')
+
+
+def write_transaction(func=None, *, using=None, retries=None):
+    """
+    Выполняет func в transaction.atomic(using). Если блокировку записи не
+    удалось получить при открытии транзакции, повторяет попытку. Внутри уже
+    открытой транзакции просто вызывает func.
+    Можно использовать как @write_transaction и @write_transaction(using=...).
+    Без using — база текущего шарда (shards.py) или 'default'.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            alias = using or shards.current()
+            if transaction.get_connection(alias).in_atomic_block:
+                # Блокировку записи держит (или возьмет) внешняя транзакция
+                return func(*args, **kwargs)
+            attempts = 1 + (settings.SQLITE_LOCK_RETRIES if retries is None else retries)
+            for attempt in range(1, attempts + 1):
+                started = False
+                try:
+                    with transaction.atomic(using=alias):
+                        started = True
+                        return func(*args, **kwargs)
+                except OperationalError as exc:
+                    # Ошибка внутри тела или при COMMIT: тело уже выполнялось
+                    # (с побочными эффектами вне базы), повторять его нельзя
+                    if started or attempt == attempts or not is_lock_error(exc):
+                        raise
+                    delay = RETRY_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                    logger.warning(
+                        'База занята (%s), повтор %s/%s через %.2f с',
+                        getattr(func, '__name__', func), attempt, attempts - 1, delay,
+                    )
+                    time.sleep(delay)
+        return wrapper
+
+    return decorator if func is None else decorator(func)
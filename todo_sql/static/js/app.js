@@ -49,7 +49,7 @@ function initSortable() {
             const isNowPinned = newContainerId === 'pinned-notes';
             updateCardPinVisuals(item, isNowPinned);
             updateSectionTitles();
-            persistReorder();
+            persistMove(item, isNowPinned);
         }
     };
     if (typeof Sortable !== 'undefined') {
@@ -114,15 +114,21 @@ function updateSectionTitles() {
     }
 }
 
-async function persistReorder() {
-    const pinnedIds = Array.from(pinnedGrid.children).map(el => parseInt(el.dataset.id));
-    const otherIds = Array.from(otherGrid.children).map(el => parseInt(el.dataset.id));
+// Сообщаем серверу только соседей перенесенной карточки: он обновит одну строку
+async function persistMove(item, isPinned) {
+    let prev = item.previousElementSibling, next = item.nextElementSibling;
+    while (prev && !prev.classList.contains('note-card')) prev = prev.previousElementSibling;
+    while (next && !next.classList.contains('note-card')) next = next.nextElementSibling;
     try {
-        await fetch('/api/v1/notes/reorder/', {
+        await fetch(`/api/v1/notes/${item.dataset.id}/move/`, {
             method: 'POST', headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken },
-            body: JSON.stringify({ pinned_ids: pinnedIds, other_ids: otherIds })
+            body: JSON.stringify({
+                prev_id: prev ? parseInt(prev.dataset.id) : null,
+                next_id: next ? parseInt(next.dataset.id) : null,
+                is_pinned: isPinned,
+            })
         });
-    } catch (e) { console.error("Reorder failed", e); }
+    } catch (e) { console.error("Move failed", e); }
 }
 
 function showCreateNote(isChecklist = false) {
@@ -298,26 +304,34 @@ function createNoteCardHTML(note) {
         h3.textContent = note.title; contentDiv.appendChild(h3);
     }
 
+    if (note.search_snippet) {
+        // Сниппет приходит уже экранированным с сервера, размечены только <mark>
+        const snippet = el('p', 'search-snippet text-sm text-gray-800 dark:text-gray-200 break-words mb-2');
+        snippet.innerHTML = note.search_snippet; contentDiv.appendChild(snippet);
+    }
+
     if (note.is_checklist) {
         const ul = el('ul', 'space-y-1');
         note.checklist_items.slice(0, 5).forEach(item => {
             const li = el('li', 'flex items-start gap-2 text-sm text-gray-800 dark:text-gray-200');
             const spanIcon = el('span', 'material-symbols-outlined text-[18px] text-gray-400 hover:text-gray-600 dark:hover:text-gray-300 cursor-pointer transition-colors');
-            spanIcon.onclick = (e) => { e.stopPropagation(); toggleCheckbox(item.id, spanIcon); };
+            spanIcon.onclick = (e) => { e.stopPropagation(); toggleCheckbox(note.id, item.id, spanIcon); };
             spanIcon.textContent = item.is_checked ? 'check_box' : 'check_box_outline_blank';
             const spanText = el('span', `transition-all duration-200 break-all ${item.is_checked ? 'line-through text-gray-500' : ''}`);
             spanText.textContent = item.text;
             li.appendChild(spanIcon); li.appendChild(spanText); ul.appendChild(li);
         });
-        if (note.checklist_items.length > 5) {
+        // В списке приходят только первые пункты, полное число — в checklist_total
+        const checklistTotal = note.checklist_total ?? note.checklist_items.length;
+        if (checklistTotal > 5) {
             const liMore = el('li', 'text-xs text-gray-500 pl-7 font-medium');
-            liMore.textContent = `+ еще ${note.checklist_items.length - 5}`;
+            liMore.textContent = `+ еще ${checklistTotal - 5}`;
             ul.appendChild(liMore);
         }
         contentDiv.appendChild(ul);
     } else {
         const p = el('p', 'text-sm text-gray-800 dark:text-gray-200 whitespace-pre-wrap break-words max-h-60 overflow-hidden');
-        p.textContent = note.content.substring(0, 300); contentDiv.appendChild(p);
+        p.textContent = note.content_preview ?? note.content.substring(0, 300); contentDiv.appendChild(p);
     }
 
     if (note.reminder_date) {
@@ -410,7 +424,11 @@ async function togglePinNote(id) {
     }
 }
 
-async function toggleCheckbox(itemId, span) {
+// Клики по пунктам копятся и уходят одним пакетом операций на заметку
+const pendingChecklistOps = new Map();
+const CHECKLIST_FLUSH_DELAY = 400;
+
+function toggleCheckbox(noteId, itemId, span) {
     const isChecked = span.textContent.trim() === 'check_box';
     const newStatus = !isChecked;
     span.textContent = newStatus ? 'check_box' : 'check_box_outline_blank';
@@ -418,11 +436,38 @@ async function toggleCheckbox(itemId, span) {
     if(newStatus) textSpan.classList.add('line-through', 'text-gray-500');
     else textSpan.classList.remove('line-through', 'text-gray-500');
 
-    await fetch(`/api/v1/checklist-items/${itemId}/`, {
-        method: 'PATCH', headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken}, body: JSON.stringify({is_checked: newStatus})
-    });
+    const pending = pendingChecklistOps.get(noteId) || { ops: [], timer: null };
+    pending.ops.push({op: 'toggle', id: itemId, is_checked: newStatus});
+    clearTimeout(pending.timer);
+    pending.timer = setTimeout(() => flushChecklistOps(noteId), CHECKLIST_FLUSH_DELAY);
+    pendingChecklistOps.set(noteId, pending);
+}
+
+async function flushChecklistOps(noteId) {
+    const pending = pendingChecklistOps.get(noteId);
+    if (!pending) return;
+    pendingChecklistOps.delete(noteId);
+    try {
+        const res = await fetch(`/api/v1/notes/${noteId}/checklist/ops/`, {
+            method: 'POST', headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken}, body: JSON.stringify({ops: pending.ops})
+        });
+        if (!res.ok) throw new Error();
+    } catch (e) {
+        showToast("Не удалось сохранить отметки");
+    }
 }
 
+window.addEventListener('pagehide', () => {
+    // Несохраненные отметки — keepalive-запросом при уходе со страницы
+    pendingChecklistOps.forEach((pending, noteId) => {
+        clearTimeout(pending.timer);
+        fetch(`/api/v1/notes/${noteId}/checklist/ops/`, {
+            method: 'POST', keepalive: true, headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken}, body: JSON.stringify({ops: pending.ops})
+        });
+    });
+    pendingChecklistOps.clear();
+});
+
 let searchTimeout;
 if (globalSearch) {
     globalSearch.addEventListener('input', (e) => {
@@ -444,6 +489,10 @@ async function loadNotes(urlOrQuery) {
         const labelObj = window.userLabels.find(l => l.name === window.activeLabel);
         if (labelObj) url += `${separator}labels=${labelObj.id}&is_archived=false&is_trashed=false`;
     }
+    // Листаем по курсору: без COUNT(*) и OFFSET на сервере
+    if (!/[?&]cursor=/.test(url)) url += `${url.includes('?') ? '&' : '?'}cursor=`;
+    // Карточке хватает начала текста: полный content приходит только в окне редактирования
+    if (!/[?&]preview=/.test(url)) url += '&preview=1';
 
     try {
         const res = await fetch(url);
@@ -465,38 +514,16 @@ function renderPagination(data) {
     if (!container) return;
     if (!data.next && !data.previous) { container.innerHTML = ''; return; }
 
-    let currentPage = 1;
-    if (data.next) { const match = data.next.match(/page=(\d+)/); currentPage = match ? parseInt(match[1]) - 1 : 1; } 
-    else if (data.previous) { const match = data.previous.match(/page=(\d+)/); currentPage = match ? parseInt(match[1]) + 1 : 2; }
-
-    const totalPages = Math.ceil(data.count / 12);
-    if (totalPages <= 1) { container.innerHTML = ''; return; }
-
-    const getFrontendUrl = (pageNum) => {
-        let url = window.activeTab === 'archive' ? '/archive/' : window.activeTab === 'trash' ? '/trash/' : '/';
-        url += `?page=${pageNum}`;
-        const urlParams = new URLSearchParams(window.location.search);
-        if (urlParams.has('q')) { url += `&q=${urlParams.get('q')}`; }
-        return url;
-    };
-
-    const getApiUrl = (pageNum) => {
-        let url = window.activeTab === 'archive' ? '/api/v1/notes/?is_archived=true' : window.activeTab === 'trash' ? '/api/v1/notes/?is_trashed=true' : '/api/v1/notes/?is_archived=false&is_trashed=false';
-        if (window.activeTab === 'label' && window.activeLabel && window.userLabels) {
-            const labelObj = window.userLabels.find(l => l.name === window.activeLabel);
-            if (labelObj) url = `/api/v1/notes/?labels=${labelObj.id}&is_archived=false&is_trashed=false`;
-        }
-        url += `&page=${pageNum}`;
-        const urlParams = new URLSearchParams(window.location.search);
-        if (urlParams.has('q')) { url += `&search=${urlParams.get('q')}`; }
-        return url;
+    // Курсор общий для API и HTML-страниц, поэтому переносим его в адресную строку как есть
+    const getFrontendUrl = (apiUrl) => {
+        const params = new URLSearchParams(window.location.search);
+        params.delete('page');
+        params.set('cursor', new URL(apiUrl, window.location.origin).searchParams.get('cursor'));
+        return `${window.location.pathname}?${params}`;
     };
 
-    const nextFrontendUrl = data.next ? getFrontendUrl(currentPage + 1) : null;
-    const prevFrontendUrl = data.previous ? getFrontendUrl(currentPage - 1) : null;
-
-    const nextApiUrl = data.next ? getApiUrl(currentPage + 1) : null;
-    const prevApiUrl = data.previous ? getApiUrl(currentPage - 1) : null;
+    const nextFrontendUrl = data.next ? getFrontendUrl(data.next) : null;
+    const prevFrontendUrl = data.previous ? getFrontendUrl(data.previous) : null;
 
     const createBtn = (isNext, frontendUrl, apiUrl, disabled) => {
         if (disabled) {
@@ -515,11 +542,8 @@ function renderPagination(data) {
     container.innerHTML = '';
     const wrapper = document.createElement('div'); wrapper.className = "flex justify-center mt-8 pb-4 animate-fade-in-up";
     const nav = document.createElement('nav'); nav.className = "inline-flex items-center p-1 rounded-xl bg-white/30 dark:bg-black/30 backdrop-blur-md border border-white/20 dark:border-white/10 shadow-lg";
-    nav.appendChild(createBtn(false, prevFrontendUrl, prevApiUrl, !data.previous));
-    const pageInfo = document.createElement('span'); pageInfo.className = "px-4 py-2 text-sm font-medium text-gray-800 dark:text-gray-200";
-    pageInfo.textContent = `Страница ${currentPage} из ${totalPages}`;
-    nav.appendChild(pageInfo);
-    nav.appendChild(createBtn(true, nextFrontendUrl, nextApiUrl, !data.next));
+    nav.appendChild(createBtn(false, prevFrontendUrl, data.previous, !data.previous));
+    nav.appendChild(createBtn(true, nextFrontendUrl, data.next, !data.next));
     wrapper.appendChild(nav); container.appendChild(wrapper);
 }
 
@@ -612,6 +636,7 @@ async function openEditModal(id) {
     footer.append(doneBtn); content.append(footer);
 
     setEditColor(note.color);
+    editBase = { form: readEditForm(), updatedAt: note.updated_at };
     
     modal.classList.remove('hidden');
     setTimeout(() => {
@@ -668,13 +693,13 @@ function getColorClass(c) {
     return map[c];
 }
 
-async function saveEditedNote(id) {
-    const title = document.getElementById('edit-title').value;
-    const content = document.getElementById('edit-content') ? document.getElementById('edit-content').value : '';
-    const isPinned = document.getElementById('edit-is-pinned').value === 'true';
-    const isArchived = document.getElementById('edit-is-archived').value === 'true';
+// Снимок формы при открытии: при сохранении уходят только измененные поля,
+// а длинный текст — дельтой относительно загруженной версии (см. text_delta.py)
+let editBase = null;
+const CONTENT_DELTA_MIN_LENGTH = 2000;
+
+function readEditForm() {
     const isChecklist = document.getElementById('edit-is-checklist').value === 'true';
-    const color = document.getElementById('edit-color').value;
     const reminderDateInput = document.getElementById('edit-reminder-date');
     const reminderDate = reminderDateInput ? reminderDateInput.value : null;
 
@@ -684,11 +709,65 @@ async function saveEditedNote(id) {
             if(input.value.trim()) checklistItems.push({ text: input.value.trim(), is_checked: input.dataset.checked === 'true', order: index, id: input.dataset.id ? parseInt(input.dataset.id) : undefined });
         });
     }
+    return {
+        title: document.getElementById('edit-title').value,
+        content: document.getElementById('edit-content') ? document.getElementById('edit-content').value : '',
+        is_pinned: document.getElementById('edit-is-pinned').value === 'true',
+        is_archived: document.getElementById('edit-is-archived').value === 'true',
+        color: document.getElementById('edit-color').value,
+        checklist_items: isChecklist ? checklistItems : undefined,
+        reminder_date: reminderDate || null,
+    };
+}
 
-    await fetch(`/api/v1/notes/${id}/`, {
-        method: 'PATCH', headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken},
-        body: JSON.stringify({ title, content, is_pinned: isPinned, is_archived: isArchived, color, checklist_items: isChecklist ? checklistItems : undefined, reminder_date: reminderDate || null })
+function contentDelta(oldText, newText) {
+    // Позиции — в символах Unicode, как на сервере
+    const a = Array.from(oldText), b = Array.from(newText);
+    let prefix = 0;
+    while (prefix < a.length && prefix < b.length && a[prefix] === b[prefix]) prefix++;
+    let suffix = 0;
+    while (suffix < a.length - prefix && suffix < b.length - prefix && a[a.length - 1 - suffix] === b[b.length - 1 - suffix]) suffix++;
+    return [[prefix, a.length - suffix, b.slice(prefix, b.length - suffix).join('')]];
+}
+
+async function patchNote(id, body) {
+    return fetch(`/api/v1/notes/${id}/`, {
+        method: 'PATCH', headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrftoken}, body: JSON.stringify(body)
     });
+}
+
+async function saveEditedNote(id) {
+    const form = readEditForm();
+    const body = {};
+    for (const [key, value] of Object.entries(form)) {
+        if (!editBase || JSON.stringify(value) !== JSON.stringify(editBase.form[key])) body[key] = value;
+    }
+
+    if (Object.keys(body).length) {
+        if ('content' in body && editBase && editBase.form.content.length >= CONTENT_DELTA_MIN_LENGTH) {
+            const { content, ...rest } = body;
+            const content_delta = contentDelta(editBase.form.content, content);
+            let res = await patchNote(id, { ...rest, content_delta, base_updated_at: editBase.updatedAt });
+            if (res.status === 409) {
+                // Заметку успели изменить в другом месте: поверх чужой правки молча не пишем
+                const latest = await (await fetch(`/api/v1/notes/${id}/`)).json();
+                if (latest.content === editBase.form.content) {
+                    // Текст не меняли (только другие поля) — дельта ложится на новую версию
+                    res = await patchNote(id, { ...rest, content_delta, base_updated_at: latest.updated_at });
+                }
+                if (res.status === 409) {
+                    // Окно остается открытым с текстом пользователя; повторное сохранение
+                    // считается от новой версии и уже сознательно заменит чужую правку
+                    editBase = { form: { ...editBase.form, content: latest.content }, updatedAt: latest.updated_at };
+                    showToast('Заметку изменили на другом устройстве. Проверьте текст и сохраните еще раз.');
+                    return;
+                }
+            }
+        } else {
+            await patchNote(id, body);
+        }
+    }
+    editBase = null;
 
     closeEditModal({target: document.getElementById('edit-modal')});
     loadNotes(globalSearch ? globalSearch.value : '');
@@ -802,19 +881,96 @@ function enableLabelRename(id, span) {
 }
 
 // --- CLOUD SYNC LOGIC ---
-let lastSyncTime = new Date().toISOString();
-setInterval(async () => {
+// Вместо полной перезагрузки списка забираем дельту по курсору и патчим сетку.
+let syncCursor = null;
+
+async function initSyncCursor() {
     try {
-        const res = await fetch(`/api/v1/notes/check_updates/?last_sync=${encodeURIComponent(lastSyncTime)}`);
-        if (res.ok) {
+        const res = await fetch('/api/v1/notes/changes/');
+        if (res.ok) syncCursor = (await res.json()).cursor;
+    } catch(e) {}
+}
+document.addEventListener('DOMContentLoaded', initSyncCursor);
+
+function noteBelongsToTab(note) {
+    const active = !note.is_archived && !note.is_trashed;
+    switch (window.activeTab) {
+        case 'archive': return note.is_archived && !note.is_trashed;
+        case 'trash': return note.is_trashed;
+        case 'reminders': return active && !!note.reminder_date;
+        case 'label': return active && note.labels.some(l => l.name === window.activeLabel);
+        default: return active;
+    }
+}
+
+function applyChanges(data) {
+    if (data.labels.length || data.deleted.labels.length) {
+        const deletedLabels = new Set(data.deleted.labels);
+        const byId = new Map((window.userLabels || []).filter(l => !deletedLabels.has(l.id)).map(l => [l.id, l]));
+        data.labels.forEach(l => byId.set(l.id, {id: l.id, name: l.name}));
+        window.userLabels = Array.from(byId.values());
+    }
+
+    data.deleted.notes.forEach(id => {
+        const card = document.querySelector(`.note-card[data-id="${id}"]`);
+        if (card) card.remove();
+    });
+
+    data.notes.forEach(note => {
+        const card = document.querySelector(`.note-card[data-id="${note.id}"]`);
+        if (!noteBelongsToTab(note)) { if (card) card.remove(); return; }
+        if (card && card.dataset.pinned === String(note.is_pinned)) card.replaceWith(createNoteCardHTML(note));
+        else { if (card) card.remove(); prependNoteToGrid(note); }
+    });
+    updateSectionTitles();
+}
+
+async function pullChanges() {
+    if (!syncCursor) return initSyncCursor();
+    // Результаты поиска проще перезапросить целиком
+    if (globalSearch && globalSearch.value) return loadNotes(globalSearch.value);
+    try {
+        const res = await fetch(`/api/v1/notes/changes/?cursor=${encodeURIComponent(syncCursor)}`);
+        if (!res.ok) { syncCursor = null; return; }
+        const data = await res.json();
+        syncCursor = data.cursor;
+        if (data.reset) loadNotes('');
+        else applyChanges(data);
+    } catch(e) {}
+}
+
+// Сервер сам сообщает об изменениях: SSE, а если он недоступен (WSGI, прокси) — long-poll.
+function startPushChannel() {
+    if (!window.EventSource) return longPollChanges();
+    const source = new EventSource('/api/v1/events/');
+    let failures = 0;
+    source.addEventListener('open', () => { failures = 0; });
+    source.addEventListener('changed', () => pullChanges());
+    source.addEventListener('error', () => {
+        // CLOSED — сервер ответил ошибкой и переподключения не будет
+        if (source.readyState === EventSource.CLOSED || ++failures >= 3) {
+            source.close();
+            longPollChanges();
+        }
+    });
+}
+
+async function longPollChanges() {
+    let version = null;
+    while (true) {
+        try {
+            const url = version === null ? '/api/v1/events/poll/' : `/api/v1/events/poll/?since=${version}`;
+            const res = await fetch(url);
+            if (!res.ok) throw new Error(res.status);
             const data = await res.json();
-            if (data.has_updates) {
-                lastSyncTime = new Date().toISOString();
-                loadNotes(globalSearch ? globalSearch.value : '');
-            }
+            version = data.version;
+            if (data.changed) pullChanges();
+        } catch(e) {
+            await new Promise(resolve => setTimeout(resolve, 5000));
         }
-    } catch(e) {}
-}, 5000);
+    }
+}
+document.addEventListener('DOMContentLoaded', startPushChannel);
 
 function updateHeaders() {
     const tabHeaderContainer = document.getElementById('tab-header-container');
@@ -847,10 +1003,11 @@ async function emptyTrash() {
             headers: { 'X-CSRFToken': csrftoken }
         });
         if (res.ok) {
+            // Удаление идет в фоне пачками (202); из интерфейса заметки убираем сразу
             pinnedGrid.innerHTML = '';
             otherGrid.innerHTML = '';
             updateSectionTitles();
-            showToast('Корзина очищена');
+            showToast('Корзина очищается');
         } else {
             showToast('Ошибка при очистке корзины');
         }
@@ -860,6 +1017,29 @@ async function emptyTrash() {
     }
 }
 
+// Массовое действие над выборкой: selection — {ids: [...]} или {filter: {...}} с параметрами списка
+async function bulkNoteAction(action, selection, extra = {}) {
+    const res = await fetch('/api/v1/notes/bulk/', {
+        method: 'POST', headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken },
+        body: JSON.stringify({ action, ...selection, ...extra })
+    });
+    if (!res.ok) throw new Error('Bulk action failed');
+    return res.json();
+}
+
+async function restoreTrash() {
+    try {
+        const data = await bulkNoteAction('restore', { filter: { is_trashed: true } });
+        pinnedGrid.innerHTML = '';
+        otherGrid.innerHTML = '';
+        updateSectionTitles();
+        showToast(`Восстановлено заметок: ${data.updated}`);
+    } catch (e) {
+        console.error(e);
+        showToast('Ошибка при восстановлении');
+    }
+}
+
 function checkReminders() {
     const now = new Date();
     const cards = document.querySelectorAll('.note-card[data-reminder]');
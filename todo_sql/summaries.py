@@ -0,0 +1,82 @@
+"""
+Сводка для карточки заметки, хранящаяся прямо в строке Note.
+
+Сетке заметок нужны только метки (id и имя), счетчики и первые пункты
+чеклиста, начало текста — все это лежит в колонках label_summary,
+checklist_total, checklist_checked, checklist_preview и content_preview.
+Страница карточек читается одним запросом к одной таблице, без JOIN'ов
+и prefetch.
+
+content_preview считает сама модель в Note.save(). Остальное пересчитывает
+`refresh` — его вызывают везде, где меняются метки или пункты заметки
+(по тем же местам, что и search.update_index: bulk-операции не шлют сигналов).
+"""
+from django.db import router
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import ChecklistItem, Label, Note
+
+PREVIEW_ITEMS = 5
+ITEM_ORDERING = ('order', 'id')
+SUMMARY_FIELDS = ['label_summary', 'checklist_total', 'checklist_checked', 'checklist_preview']
+BATCH_SIZE = 500
+
+
+def build(note_ids, using=None):
+    """Сводки для заметок: {note_id: {поле: значение}} за три запроса."""
+    note_ids = list(note_ids)
+    summaries = {
+        pk: {'label_summary': [], 'checklist_total': 0, 'checklist_checked': 0, 'checklist_preview': []}
+        for pk in note_ids
+    }
+
+    label_rows = (
+        Note.labels.through.objects.using(using).filter(note_id__in=note_ids)
+        .order_by(*[f'label__{name}' for name in Label._meta.ordering], 'label_id')
+        .values_list('note_id', 'label_id', 'label__name')
+    )
+    for note_id, label_id, name in label_rows:
+        summaries[note_id]['label_summary'].append({'id': label_id, 'name': name})
+
+    count_rows = (
+        ChecklistItem.objects.using(using).filter(note_id__in=note_ids)
+        .values('note_id').order_by()
+        .annotate(total=Count('id'), checked=Count('id', filter=Q(is_checked=True)))
+        .values_list('note_id', 'total', 'checked')
+    )
+    for note_id, total, checked in count_rows:
+        summaries[note_id].update(checklist_total=total, checklist_checked=checked)
+
+    preview_rows = (
+        ChecklistItem.objects.using(using).filter(note_id__in=note_ids)
+        .annotate(rank=Window(RowNumber(), partition_by=F('note_id'), order_by=[F(name) for name in ITEM_ORDERING]))
+        .filter(rank__lte=PREVIEW_ITEMS)
+        .order_by('note_id', *ITEM_ORDERING)
+        .values_list('note_id', 'id', 'text', 'is_checked', 'order')
+    )
+    for note_id, item_id, text, is_checked, order in preview_rows:
+        summaries[note_id]['checklist_preview'].append(
+            {'id': item_id, 'text': text, 'is_checked': is_checked, 'order': order}
+        )
+    return summaries
+
+
+def refresh(note_ids, using=None):
+    """Пересчитывает сводки заметок. updated_at не трогает: его меняет сама запись."""
+    using = using or router.db_for_write(Note)
+    note_ids = sorted({int(pk) for pk in note_ids if pk is not None})
+    for start in range(0, len(note_ids), BATCH_SIZE):
+        batch = note_ids[start:start + BATCH_SIZE]
+        notes = [Note(id=pk, **values) for pk, values in build(batch, using).items()]
+        Note.objects.using(using).bulk_update(notes, SUMMARY_FIELDS)
+
+
+def refresh_label(label, using=None):
+    """После переименования метки — сводки всех ее заметок."""
+    refresh(Note.objects.using(using).filter(labels=label).values_list('id', flat=True), using)
+
+
+def for_cards(queryset):
+    """Заметки для сетки карточек: одна таблица, без полного текста."""
+    return queryset.defer('content')
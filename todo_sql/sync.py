@@ -0,0 +1,211 @@
+"""
+Дельта-синхронизация: курсоры и журнал удалений (tombstones).
+
+Курсор — непрозрачная для клиента строка с моментом времени на сервере.
+По нему отдаются только изменившиеся заметки, метки и пункты чеклиста,
+а безвозвратно удаленные объекты приходят списками ID.
+
+Версия данных — монотонный счетчик пользователя в общем для воркеров кэше
+(SYNC_CACHE_ALIAS). Проверка «есть ли изменения» читает только его.
+"""
+import base64
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import push, replicas, shards
+from .models import Note, Label, ChecklistItem, Tombstone
+
+# Запас на транзакции, закоммиченные чуть позже момента выдачи курсора.
+# Клиент применяет изменения идемпотентно, поэтому повторы не страшны.
+CURSOR_OVERLAP = timedelta(seconds=2)
+
+# Удаления старше этого срока не хранятся: такому клиенту нужна полная перезагрузка.
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+VERSION_KEY = 'sync:version:{}'
+CHANGED_AT_KEY = 'sync:changed_at:{}'
+
+# Рекомендуемый интервал опроса в зависимости от того, как давно менялись данные:
+# (простой меньше, интервал в секундах). Дольше часа — MAX_POLL_INTERVAL.
+POLL_BACKOFF = (
+    (timedelta(minutes=1), 5),
+    (timedelta(minutes=10), 15),
+    (timedelta(hours=1), 30),
+)
+MAX_POLL_INTERVAL = 60
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment):
+    payload = json.dumps({'t': moment.isoformat()}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        moment = parse_datetime(json.loads(base64.urlsafe_b64decode(padded))['t'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    # Курсоры выдаются со смещением; наивное время не сравнить с моментами в базе
+    if moment is None or timezone.is_naive(moment):
+        raise InvalidCursor(cursor)
+    return moment
+
+
+def record_tombstones(user_id, kind, object_ids):
+    now = timezone.now()
+    Tombstone.objects.bulk_create([
+        Tombstone(user_id=user_id, kind=kind, object_id=object_id, deleted_at=now)
+        for object_id in object_ids
+    ])
+
+
+def prune_tombstones(now=None, using=None):
+    """Удаляет надгробия старше TOMBSTONE_RETENTION (команда prune_tombstones)."""
+    now = now or timezone.now()
+    count, _ = Tombstone.objects.using(using).filter(deleted_at__lt=now - TOMBSTONE_RETENTION).delete()
+    return count
+
+
+def collect_changes(user, since):
+    """
+    Возвращает изменения пользователя после момента `since`.
+
+    Заметка считается измененной и тогда, когда изменились только её пункты
+    чеклиста: клиенту так проще перерисовать карточку целиком.
+    """
+    threshold = since - CURSOR_OVERLAP
+
+    checklist_items = list(ChecklistItem.objects.filter(note__user=user, updated_at__gt=threshold))
+    labels = list(Label.objects.filter(user=user, updated_at__gt=threshold))
+
+    touched_note_ids = {item.note_id for item in checklist_items}
+    notes = Note.objects.filter(user=user)
+    if touched_note_ids:
+        notes = notes.filter(updated_at__gt=threshold) | notes.filter(id__in=touched_note_ids)
+    else:
+        notes = notes.filter(updated_at__gt=threshold)
+    notes = notes.prefetch_related('labels', 'checklist_items')
+
+    deleted = {kind: [] for kind, _ in Tombstone.KIND_CHOICES}
+    tombstones = Tombstone.objects.filter(user=user, deleted_at__gt=threshold).values_list('kind', 'object_id')
+    for kind, object_id in tombstones:
+        deleted[kind].append(object_id)
+
+    return {
+        'notes': list(notes),
+        'labels': labels,
+        'checklist_items': checklist_items,
+        'deleted': {
+            'notes': deleted[Tombstone.KIND_NOTE],
+            'labels': deleted[Tombstone.KIND_LABEL],
+            'checklist_items': deleted[Tombstone.KIND_CHECKLIST_ITEM],
+        },
+    }
+
+
+def needs_reset(since, now=None):
+    """Курсор слишком старый: часть удалений уже вычищена из журнала."""
+    now = now or timezone.now()
+    return since < now - TOMBSTONE_RETENTION
+
+
+# --- Версия данных ---
+
+def _cache():
+    return caches[getattr(settings, 'SYNC_CACHE_ALIAS', 'default')]
+
+
+def _initial_version():
+    # Если ключ вытеснен из кэша, счетчик стартует с текущего времени в мкс,
+    # поэтому новая версия все равно больше выданных клиентам раньше
+    # (и остается точным целым для JavaScript).
+    return time.time_ns() // 1000
+
+
+def get_state(user_id):
+    """Возвращает (версия, время последнего изменения в секундах) за одно чтение кэша."""
+    cache = _cache()
+    version_key, changed_key = VERSION_KEY.format(user_id), CHANGED_AT_KEY.format(user_id)
+    values = cache.get_many([version_key, changed_key])
+    version = values.get(version_key)
+    changed_at = values.get(changed_key)
+    if version is None:
+        # Не знаем, что менялось до потери ключа: считаем, что только что
+        cache.add(version_key, _initial_version(), None)
+        version = cache.get(version_key)
+    if changed_at is None:
+        changed_at = time.time()
+        cache.add(changed_key, changed_at, None)
+    return version, changed_at
+
+
+def get_version(user_id):
+    return get_state(user_id)[0]
+
+
+def bump_version(user_id):
+    cache = _cache()
+    key = VERSION_KEY.format(user_id)
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+        version = cache.incr(key)
+    cache.set(CHANGED_AT_KEY.format(user_id), time.time(), None)
+    return version
+
+
+def poll_interval(changed_at, now=None):
+    idle = timedelta(seconds=max((now or time.time()) - changed_at, 0))
+    for threshold, interval in POLL_BACKOFF:
+        if idle < threshold:
+            return interval
+    return MAX_POLL_INTERVAL
+
+
+class _Change:
+    """Изменения пользователя в одной транзакции: версия поднимается один раз."""
+
+    def __init__(self, hooks):
+        # Список on_commit транзакции: после коммита или отката Django заводит новый
+        self.hooks = hooks
+        self.done = False
+
+
+def mark_changed(user_id, using=None):
+    """
+    Точка входа для всех изменений данных пользователя.
+
+    После коммита поднимает версию, уведомляет подключенных клиентов
+    и на время переключает чтение пользователя на основную базу (replicas.py).
+    Сколько бы раз за транзакцию ни вызвали (сигналы на каждое сохранение,
+    см. signals.py), версия поднимается один раз.
+    """
+    alias = shards.commit_alias(using)
+    conn = transaction.get_connection(alias)
+    pending = conn.__dict__.setdefault('sync_changes', {})
+    change = pending.get(user_id)
+    if change is None or change.done or change.hooks is not conn.run_on_commit:
+        change = pending[user_id] = _Change(conn.run_on_commit)
+
+    def changed():
+        if change.done:
+            return
+        change.done = True
+        if pending.get(user_id) is change:
+            del pending[user_id]
+        replicas.mark_wrote(user_id)
+        push.notify_user(user_id, version=bump_version(user_id))
+    transaction.on_commit(changed, using=alias)
@@ -0,0 +1,64 @@
+"""
+Фоновые задачи в пределах процесса.
+
+Задача запускается после коммита текущей транзакции в пуле потоков, чтобы
+не задерживать ответ. Для тяжелых или обязательных к выполнению задач нужна
+полноценная очередь; здесь — только то, что можно безболезненно потерять
+при рестарте (например, пересчет рангов заметок).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from . import shards
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='todo-tasks')
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _run(func, args, kwargs, key):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась с ошибкой', getattr(func, '__name__', func))
+    finally:
+        if key is not None:
+            with _pending_lock:
+                _pending.discard(key)
+        connections.close_all()
+
+
+def run_in_background(func, *args, key=None, **kwargs):
+    """
+    Выполняет func(*args, **kwargs) после коммита.
+
+    Пока задача с тем же `key` ждет или выполняется, повторная не ставится.
+    С BACKGROUND_TASKS_EAGER (тесты) задача выполняется сразу в текущем потоке.
+    Задача работает с базой того же шарда, что и вызвавший ее запрос.
+    """
+    func = shards.bind(func)
+
+    def submit():
+        if key is not None:
+            with _pending_lock:
+                if key in _pending:
+                    return
+                _pending.add(key)
+        if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            try:
+                func(*args, **kwargs)
+            finally:
+                if key is not None:
+                    with _pending_lock:
+                        _pending.discard(key)
+        else:
+            _executor.submit(_run, func, args, kwargs, key)
+
+    shards.on_commit(submit)
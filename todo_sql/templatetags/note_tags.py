@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from todo_sql import search
+
+register = template.Library()
+
+@register.filter(name='highlight_snippet')
+def highlight_snippet(value):
+    # search.highlight экранирует текст заметки сам, наружу выходят только <mark>
+    highlighted = search.highlight(value)
+    return mark_safe(highlighted) if highlighted else ''
@@ -0,0 +1,80 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from .models import AccountDeletion, Note, Label, ChecklistItem, Tombstone
+from . import accounts
+
+class AccountDeletionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='leaving', password='password')
+        self.other = User.objects.create_user(username='staying', password='password')
+        label = Label.objects.create(user=self.user, name="Work")
+        notes = Note.objects.bulk_create([Note(user=self.user, title=f"Note {i}") for i in range(12)])
+        for note in notes:
+            note.labels.add(label)
+        ChecklistItem.objects.bulk_create([ChecklistItem(note=note, text="item") for note in notes])
+        Tombstone.objects.create(user=self.user, kind=Tombstone.KIND_NOTE, object_id=999)
+        self.other_note = Note.objects.create(user=self.other, title="Чужая")
+        self.client = Client()
+        self.client.login(username='leaving', password='password')
+
+    def test_delete_account_view(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('delete_account'))
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        # До фоновой задачи аккаунт уже выключен, но данные на месте
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(Note.objects.filter(user=self.user).count(), 12)
+        self.assertFalse(self.client.login(username='leaving', password='password'))
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Note.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(Label.objects.filter(user_id=self.user.pk).exists())
+        self.assertEqual(ChecklistItem.objects.count(), 0)
+        self.assertEqual(list(Note.objects.all()), [self.other_note])
+
+        deletion = AccountDeletion.objects.get(user_id=self.user.pk)
+        self.assertEqual(deletion.stage, AccountDeletion.STAGE_DONE)
+        self.assertIsNotNone(deletion.finished_at)
+        self.assertEqual(deletion.stats[AccountDeletion.STAGE_NOTES]['rows'], 12)
+        self.assertEqual(deletion.stats[AccountDeletion.STAGE_LABELS]['rows'], 1)
+        self.assertEqual(deletion.stats[AccountDeletion.STAGE_TOMBSTONES]['rows'], 1)
+
+    def test_chunked_and_resumable(self):
+        deletion = AccountDeletion.objects.create(user_id=self.user.pk, username=self.user.username)
+
+        with mock.patch.object(accounts, 'CHUNK_SIZE', 5), \
+                mock.patch.object(accounts, 'STAGES', [
+                    (name, mock.Mock(side_effect=RuntimeError('сбой')) if name == AccountDeletion.STAGE_LABELS else func)
+                    for name, func in accounts.STAGES
+                ]):
+            with self.assertRaises(RuntimeError):
+                accounts.run(deletion.pk)
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.stage, AccountDeletion.STAGE_LABELS)
+        self.assertEqual(deletion.stats[AccountDeletion.STAGE_NOTES]['rows'], 12)
+        self.assertIn('сбой', deletion.last_error)
+        self.assertFalse(Note.objects.filter(user_id=self.user.pk).exists())
+        self.assertTrue(Label.objects.filter(user_id=self.user.pk).exists())
+
+        out = StringIO()
+        call_command('process_account_deletions', '--older-than', '0', stdout=out)
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.stage, AccountDeletion.STAGE_DONE)
+        self.assertEqual(deletion.attempts, 2)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertIn('labels', out.getvalue())
+
+        # Повторный запуск завершенного удаления ничего не делает
+        accounts.run(deletion.pk)
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.attempts, 2)
@@ -0,0 +1,71 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note, Label
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulker', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.work = Label.objects.create(user=self.user, name="Work")
+        self.red = [Note.objects.create(user=self.user, title=f"Red {i}", color='red') for i in range(5)]
+        self.blue = [Note.objects.create(user=self.user, title=f"Blue {i}", color='blue') for i in range(5)]
+        self.archived = Note.objects.create(user=self.user, title="Archived red", color='red', is_archived=True)
+        self.foreign = Note.objects.create(user=self.other, title="Foreign", color='red')
+
+    def bulk(self, **data):
+        return self.client.post('/api/v1/notes/bulk/', data, format='json')
+
+    def test_archive_by_ids_is_one_query(self):
+        ids = [n.id for n in self.red] + [self.foreign.id]
+        with self.assertNumQueries(1):
+            response = self.bulk(action='archive', ids=ids)
+        self.assertEqual(response.data, {'action': 'archive', 'updated': 5})
+        self.assertEqual(Note.objects.filter(user=self.user, is_archived=True).count(), 6)
+        self.foreign.refresh_from_db()
+        self.assertFalse(self.foreign.is_archived)
+
+    def test_filter_uses_list_semantics(self):
+        # Как и список: без is_archived архив не затрагивается
+        response = self.bulk(action='trash', filter={'color': 'red'})
+        self.assertEqual(response.data['updated'], 5)
+        self.archived.refresh_from_db()
+        self.assertFalse(self.archived.is_trashed)
+
+        response = self.bulk(action='restore', filter={'is_trashed': True})
+        self.assertEqual(response.data['updated'], 5)
+        self.assertFalse(Note.objects.filter(is_trashed=True).exists())
+
+    def test_filter_by_search(self):
+        response = self.bulk(action='recolor', color='green', filter={'search': 'blue'})
+        self.assertEqual(response.data['updated'], 5)
+        self.assertEqual(Note.objects.filter(user=self.user, color='green').count(), 5)
+
+    def test_add_and_remove_label(self):
+        self.red[0].labels.add(self.work)
+        response = self.bulk(action='add_label', label_id=self.work.id, filter={'color': 'red'})
+        self.assertEqual(response.data['updated'], 4)
+        self.assertEqual(self.work.notes.count(), 5)
+
+        response = self.bulk(action='remove_label', label_id=self.work.id, filter={'labels': [self.work.id]})
+        self.assertEqual(response.data['updated'], 5)
+        self.assertEqual(self.work.notes.count(), 0)
+
+    def test_add_label_bumps_updated_at_only_for_changed_notes(self):
+        self.red[0].labels.add(self.work)
+        before = Note.objects.get(pk=self.red[0].pk).updated_at
+        self.bulk(action='add_label', label_id=self.work.id, ids=[n.id for n in self.red])
+        self.assertEqual(Note.objects.get(pk=self.red[0].pk).updated_at, before)
+
+    def test_validation(self):
+        foreign_label = Label.objects.create(user=self.other, name="Theirs")
+        self.assertEqual(self.bulk(action='explode', ids=[1]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.bulk(action='archive').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.bulk(action='recolor', color='plaid', ids=[1]).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.bulk(action='add_label', label_id=foreign_label.id, ids=[self.red[0].id])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.bulk(action='archive', filter={'labels': ['abc']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,107 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from .cache_backends import SQLiteCache, TieredCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / 'cache.sqlite3'
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_basic_operations(self):
+        self.cache.set('a', {'x': 1})
+        self.assertEqual(self.cache.get('a'), {'x': 1})
+        self.assertFalse(self.cache.add('a', 2))
+        self.assertTrue(self.cache.add('b', 2))
+        self.assertEqual(self.cache.get_many(['a', 'b', 'missing']), {'a': {'x': 1}, 'b': 2})
+        self.cache.set_many({'c': 3, 'd': 4})
+        self.cache.delete_many(['c'])
+        self.assertEqual(self.cache.get_many(['c', 'd']), {'d': 4})
+        self.assertTrue(self.cache.delete('d'))
+        self.assertFalse(self.cache.has_key('d'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_expiry_and_add_over_expired(self):
+        self.cache.set('a', 1, timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertTrue(self.cache.add('a', 2))
+        self.assertEqual(self.cache.get('a'), 2)
+
+    def test_key_versions(self):
+        self.cache.set('a', 'v1', version=1)
+        self.cache.set('a', 'v2', version=2)
+        self.assertEqual(self.cache.get('a', version=1), 'v1')
+        self.assertEqual(self.cache.incr_version('a', version=2), 3)
+        self.assertEqual(self.cache.get('a', version=3), 'v2')
+
+    def test_entries_are_shared_between_instances(self):
+        other = SQLiteCache(self.path, {})
+        self.cache.set('a', 1)
+        self.assertEqual(other.get('a'), 1)
+
+    def test_concurrent_incr_is_atomic(self):
+        self.cache.set('counter', 0, None)
+
+        def worker():
+            cache = SQLiteCache(self.path, {})
+            for _ in range(50):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+
+    def make_worker(self, name):
+        # Разные LOCAL_NAME — разные L1, как у двух процессов gunicorn
+        return TieredCache('shared', {'OPTIONS': {'LOCAL_NAME': f'test-{name}', 'CHECK_INTERVAL': 0}})
+
+    def test_reads_are_served_from_local_tier(self):
+        worker = self.make_worker('reads')
+        worker.clear()
+        worker.set('a', 1)
+        caches['shared'].delete('a')
+        # Значение осталось в L1, в L2 не ходим
+        self.assertEqual(worker.get('a'), 1)
+
+    def test_writes_invalidate_other_workers(self):
+        first, second = self.make_worker('first'), self.make_worker('second')
+        first.clear()
+        second.clear()
+        first.set('a', 1)
+        self.assertEqual(second.get('a'), 1)
+        first.set('a', 2)
+        self.assertEqual(second.get('a'), 2)
+        first.delete('a')
+        self.assertIsNone(second.get('a'))
+        first.set_many({'b': 1, 'c': 2})
+        self.assertEqual(second.get_many(['b', 'c']), {'b': 1, 'c': 2})
+        self.assertEqual(first.incr('b', 5), 6)
+        self.assertEqual(second.get('b'), 6)
+
+    def test_versions_pass_through(self):
+        worker = self.make_worker('versions')
+        worker.clear()
+        worker.set('a', 'old', version=1)
+        worker.set('a', 'new', version=2)
+        self.assertEqual(worker.get('a', version=1), 'old')
+        self.assertEqual(caches['shared'].get('a', version=2), 'new')
@@ -1,9 +1,13 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from .models import Note, ChecklistItem
 from .serializers import NoteSerializer
+from . import summaries
 
 class ChecklistSerializerTest(TestCase):
     def setUp(self):
@@ -88,3 +92,61 @@ class ChecklistItemViewSetTest(TestCase):
         # Verify self.item is deleted
         self.assertFalse(ChecklistItem.objects.filter(id=self.item.id).exists())
         self.assertEqual(self.note.checklist_items.count(), 1)
+
+
+class ChecklistPreviewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='shopper', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.notes = []
+        for n in range(3):
+            note = Note.objects.create(user=self.user, title=f"List {n}", is_checklist=True)
+            ChecklistItem.objects.bulk_create([
+                ChecklistItem(note=note, text=f"Item {i}", order=i, is_checked=i % 3 == 0) for i in range(30)
+            ])
+            self.notes.append(note)
+        # bulk_create не шлет сигналов — сводки пересчитываем, как это делает сериализатор
+        summaries.refresh([note.id for note in self.notes])
+
+    def test_api_list_returns_first_items_and_counts(self):
+        response = self.client.get('/api/v1/notes/')
+        for note in response.data['results']:
+            self.assertEqual([item['text'] for item in note['checklist_items']], [f"Item {i}" for i in range(5)])
+            self.assertEqual(note['checklist_total'], 30)
+            self.assertEqual(note['checklist_checked'], 10)
+
+    def test_html_grid_loads_only_previews(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, '+ еще 25', count=3)
+        self.assertContains(response, 'Item 4')
+        self.assertNotContains(response, 'Item 5<')
+        # Карточки строятся из сводки в строке заметки: ни пунктов, ни меток не читаем
+        note_queries = [q['sql'] for q in queries.captured_queries if 'FROM "todo_sql_note" ' in q['sql']]
+        self.assertEqual(len(note_queries), 1)
+        self.assertNotIn('"content"', note_queries[0].split('FROM')[0].replace('"content_preview"', ''))
+
+    def test_detail_counts_and_lazy_mode(self):
+        note = self.notes[0]
+        response = self.client.get(f'/api/v1/notes/{note.id}/')
+        self.assertEqual(len(response.data['checklist_items']), 30)
+        self.assertEqual((response.data['checklist_total'], response.data['checklist_checked']), (30, 10))
+
+        response = self.client.get(f'/api/v1/notes/{note.id}/', {'checklist': 'lazy'})
+        self.assertNotIn('checklist_items', response.data)
+        self.assertEqual((response.data['checklist_total'], response.data['checklist_checked']), (30, 10))
+
+    def test_paginated_checklist(self):
+        note = self.notes[0]
+        url = f'/api/v1/notes/{note.id}/checklist/'
+        response = self.client.get(url, {'cursor': '', 'page_size': 20})
+        self.assertEqual([item['order'] for item in response.data['results']], list(range(20)))
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['order'] for item in response.data['results']], list(range(20, 30)))
+        self.assertIsNone(response.data['next'])
+
+        other = User.objects.create_user(username='other', password='password')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,88 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note, ChecklistItem, Tombstone
+from . import summaries
+
+class ChecklistOpsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ops', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title="Покупки", is_checklist=True)
+        self.items = ChecklistItem.objects.bulk_create([
+            ChecklistItem(note=self.note, text=f"Item {i}", order=i) for i in range(20)
+        ])
+        summaries.refresh([self.note.id])
+        self.url = f'/api/v1/notes/{self.note.id}/checklist/ops/'
+
+    def post(self, ops):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {'ops': ops}, format='json')
+
+    def test_toggles_coalesced(self):
+        ops = [{'op': 'toggle', 'id': item.id} for item in self.items[:10]]
+        ops += [{'op': 'toggle', 'id': self.items[0].id}, {'op': 'toggle', 'id': self.items[1].id, 'is_checked': True}]
+        with self.assertNumQueries(14):
+            response = self.post(ops)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # items[0] отмечен и снят обратно — не изменился
+        self.assertEqual([item['id'] for item in response.data['items']], [item.id for item in self.items[1:10]])
+        self.assertTrue(all(item['is_checked'] for item in response.data['items']))
+        self.assertEqual(response.data['checklist_checked'], 9)
+        self.assertEqual(response.data['checklist_total'], 20)
+
+    def test_query_count_independent_of_batch_size(self):
+        def run(items):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertNumQueries(13):
+                    self.client.post(self.url, {'ops': [{'op': 'toggle', 'id': item.id, 'is_checked': True} for item in items]}, format='json')
+        run(self.items[:2])
+        run(self.items[2:20])
+
+    def test_mixed_ops_in_order(self):
+        response = self.post([
+            {'op': 'add', 'text': 'Хлеб'},
+            {'op': 'edit', 'id': self.items[0].id, 'text': 'Молоко'},
+            {'op': 'move', 'id': self.items[1].id, 'order': 100},
+            {'op': 'check_all'},
+            {'op': 'toggle', 'id': self.items[2].id},
+            {'op': 'delete', 'id': self.items[3].id},
+            {'op': 'delete_checked'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        remaining = list(self.note.checklist_items.values_list('id', 'text', 'is_checked'))
+        self.assertEqual(remaining, [(self.items[2].id, 'Item 2', False)])
+        self.assertEqual([item['id'] for item in response.data['items']], [self.items[2].id])
+        self.assertEqual(len(response.data['deleted']), 20)
+        self.assertEqual(Tombstone.objects.filter(kind=Tombstone.KIND_CHECKLIST_ITEM).count(), 20)
+
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.checklist_total, self.note.checklist_checked), (1, 0))
+        self.assertEqual(self.note.checklist_preview[0]['text'], 'Item 2')
+
+    def test_add_appends_to_end(self):
+        response = self.post([{'op': 'add', 'text': 'A'}, {'op': 'add', 'text': 'B', 'is_checked': True}])
+        self.assertEqual([(item['text'], item['order'], item['is_checked']) for item in response.data['items']],
+                         [('A', 20, False), ('B', 21, True)])
+
+    def test_unknown_item_rolls_back(self):
+        other = User.objects.create_user(username='other', password='password')
+        foreign = ChecklistItem.objects.create(note=Note.objects.create(user=other, title="Чужая"), text="X")
+        response = self.post([{'op': 'check_all'}, {'op': 'delete', 'id': foreign.id}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.note.checklist_items.filter(is_checked=True).exists())
+        self.assertTrue(ChecklistItem.objects.filter(pk=foreign.pk).exists())
+
+    def test_validation(self):
+        self.assertEqual(self.post([]).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post([{'op': 'move', 'id': self.items[0].id}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post([{'op': 'explode'}]).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_foreign_note(self):
+        other = User.objects.create_user(username='other', password='password')
+        self.client.force_authenticate(user=other)
+        response = self.post([{'op': 'check_all'}])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
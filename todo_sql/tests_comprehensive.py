@@ -5,15 +5,16 @@ from rest_framework import status
 from .models import Note, Label, ChecklistItem
 
 class ModelIndexTests(TestCase):
-    def test_note_db_indices(self):
-        """Verify required fields have db_index=True"""
-        fields_with_index = [
-            'is_pinned', 'is_archived', 'is_trashed',
-            'created_at', 'updated_at', 'order'
-        ]
-        for field_name in fields_with_index:
-            field = Note._meta.get_field(field_name)
-            self.assertTrue(field.db_index, f"Field '{field_name}' should have db_index=True")
+    def test_note_list_indexes(self):
+        """Списки идут по составным индексам (пользователь + раздел + порядок), а не по флагам"""
+        indexes = {index.name: index for index in Note._meta.indexes}
+        for name in ['note_active_order_idx', 'note_archive_order_idx', 'note_trash_order_idx', 'note_reminder_idx']:
+            self.assertIn(name, indexes)
+            self.assertEqual(indexes[name].fields[0], 'user')
+            self.assertIsNotNone(indexes[name].condition)
+        # Флаги с низкой селективностью отдельно не индексируются
+        for field_name in ['is_pinned', 'is_archived', 'is_trashed', 'order']:
+            self.assertFalse(Note._meta.get_field(field_name).db_index, field_name)
 
 class APIReorderTests(TestCase):
     def setUp(self):
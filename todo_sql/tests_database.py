@@ -0,0 +1,141 @@
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from config import database
+from .models import Note
+
+BASE_DIR = Path('/srv/todo')
+POSTGRES = {'DB_ENGINE': database.POSTGRESQL, 'DB_NAME': 'todo', 'DB_HOST': 'db', 'DB_USER': 'todo'}
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_sqlite(self):
+        config = database.build({}, BASE_DIR)
+        self.assertEqual(config['NAME'], BASE_DIR / 'db.sqlite3')
+        self.assertEqual(config['OPTIONS'], {'transaction_mode': 'IMMEDIATE'})
+        self.assertNotIn('OPTIONS', database.build({}, BASE_DIR, sqlite_tuning=False))
+
+    def test_postgresql_pool(self):
+        config = database.build(POSTGRES, BASE_DIR)
+        self.assertEqual(config['HOST'], 'db')
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        # Под ASGI каждый запрос — в своем потоке: десять запросов, два потока фоновых задач и запас
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': 1, 'max_size': 13, 'timeout': 10.0, 'max_idle': 300.0})
+
+    def test_pool_size_fits_connection_budget(self):
+        env = {**POSTGRES, 'WEB_CONCURRENCY': '4', 'DB_MAX_CONNECTIONS': '10', 'DB_POOL_MIN_SIZE': '3'}
+        pool = database.build(env, BASE_DIR)['OPTIONS']['pool']
+        self.assertEqual((pool['min_size'], pool['max_size']), (2, 2))
+        self.assertLessEqual(pool['max_size'] * 4, 10)
+
+        pool = database.build({**POSTGRES, 'GUNICORN_THREADS': '8'}, BASE_DIR)['OPTIONS']['pool']
+        self.assertEqual(pool['max_size'], 11)
+        pool = database.build({**POSTGRES, 'DB_POOL_REQUESTS': '30'}, BASE_DIR)['OPTIONS']['pool']
+        self.assertEqual(pool['max_size'], 33)
+
+    def test_postgresql_persistent(self):
+        config = database.build({**POSTGRES, 'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '60'}, BASE_DIR)
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('OPTIONS', config)
+
+    def test_replicas(self):
+        primary = database.build(POSTGRES, BASE_DIR)
+        replicas = database.replicas({'DB_REPLICAS': 'db-replica, db-replica-2:5433'}, primary)
+        self.assertEqual(list(replicas), ['replica_1', 'replica_2'])
+        self.assertEqual(replicas['replica_1']['HOST'], 'db-replica')
+        self.assertEqual((replicas['replica_2']['HOST'], replicas['replica_2']['PORT']), ('db-replica-2', '5433'))
+        self.assertEqual(replicas['replica_1']['OPTIONS'], primary['OPTIONS'])
+        self.assertEqual(replicas['replica_1']['TEST'], {'MIRROR': 'default'})
+
+        sqlite = database.replicas({'DB_REPLICAS': '/srv/replica.sqlite3'}, database.build({}, BASE_DIR))
+        self.assertEqual(sqlite['replica_1']['NAME'], '/srv/replica.sqlite3')
+        self.assertEqual(database.replicas({}, primary), {})
+
+
+class DatabaseTimingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='timing', password='password')
+        Note.objects.create(user=self.user, title="Note")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(DB_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/notes/')
+        self.assertRegex(response['Server-Timing'], r'^db-connect;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) SQL"$')
+        reported = int(response['Server-Timing'].rsplit('desc="', 1)[1].split()[0])
+        self.assertEqual(reported, len(queries))
+
+    @override_settings(DB_SERVER_TIMING=True)
+    async def test_server_timing_under_asgi(self):
+        def sql_count(response):
+            return int(response['Server-Timing'].rsplit('desc="', 1)[1].split()[0])
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/v1/notes/')
+        self.assertEqual(response.status_code, 200)
+        # Запросы представления идут в его потоке, а не в потоке event loop:
+        # сессия, пользователь и список заметок должны попасть в счетчик
+        self.assertRegex(response['Server-Timing'], r'^db-connect;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) SQL"$')
+        self.assertGreaterEqual(sql_count(response), 3)
+
+    @override_settings(DB_SERVER_TIMING=False)
+    def test_header_disabled(self):
+        with self.assertLogs('todo_sql.db_timing', 'DEBUG') as logs:
+            response = self.client.get('/api/v1/notes/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('GET /api/v1/notes/', logs.output[0])
+
+
+class PushConnectionTests(TransactionTestCase):
+    """Push-канал не держит соединение (из пула) все время ожидания."""
+
+    async def test_long_poll_releases_connection(self):
+        user = await User.objects.acreate_user(username='poller', password='password')
+        await self.async_client.aforce_login(user)
+        # SQLite в памяти close() пропускает — проверяем сам вызов
+        with override_settings(PUSH_BROKER='todo_sql.push.InProcessBroker'), \
+                mock.patch.object(type(connections['default']), 'close', autospec=True) as close:
+            response = await self.async_client.get('/api/v1/events/poll/')
+        self.assertEqual(response.status_code, 200)
+        # Пользователь проверен по базе в потоке запроса, после чего соединение отдано
+        self.assertIn('default', [call.args[0].alias for call in close.call_args_list])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Нужен PostgreSQL: DB_ENGINE=django.db.backends.postgresql')
+class PostgreSQLConnectionTests(TransactionTestCase):
+    """Запуск: DB_ENGINE=django.db.backends.postgresql DB_NAME=... python manage.py test todo_sql.tests_database"""
+
+    def backend_pid(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_health_checks(self):
+        self.assertTrue(connection.health_check_enabled)
+
+    def test_pooled_connections_are_reused(self):
+        if connection.pool is None:
+            self.skipTest('DB_POOL=False')
+        pids = set()
+        for _ in range(10):
+            pids.add(self.backend_pid())
+            # Конец запроса: соединение возвращается в пул
+            connection.close()
+        self.assertLessEqual(len(pids), connection.pool.max_size)
+
+    def test_persistent_connection_is_kept(self):
+        if connection.pool is not None or not connection.settings_dict['CONN_MAX_AGE']:
+            self.skipTest('Нужны постоянные соединения: DB_POOL=False')
+        pid = self.backend_pid()
+        # То же, что Django делает в начале и в конце каждого запроса
+        connection.close_if_unusable_or_obsolete()
+        self.assertEqual(self.backend_pid(), pid)
@@ -0,0 +1,59 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note, Label, ChecklistItem
+from . import summaries
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sparse', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.label = Label.objects.create(user=self.user, name="Work")
+        self.note = Note.objects.create(user=self.user, title="Long", content='слово ' * 200, is_checklist=True)
+        self.note.labels.add(self.label)
+        ChecklistItem.objects.bulk_create([ChecklistItem(note=self.note, text=f"Item {i}", order=i) for i in range(8)])
+        summaries.refresh([self.note.id])
+
+    def note_select(self, queries):
+        return [q['sql'] for q in queries.captured_queries if 'FROM "todo_sql_note" ' in q['sql']][0].split(' FROM ')[0]
+
+    def test_list_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/notes/', {'fields': 'title,color', 'cursor': ''})
+        self.assertEqual(response.data['results'], [{'id': self.note.id, 'title': 'Long', 'color': 'white'}])
+        select = self.note_select(queries)
+        self.assertNotIn('"content"', select)
+        self.assertNotIn('"checklist_preview"', select)
+
+    def test_list_preview_and_expand(self):
+        response = self.client.get('/api/v1/notes/', {'preview': '1', 'expand': 'checklist_items'})
+        note = response.data['results'][0]
+        self.assertEqual(len(note['content']), Note.CONTENT_PREVIEW_LENGTH)
+        self.assertTrue(note['content'].endswith('…'))
+        self.assertEqual([item['text'] for item in note['checklist_items']], [f"Item {i}" for i in range(8)])
+
+        default = self.client.get('/api/v1/notes/').data['results'][0]
+        self.assertEqual(len(default['checklist_items']), summaries.PREVIEW_ITEMS)
+        self.assertEqual(default['content'], self.note.content)
+
+    def test_retrieve_fields_skip_prefetches(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/v1/notes/{self.note.id}/', {'fields': 'title,checklist_total', 'preview': '1'})
+        self.assertEqual(response.data, {'id': self.note.id, 'title': 'Long', 'checklist_total': 8})
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertNotIn('"content"', self.note_select(queries))
+
+        response = self.client.get(f'/api/v1/notes/{self.note.id}/', {'fields': 'content,labels', 'preview': 'true'})
+        self.assertEqual(response.data['content'], self.note.content_preview)
+        self.assertEqual(response.data['labels'], [{'id': self.label.id, 'name': 'Work'}])
+
+    def test_unknown_fields_rejected(self):
+        response = self.client.get('/api/v1/notes/', {'fields': 'title,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+        response = self.client.get(f'/api/v1/notes/{self.note.id}/', {'expand': 'labels'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
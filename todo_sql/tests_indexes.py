@@ -0,0 +1,90 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from .models import Note, Label, ChecklistItem
+from .pagination import get_ordering
+from .api_views import NoteViewSet
+from .views import NoteListView, ArchiveView, TrashView, RemindersView, LabelNoteView
+from . import purge, summaries
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN — формат SQLite')
+class QueryPlanTests(TestCase):
+    """
+    Горячие запросы списков должны идти по своим индексам (models.Note.Meta.indexes)
+    и не сортировать в памяти. Тест падает, если запрос поменял форму и индекс
+    перестал ему подходить.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='plans', password='password')
+        self.label = Label.objects.create(user=self.user, name="Work")
+        self.note = Note.objects.create(user=self.user, title="Note", reminder_date=timezone.now())
+        self.note.labels.add(self.label)
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def page(self, queryset):
+        # Форма запроса страницы из pagination.paginate: порядок с id и LIMIT
+        return queryset.order_by(*get_ordering(queryset))[:13]
+
+    def view_queryset(self, view_class, **kwargs):
+        view = view_class()
+        view.request = RequestFactory().get('/')
+        view.request.user = self.user
+        view.kwargs = kwargs
+        return view.get_queryset()
+
+    def assertUsesIndex(self, queryset, index, sorted_by_index=True):
+        plan = self.plan(queryset)
+        self.assertRegex(plan, rf'USING (COVERING )?INDEX {index}\b', plan)
+        if sorted_by_index:
+            self.assertNotIn('TEMP B-TREE', plan, plan)
+
+    def test_note_list(self):
+        self.assertUsesIndex(self.page(self.view_queryset(NoteListView)), 'note_active_order_idx')
+
+    def test_api_list_defaults(self):
+        queryset = NoteViewSet.apply_list_defaults(Note.objects.filter(user=self.user), {})
+        self.assertUsesIndex(self.page(queryset), 'note_active_order_idx')
+        self.assertUsesIndex(self.page(queryset.filter(color='red')), 'note_active_order_idx')
+
+    def test_archive(self):
+        self.assertUsesIndex(self.page(self.view_queryset(ArchiveView)), 'note_archive_order_idx')
+
+    def test_trash(self):
+        self.assertUsesIndex(self.page(self.view_queryset(TrashView)), 'note_trash_order_idx')
+
+    def test_reminders(self):
+        self.assertUsesIndex(self.page(self.view_queryset(RemindersView)), 'note_reminder_idx')
+
+    def test_label_notes(self):
+        # Через связь с меткой сортировка по индексу невозможна: важно, что метка и связь
+        # ищутся по индексам, а не полным проходом
+        plan = self.plan(self.page(self.view_queryset(LabelNoteView, label='Work')))
+        self.assertNotRegex(plan, r'SCAN todo_sql_(label|note_labels)\b', plan)
+        self.assertNotRegex(plan, r'SCAN todo_sql_note\b(?! USING)', plan)
+
+    def test_sync_changes(self):
+        since = timezone.now() - timedelta(minutes=5)
+        self.assertUsesIndex(Note.objects.filter(user=self.user, updated_at__gt=since), 'note_user_updated_idx', False)
+        self.assertUsesIndex(Label.objects.filter(user=self.user, updated_at__gt=since), 'label_user_updated_idx', False)
+
+    def test_checklist_items(self):
+        items = ChecklistItem.objects.filter(note=self.note).order_by(*summaries.ITEM_ORDERING)
+        self.assertUsesIndex(items, 'item_note_order_idx')
+
+    def test_first_rank(self):
+        queryset = Note.objects.filter(user=self.user).exclude(position='').order_by('position').values_list('position')[:1]
+        self.assertUsesIndex(queryset, 'note_user_position_idx')
+
+    def test_trash_expiry(self):
+        expired = Note.objects.filter(is_trashed=True, trashed_at__lt=timezone.now() - purge.retention())
+        self.assertUsesIndex(expired, 'note_trash_expiry_idx', False)
@@ -0,0 +1,45 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from .models import Note, Label, ChecklistItem
+from .serializers import NoteSerializer, NoteListSerializer
+from . import search
+
+class NoteListSerializerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='lister', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        work = Label.objects.create(user=self.user, name="Work")
+        home = Label.objects.create(user=self.user, name="Home")
+        for i in range(6):
+            note = Note.objects.create(
+                user=self.user, title=f"Note {i}", content=f"Body {i} <b>", color='red' if i % 2 else 'white',
+                is_pinned=i == 0, is_checklist=i % 3 == 0,
+                reminder_date=timezone.now() + timedelta(days=i) if i % 2 else None,
+            )
+            note.labels.set([work, home][:i % 3])
+            for j in range(i % 4):
+                ChecklistItem.objects.create(note=note, text=f"Item {j}", order=j, is_checked=j % 2 == 0)
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def assert_same_json(self, queryset):
+        expected = NoteSerializer(queryset.prefetch_related('labels', 'checklist_items'), many=True).data
+        actual = NoteListSerializer(NoteListSerializer.prepare(queryset)).data
+        self.assertEqual(self.render(actual), self.render(expected))
+
+    def test_same_json_as_note_serializer(self):
+        self.assert_same_json(Note.objects.filter(user=self.user))
+
+    def test_same_json_for_search_results(self):
+        self.assert_same_json(search.filter_notes(Note.objects.filter(user=self.user), 'body'))
+
+    def test_list_endpoint_query_count(self):
+        with self.assertNumQueries(2):  # count + заметки (метки и пункты — в сводке заметки)
+            response = self.client.get('/api/v1/notes/')
+        self.assertEqual(len(response.data['results']), 6)
@@ -0,0 +1,75 @@
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note
+from . import mutations
+
+class StateToggleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='toggler', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title="Note", is_pinned=True)
+
+    def toggle(self, name):
+        return self.client.post(f'/api/v1/notes/{self.note.id}/{name}/')
+
+    def assert_toggles(self):
+        response = self.toggle('pin')
+        self.assertEqual(response.data, {'is_pinned': False})
+        response = self.toggle('archive')
+        self.assertEqual(response.data, {'is_archived': True, 'is_trashed': False})
+        response = self.toggle('trash')
+        self.assertEqual(response.data, {'is_trashed': True, 'is_archived': False})
+        response = self.toggle('archive')
+        self.assertEqual(response.data, {'is_archived': True, 'is_trashed': False})
+        response = self.toggle('trash')
+        self.assertEqual(response.data, {'is_trashed': True, 'is_archived': False})
+        response = self.toggle('trash')
+        self.assertEqual(response.data, {'is_trashed': False, 'is_archived': False})
+
+        self.note.refresh_from_db()
+        self.assertFalse(self.note.is_trashed)
+        self.assertFalse(self.note.is_archived)
+
+    def test_toggles_with_returning(self):
+        if not mutations.supports_returning(connection):
+            self.skipTest('UPDATE ... RETURNING не поддерживается')
+        for name in ('pin', 'archive', 'trash'):
+            with self.assertNumQueries(1):
+                self.toggle(name)
+        self.note.refresh_from_db()
+        self.note.is_pinned = True
+        self.note.is_trashed = self.note.is_archived = False
+        self.note.save()
+        self.assert_toggles()
+
+    def test_toggles_without_returning(self):
+        with mock.patch.object(mutations, 'supports_returning', return_value=False):
+            self.assert_toggles()
+
+    def test_trash_unpins(self):
+        self.toggle('trash')
+        self.note.refresh_from_db()
+        self.assertTrue(self.note.is_trashed)
+        self.assertFalse(self.note.is_pinned)
+
+    def test_returning_converts_types(self):
+        row = mutations.update_returning(
+            Note.objects.filter(pk=self.note.pk), {'title': 'Renamed'}, ['is_pinned', 'updated_at', 'title']
+        )
+        self.assertIs(row['is_pinned'], True)
+        self.assertEqual(row['updated_at'], Note.objects.get(pk=self.note.pk).updated_at)
+        self.assertEqual(row['title'], 'Renamed')
+
+    def test_foreign_note_not_found(self):
+        foreign = Note.objects.create(user=self.other, title="Foreign")
+        for name in ('pin', 'archive', 'trash'):
+            response = self.client.post(f'/api/v1/notes/{foreign.id}/{name}/')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        foreign.refresh_from_db()
+        self.assertFalse(foreign.is_pinned or foreign.is_archived or foreign.is_trashed)
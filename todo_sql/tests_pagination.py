@@ -0,0 +1,113 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note
+from . import pagination, search
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='keyset', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        now = timezone.now()
+        for i in range(30):
+            note = Note.objects.create(user=self.user, title=f"Note {i}", is_pinned=i % 7 == 0, position=str(i % 3 + 1))
+            # Одинаковое время у пар заметок: порядок должен добиваться по id
+            Note.objects.filter(pk=note.pk).update(updated_at=now - timedelta(minutes=i // 2))
+        self.expected = list(
+            Note.objects.filter(user=self.user).order_by('-is_pinned', 'position', '-updated_at', 'id').values_list('id', flat=True)
+        )
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids += [n['id'] for n in response.data['results']]
+            pages.append(response.data)
+            url = response.data['next']
+        return ids, pages
+
+    def test_walks_all_notes_in_order_without_count(self):
+        ids, pages = self.walk('/api/v1/notes/?cursor=')
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+
+    def test_previous_link_returns_same_page(self):
+        _, pages = self.walk('/api/v1/notes/?cursor=')
+        back = self.client.get(pages[2]['previous'])
+        self.assertEqual([n['id'] for n in back.data['results']], self.expected[12:24])
+        self.assertIsNotNone(back.data['previous'])
+        self.assertIsNotNone(back.data['next'])
+
+    def test_no_count_or_offset_queries(self):
+        first = self.client.get('/api/v1/notes/?cursor=')
+        with self.assertNumQueries(1):  # только заметки: метки и пункты — в сводке заметки
+            self.client.get(first.data['next'])
+
+    def test_stable_when_notes_are_added(self):
+        first = self.client.get('/api/v1/notes/?cursor=')
+        Note.objects.create(user=self.user, title="Newest", position="1")
+        second = self.client.get(first.data['next'])
+        self.assertEqual([n['id'] for n in second.data['results']], self.expected[12:24])
+
+    def test_page_numbers_still_work(self):
+        response = self.client.get('/api/v1/notes/', {'page': 2})
+        self.assertEqual(response.data['count'], 30)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/notes/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_must_match_ordering(self):
+        self.client.force_login(self.user)
+        now = timezone.now().isoformat()
+        for position in (
+            [{'a': 1}, '1', now, 1],
+            ['x', 'y', 'z', 'w'],
+            [True, '1', '2026-01-01T00:00:00', 1],
+            [True, '1', now],
+            [True, None, now, 1],
+        ):
+            cursor = pagination.encode_cursor(position)
+            self.assertEqual(self.client.get('/api/v1/notes/', {'cursor': cursor}).status_code, 404, position)
+            self.assertEqual(self.client.get(reverse('index'), {'cursor': cursor}).status_code, 404, position)
+
+    def test_html_views_share_api_cursor(self):
+        first = self.client.get('/api/v1/notes/?cursor=')
+        cursor = first.data['next'].split('cursor=')[1].split('&')[0]
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('index'), {'cursor': cursor})
+        self.assertEqual([n.id for n in response.context['notes']], self.expected[12:24])
+        self.assertTrue(response.context['page_obj'].has_previous())
+
+    def test_archive_view_is_paginated(self):
+        Note.objects.filter(user=self.user).update(is_archived=True)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('archive'))
+        self.assertEqual(len(response.context['notes']), 12)
+        self.assertTrue(response.context['is_paginated'])
+
+    def test_dict_rows(self):
+        queryset = Note.objects.filter(user=self.user).values('id', 'is_pinned', 'position', 'updated_at')
+        page = pagination.paginate(queryset, None, 5)
+        page = pagination.paginate(queryset, page.next_cursor, 5)
+        self.assertEqual([row['id'] for row in page], self.expected[5:10])
+
+    def test_search_results_page_by_rank(self):
+        Note.objects.filter(user=self.user).update(content="common")
+        search.update_index(self.expected)
+        search_ids = []
+        url = '/api/v1/notes/?search=common&page_size=7&cursor='
+        while url:
+            response = self.client.get(url)
+            search_ids += [n['id'] for n in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sorted(search_ids), sorted(self.expected))
+        self.assertEqual(len(search_ids), len(set(search_ids)))
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note, Label, ChecklistItem, Tombstone, TrashPurge
+from . import purge, search
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='purge', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.label = Label.objects.create(user=self.user, name="Work")
+        self.kept = Note.objects.create(user=self.user, title="Живая", content="оставить")
+        self.trashed = Note.objects.bulk_create([
+            Note(user=self.user, title=f"Trash {i}", content="мусор", is_trashed=True, trashed_at=timezone.now())
+            for i in range(7)
+        ])
+        for note in self.trashed:
+            note.labels.add(self.label)
+            ChecklistItem.objects.create(note=note, text="пункт")
+        search.rebuild_index()
+
+    def test_purge_in_batches(self):
+        batches = []
+        with CaptureQueriesContext(connection) as queries:
+            deleted = purge.purge_notes(Note.objects.filter(is_trashed=True), batch_size=3, progress=batches.append)
+        self.assertEqual(deleted, 7)
+        self.assertEqual(batches, [3, 6, 7])
+        self.assertEqual(list(Note.objects.all()), [self.kept])
+        self.assertFalse(ChecklistItem.objects.exists())
+        self.assertFalse(Note.labels.through.objects.exists())
+        self.assertEqual(list(search.filter_notes(Note.objects.all(), 'мусор')), [])
+        self.assertEqual(Tombstone.objects.filter(kind=Tombstone.KIND_NOTE).count(), 7)
+        # Заметки не загружаются целиком: только id и владелец
+        note_selects = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'FROM "todo_sql_note"' in q['sql']]
+        self.assertTrue(all('"title"' not in sql for sql in note_selects))
+
+    def test_empty_trash_api(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/notes/empty_trash/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['total'], 7)
+        self.assertEqual(list(Note.objects.all()), [self.kept])
+
+        response = self.client.get('/api/v1/notes/empty_trash/')
+        self.assertEqual(response.data, {'total': 7, 'deleted': 7, 'finished': True})
+        self.assertFalse(TrashPurge.objects.exists())
+
+    def test_note_trashed_during_purge_survives(self):
+        batches = []
+
+        def progress(user_id, total, deleted, finished=False):
+            # Между пачками пользователь удаляет в корзину еще одну заметку
+            if deleted and not batches:
+                self.client.post(f'/api/v1/notes/{self.kept.id}/trash/')
+                batches.append(deleted)
+            return {'total': total, 'deleted': deleted, 'finished': finished}
+
+        with mock.patch.object(purge, '_set_progress', side_effect=progress):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/v1/notes/empty_trash/')
+        self.assertEqual(batches, [7])
+        self.assertEqual(list(Note.objects.all()), [self.kept])
+        self.assertTrue(Note.objects.get(pk=self.kept.pk).is_trashed)
+
+    def test_interrupted_empty_trash_is_resumed(self):
+        # Задача потерялась при рестарте: коммит не наступил, запрос остался
+        self.client.post('/api/v1/notes/empty_trash/')
+        self.assertEqual(Note.objects.filter(is_trashed=True).count(), 7)
+        requested_at = timezone.now() - timedelta(hours=1)
+        TrashPurge.objects.update(requested_at=requested_at)
+        Note.objects.filter(is_trashed=True).update(trashed_at=requested_at - timedelta(minutes=1))
+        # Удаленное в корзину после запроса возобновленная очистка не трогает
+        self.client.post(f'/api/v1/notes/{self.kept.id}/trash/')
+
+        out = StringIO()
+        call_command('process_trash_purges', stdout=out)
+        self.assertIn('Обработано очисток: 1.', out.getvalue())
+        self.assertEqual(list(Note.objects.filter(is_trashed=True)), [self.kept])
+        self.assertFalse(TrashPurge.objects.exists())
+        self.assertTrue(purge.get_progress(self.user.pk)['finished'])
+
+    def test_trashed_at_tracking(self):
+        self.client.post(f'/api/v1/notes/{self.kept.id}/trash/')
+        self.kept.refresh_from_db()
+        self.assertIsNotNone(self.kept.trashed_at)
+        self.client.post(f'/api/v1/notes/{self.kept.id}/trash/')
+        self.kept.refresh_from_db()
+        self.assertIsNone(self.kept.trashed_at)
+
+        old = timezone.now() - timedelta(days=3)
+        Note.objects.filter(pk=self.trashed[0].pk).update(trashed_at=old)
+        self.client.post('/api/v1/notes/bulk/', {'action': 'trash', 'ids': [self.kept.id, self.trashed[0].id]}, format='json')
+        self.assertEqual(Note.objects.get(pk=self.trashed[0].pk).trashed_at, old)
+        self.assertIsNotNone(Note.objects.get(pk=self.kept.pk).trashed_at)
+        self.client.post('/api/v1/notes/bulk/', {'action': 'restore', 'ids': [self.kept.id]}, format='json')
+        self.assertIsNone(Note.objects.get(pk=self.kept.pk).trashed_at)
+
+        note = Note.objects.create(user=self.user, title="Сразу в корзину", is_trashed=True)
+        self.assertIsNotNone(note.trashed_at)
+
+    @override_settings(TRASH_RETENTION_DAYS=7)
+    def test_purge_trash_command(self):
+        Note.objects.filter(pk__in=[n.pk for n in self.trashed[:4]]).update(trashed_at=timezone.now() - timedelta(days=8))
+        out = StringIO()
+        call_command('purge_trash', '--batch-size', '2', stdout=out)
+        self.assertEqual(Note.objects.filter(is_trashed=True).count(), 3)
+        self.assertIn('4', out.getvalue())
+
+        call_command('purge_trash', '--days', '0', stdout=StringIO())
+        self.assertEqual(list(Note.objects.all()), [self.kept])
@@ -0,0 +1,184 @@
+import asyncio
+import threading
+from unittest import mock
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from .models import Note
+from . import push, sync
+
+
+class RecordingBroker(push.InProcessBroker):
+    """Заглушка брокера: запоминает все опубликованные события."""
+    published = []
+
+    def publish(self, user_id, event):
+        event = super().publish(user_id, event)
+        self.published.append((user_id, event))
+        return event
+
+
+class BrokerTests(TestCase):
+    def test_publish_fans_out_to_user_subscriptions_only(self):
+        async def scenario():
+            broker = push.InProcessBroker()
+            first, second = broker.subscribe(1), broker.subscribe(1)
+            foreign = broker.subscribe(2)
+            broker.publish(1, {'type': 'changed'})
+            events = await asyncio.gather(
+                asyncio.wait_for(first.get(), 1), asyncio.wait_for(second.get(), 1)
+            )
+            self.assertEqual([e['seq'] for e in events], [1, 1])
+            self.assertTrue(foreign.queue.empty())
+            broker.unsubscribe(first)
+            broker.unsubscribe(second)
+            broker.unsubscribe(foreign)
+            self.assertEqual(broker.sequence(1), 1)
+
+        asyncio.run(scenario())
+
+    def test_slow_subscriber_keeps_latest_events(self):
+        async def scenario():
+            broker = push.InProcessBroker()
+            subscription = broker.subscribe(1)
+            for _ in range(push.QUEUE_SIZE + 5):
+                broker.publish(1, {'type': 'changed'})
+            await asyncio.sleep(0)
+            self.assertEqual(subscription.queue.qsize(), push.QUEUE_SIZE)
+            self.assertEqual((await subscription.get())['seq'], 6)
+
+        asyncio.run(scenario())
+
+
+class SharedCacheBrokerTests(TestCase):
+    """Два брокера с общим кэшем — как два воркера."""
+
+    def setUp(self):
+        caches['shared'].clear()
+
+    def test_event_reaches_other_worker(self):
+        async def scenario():
+            publisher, listener = push.SharedCacheBroker(), push.SharedCacheBroker()
+            listener.POLL_INTERVAL = 0.01
+            publisher.publish(1, {'type': 'changed', 'version': 1})
+            subscription = listener.subscribe(1)
+            foreign = listener.subscribe(2)
+            try:
+                # Событие до подписки не доставляется
+                await asyncio.sleep(0.05)
+                self.assertTrue(subscription.queue.empty())
+                publisher.publish(1, {'type': 'changed', 'version': 2})
+                event = await asyncio.wait_for(subscription.get(), 2)
+                self.assertEqual((event['seq'], event['version']), (2, 2))
+                self.assertEqual(listener.sequence(1), 2)
+                await asyncio.sleep(0.05)
+                # Уже доставленное событие не повторяется, чужие не приходят
+                self.assertTrue(subscription.queue.empty())
+                self.assertTrue(foreign.queue.empty())
+            finally:
+                listener.unsubscribe(subscription)
+                listener.unsubscribe(foreign)
+
+        asyncio.run(scenario())
+
+    def test_own_worker_delivers_immediately(self):
+        async def scenario():
+            broker = push.SharedCacheBroker()
+            subscription = broker.subscribe(1)
+            broker.publish(1, {'type': 'changed'})
+            await asyncio.sleep(0)
+            self.assertEqual(subscription.queue.qsize(), 1)
+            broker.unsubscribe(subscription)
+
+        asyncio.run(scenario())
+
+    def test_async_subscribe_reads_cache_off_the_loop(self):
+        async def scenario():
+            broker = push.SharedCacheBroker()
+            broker.publish(1, {'type': 'changed'})
+            threads = []
+            sequence = broker.sequence
+
+            def recording(user_id):
+                threads.append(threading.current_thread())
+                return sequence(user_id)
+
+            with mock.patch.object(broker, 'sequence', recording):
+                subscription = await broker.asubscribe(1)
+            self.assertNotIn(threading.current_thread(), threads)
+            broker.publish(1, {'type': 'changed'})
+            self.assertEqual((await asyncio.wait_for(subscription.get(), 1))['seq'], 2)
+            broker.unsubscribe(subscription)
+
+        asyncio.run(scenario())
+
+
+@override_settings(PUSH_BROKER='todo_sql.tests_push.RecordingBroker')
+class PushNotificationTests(TestCase):
+    def setUp(self):
+        push.reset_broker()
+        RecordingBroker.published = []
+        self.addCleanup(push.reset_broker)
+        self.user = User.objects.create_user(username='pusher', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title="Note")
+
+    def test_mutation_notifies_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/notes/{self.note.id}/pin/')
+        self.assertEqual([user_id for user_id, _ in RecordingBroker.published], [self.user.id])
+
+    def test_reads_and_failed_writes_do_not_notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get('/api/v1/notes/')
+            self.client.post('/api/v1/notes/', {'title': 'x' * 1000}, format='json')
+        self.assertEqual(RecordingBroker.published, [])
+
+
+class LongPollTests(TestCase):
+    def setUp(self):
+        push.reset_broker()
+        self.addCleanup(push.reset_broker)
+        caches['shared'].clear()
+        self.user = User.objects.create_user(username='poller', password='password')
+        self.version = sync.get_version(self.user.id)
+
+    async def test_first_request_returns_version(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/v1/events/poll/')
+        self.assertEqual(response.json(), {'changed': False, 'version': self.version})
+
+    async def test_waits_for_event(self):
+        await self.async_client.aforce_login(self.user)
+        broker = push.get_broker()
+        event = {'type': 'changed', 'version': self.version + 1}
+        asyncio.get_running_loop().call_later(0.05, broker.publish, self.user.id, event)
+        response = await self.async_client.get('/api/v1/events/poll/', {'since': self.version, 'timeout': 5})
+        self.assertEqual(response.json(), {'changed': True, 'version': self.version + 1})
+
+    async def test_stale_version_returns_immediately(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/v1/events/poll/', {'since': self.version - 1})
+        self.assertEqual(response.json(), {'changed': True, 'version': self.version})
+
+    async def test_timeout_is_validated(self):
+        await self.async_client.aforce_login(self.user)
+        for value in ('nan', 'inf', '-inf'):
+            response = await self.async_client.get('/api/v1/events/poll/', {'since': self.version, 'timeout': value})
+            self.assertEqual(response.status_code, 400, value)
+        # Отрицательный и нулевой — не меньше секунды ожидания
+        started = asyncio.get_running_loop().time()
+        response = await self.async_client.get('/api/v1/events/poll/', {'since': self.version, 'timeout': -5})
+        self.assertEqual(response.json(), {'changed': False, 'version': self.version})
+        self.assertGreaterEqual(asyncio.get_running_loop().time() - started, 0.9)
+
+    async def test_anonymous_is_rejected(self):
+        response = await self.async_client.get('/api/v1/events/poll/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_sse_requires_asgi(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/v1/events/')
+        self.assertEqual(response.status_code, 503)
@@ -0,0 +1,118 @@
+import random
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note
+from . import ranking, sync
+
+class RankKeyTests(TestCase):
+    def test_key_between_is_strictly_between(self):
+        rng = random.Random(1)
+        keys = [ranking.key_between()]
+        for _ in range(500):
+            index = rng.randint(0, len(keys))
+            before = keys[index - 1] if index > 0 else None
+            after = keys[index] if index < len(keys) else None
+            key = ranking.key_between(before, after)
+            if before is not None:
+                self.assertLess(before, key)
+            if after is not None:
+                self.assertLess(key, after)
+            self.assertFalse(key.endswith('0'))
+            keys.insert(index, key)
+        self.assertEqual(keys, sorted(keys))
+
+    def test_unordered_bounds(self):
+        with self.assertRaises(ranking.RankError):
+            ranking.key_between('b', 'a')
+        with self.assertRaises(ranking.RankError):
+            ranking.key_between(None, '')
+
+    def test_spread_keys(self):
+        for count in (0, 1, 17, 36, 1000):
+            keys = ranking.spread_keys(count)
+            self.assertEqual(len(keys), count)
+            self.assertEqual(keys, sorted(set(keys)))
+            self.assertTrue(all(key and not key.endswith('0') for key in keys))
+
+class NoteMoveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mover', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.notes = [
+            Note.objects.create(user=self.user, title=f"Note {i}", position=key)
+            for i, key in enumerate(ranking.spread_keys(5))
+        ]
+
+    def ordered_ids(self):
+        return list(Note.objects.filter(user=self.user).values_list('id', flat=True))
+
+    def move(self, note, prev=None, next=None, **extra):
+        data = {'prev_id': prev.id if prev else None, 'next_id': next.id if next else None, **extra}
+        return self.client.post(f'/api/v1/notes/{note.id}/move/', data, format='json')
+
+    def test_move_between_updates_one_row(self):
+        a, b, c, d, e = self.notes
+        with self.assertNumQueries(2):  # чтение рангов + один UPDATE
+            response = self.move(e, prev=a, next=b)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ordered_ids(), [a.id, e.id, b.id, c.id, d.id])
+
+    def test_move_to_edges(self):
+        a, b, c, d, e = self.notes
+        self.move(a, prev=e)
+        self.move(d, next=b)
+        self.assertEqual(self.ordered_ids(), [d.id, b.id, c.id, e.id, a.id])
+
+    def test_move_into_pinned_group(self):
+        a, b, c, d, e = self.notes
+        response = self.move(c, is_pinned=True)
+        self.assertTrue(response.data['is_pinned'])
+        self.assertEqual(self.ordered_ids()[0], c.id)
+
+    def test_is_pinned_from_form(self):
+        c = self.notes[2]
+        response = self.client.post(f'/api/v1/notes/{c.id}/move/', {'is_pinned': 'false'})
+        self.assertFalse(response.data['is_pinned'])
+        self.assertFalse(Note.objects.get(pk=c.id).is_pinned)
+        response = self.client.post(f'/api/v1/notes/{c.id}/move/', {'is_pinned': 'maybe'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_colliding_positions_are_rebalanced(self):
+        Note.objects.filter(user=self.user).update(position='')
+        a, b, c, d, e = self.notes
+        response = self.move(e, prev=a, next=b)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = self.ordered_ids()
+        self.assertEqual(ids.index(e.id), ids.index(a.id) + 1)
+
+    def test_long_keys_trigger_rebalance(self):
+        a, b = self.notes[:2]
+        mover = self.notes[4]
+        # Раз за разом ставим заметку вплотную к `a`: ранги растут
+        for _ in range(200):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.move(mover, prev=a, next=b)
+            b, mover = mover, b
+        lengths = Note.objects.filter(user=self.user).values_list('position', flat=True)
+        self.assertTrue(all(len(key) <= ranking.MAX_KEY_LENGTH + 1 for key in lengths))
+
+    def test_rebalance_bumps_version(self):
+        version = sync.get_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            ranking.rebalance(self.user.pk)
+        self.assertGreater(sync.get_version(self.user.pk), version)
+
+    def test_foreign_neighbour_is_rejected(self):
+        foreign = Note.objects.create(user=self.other, title="Foreign", position='i')
+        response = self.move(self.notes[0], prev=foreign)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.move(foreign, prev=self.notes[0])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_new_note_goes_first(self):
+        response = self.client.post('/api/v1/notes/', {'title': 'Fresh'}, format='json')
+        self.assertEqual(self.ordered_ids()[0], response.data['id'])
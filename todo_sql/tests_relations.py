@@ -0,0 +1,72 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework import status
+from .models import Note, Label
+from .serializers import ChecklistItemSerializer, NoteSerializer
+
+class ScopedRelatedFieldTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.labels = Label.objects.bulk_create([Label(user=self.user, name=f"Label {i}") for i in range(10)])
+        self.foreign_label = Label.objects.create(user=self.other, name="Чужая")
+        self.note = Note.objects.create(user=self.user, title="Mine")
+        self.foreign_note = Note.objects.create(user=self.other, title="Not mine")
+
+        self.request = APIRequestFactory().post('/')
+        self.request.user = self.user
+
+    def count_lookups(self, serializer, table):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        return len([q for q in queries.captured_queries if f'FROM "{table}"' in q['sql']])
+
+    def test_label_ids_single_query(self):
+        data = {'title': 'New', 'label_ids': [label.id for label in self.labels]}
+        serializer = NoteSerializer(data=data, context={'request': self.request})
+        self.assertEqual(self.count_lookups(serializer, 'todo_sql_label'), 1)
+        self.assertEqual(len(serializer.validated_data['labels']), 10)
+
+    def test_nested_items_constant_queries(self):
+        def items(count):
+            return [{'text': f"Item {i}", 'order': i, 'note': self.note.id} for i in range(count)]
+
+        few = ChecklistItemSerializer(data=items(5), many=True, context={'request': self.request})
+        many = ChecklistItemSerializer(data=items(50), many=True, context={'request': self.request})
+        self.assertEqual(self.count_lookups(few, 'todo_sql_note'), 1)
+        self.assertEqual(self.count_lookups(many, 'todo_sql_note'), 1)
+
+    def test_note_save_with_labels_and_items(self):
+        data = {
+            'title': 'Bulk', 'is_checklist': True,
+            'label_ids': [label.id for label in self.labels],
+            'checklist_items': [{'text': f"Item {i}", 'order': i} for i in range(50)],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/notes/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Разрешение label_ids; остальные запросы к меткам — m2m set() и ответ
+        label_lookups = [q for q in queries.captured_queries if '"todo_sql_label"."id" IN' in q['sql']]
+        self.assertEqual(len(label_lookups), 1)
+        self.assertEqual(len(response.data['checklist_items']), 50)
+
+    def test_foreign_label_rejected(self):
+        response = self.client.post('/api/v1/notes/', {'title': 'X', 'label_ids': [self.labels[0].id, self.foreign_label.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('label_ids', response.data)
+        self.assertFalse(self.foreign_label.notes.exists())
+
+    def test_foreign_note_rejected(self):
+        response = self.client.post('/api/v1/checklist-items/', {'text': 'X', 'note': self.foreign_note.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('note', response.data)
+
+    def test_invalid_pk_type(self):
+        response = self.client.post('/api/v1/notes/', {'title': 'X', 'label_ids': ['abc']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('label_ids', response.data)
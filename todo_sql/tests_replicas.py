@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import tempfile
+from unittest import skipUnless
+
+from django.db import connection, connections
+from django.test import RequestFactory, TransactionTestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .models import Note
+from .replicas import ReplicaRouter, replica_reads
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Реплика — копия тестовой базы SQLite в файле')
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Реплика — снимок основной базы в отдельном файле. Заметка "Свежая"
+    создана после снимка: на реплике ее нет, как при отставании репликации.
+    """
+    alias = 'replica'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='replica', password='password')
+        self.old = Note.objects.create(user=self.user, title="Старая")
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        default = connections['default']
+        default.ensure_connection()
+        snapshot = sqlite3.connect(path)
+        default.connection.backup(snapshot)
+        snapshot.close()
+
+        connections[self.alias] = type(default)({**default.settings_dict, 'NAME': path}, alias=self.alias)
+        self.addCleanup(delattr, connections._connections, self.alias)
+        self.addCleanup(connections[self.alias].close)
+        replica_settings = self.settings(DATABASE_REPLICAS=[self.alias], READ_YOUR_WRITES_SECONDS=10)
+        replica_settings.enable()
+        self.addCleanup(replica_settings.disable)
+
+        # bulk_create без сигналов: запись не закрепляет чтение пользователя за основной
+        # базой (replicas.mark_wrote), на реплике заметки просто еще нет
+        [self.fresh] = Note.objects.bulk_create([Note(user=self.user, title="Свежая")])
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+
+    def titles(self):
+        response = self.api.get('/api/v1/notes/')
+        self.assertEqual(response.status_code, 200)
+        return sorted(note['title'] for note in response.data['results'])
+
+    def test_list_reads_from_replica(self):
+        self.assertEqual(self.titles(), ["Старая"])
+        self.assertEqual(self.api.get(f'/api/v1/notes/{self.fresh.pk}/').status_code, 404)
+
+    def test_read_your_writes(self):
+        response = self.api.post(f'/api/v1/notes/{self.old.pk}/pin/')
+        self.assertEqual(response.status_code, 200)
+        # После изменения пользователь читает с основной базы
+        self.assertEqual(self.titles(), ["Свежая", "Старая"])
+
+    def test_html_list_with_session_from_primary(self):
+        # Сессия создана после снимка: на реплике ее нет, но вход проверяется по основной базе
+        self.client.login(username='replica', password='password')
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([note.title for note in response.context['notes']], ["Старая"])
+
+    def test_writes_go_to_primary(self):
+        @replica_reads
+        def view(request):
+            note = Note.objects.get(pk=self.old.pk)
+            self.assertEqual(note._state.db, self.alias)
+            note.title = "Изменена"
+            note.save()
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        view(request)
+        self.assertEqual(Note.objects.get(pk=self.old.pk).title, "Изменена")
+        self.assertEqual(Note.objects.using(self.alias).get(pk=self.old.pk).title, "Старая")
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Note))
+        self.assertEqual(router.db_for_write(Note), 'default')
+        self.assertFalse(router.allow_migrate(self.alias, 'todo_sql'))
+        self.assertTrue(router.allow_migrate('default', 'todo_sql'))
+
+        @replica_reads
+        def view(request):
+            self.assertEqual(router.db_for_read(Note), self.alias)
+            self.assertEqual(router.db_for_read(User), 'default')
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        view(request)
+        # Изменяющий запрос читает с основной базы
+        request = RequestFactory().post('/')
+        request.user = self.user
+        replica_reads(lambda request: self.assertIsNone(router.db_for_read(Note)))(request)
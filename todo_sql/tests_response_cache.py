@@ -0,0 +1,83 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.db import transaction
+from .models import Note, Label
+from . import sync
+
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['shared'].clear()
+        self.user = User.objects.create_user(username='etagger', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title="Note")
+        self.label = Label.objects.create(user=self.user, name="Work")
+
+    def test_not_modified_without_queries(self):
+        for url in ('/api/v1/notes/', f'/api/v1/notes/{self.note.id}/', '/api/v1/labels/', f'/api/v1/labels/{self.label.id}/'):
+            etag = self.client.get(url)['ETag']
+            self.assertTrue(etag.startswith('"'))
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+
+    def test_mutation_changes_etag(self):
+        etag = self.client.get('/api/v1/notes/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/notes/{self.note.id}/pin/')
+        response = self.client.get('/api/v1/notes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_orm_changes_etag(self):
+        # Правки мимо API (админка, shell) тоже поднимают версию — через сигналы
+        for change in (
+            lambda: Note.objects.filter(pk=self.note.pk).get().save(),
+            lambda: self.note.labels.add(self.label),
+            lambda: Label.objects.create(user=self.user, name="Home").delete(),
+        ):
+            etag = self.client.get('/api/v1/notes/')['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            response = self.client.get('/api/v1/notes/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_version_bumped_once_per_transaction(self):
+        version = sync.get_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for index in range(3):
+                    Note.objects.create(user=self.user, title=f"Note {index}")
+                self.note.labels.add(self.label)
+        self.assertEqual(sync.get_version(self.user.pk), version + 1)
+
+    def test_etag_depends_on_query_and_user(self):
+        first = self.client.get('/api/v1/notes/', {'color': 'red', 'is_pinned': 'false'})['ETag']
+        same = self.client.get('/api/v1/notes/', {'is_pinned': 'false', 'color': 'red'})['ETag']
+        other_page = self.client.get('/api/v1/notes/', {'color': 'blue'})['ETag']
+        self.assertEqual(first, same)
+        self.assertNotEqual(first, other_page)
+
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get('/api/v1/notes/', {'color': 'red', 'is_pinned': 'false'}, HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_body_cache_serves_repeat_views(self):
+        first = self.client.get('/api/v1/notes/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/v1/notes/')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/v1/notes/{self.note.id}/', {'title': 'Renamed'}, format='json')
+        response = self.client.get('/api/v1/notes/')
+        self.assertEqual(response.json()['results'][0]['title'], 'Renamed')
@@ -0,0 +1,78 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note, ChecklistItem
+from . import search
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.groceries = Note.objects.create(user=self.user, title="Покупки", content="Купить молоко и хлеб")
+        self.work = Note.objects.create(user=self.user, title="Work", content="Prepare the quarterly report")
+        self.checklist = Note.objects.create(user=self.user, title="Дача", is_checklist=True)
+        ChecklistItem.objects.create(note=self.checklist, text="Полить огурцы", order=0)
+        self.foreign = Note.objects.create(user=self.other, title="Молоко", content="молоко")
+
+    def test_api_search_matches_title_content_and_checklist(self):
+        response = self.client.get('/api/v1/notes/', {'search': 'молок'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [n['id'] for n in response.data['results']]
+        self.assertEqual(ids, [self.groceries.id])
+
+        response = self.client.get('/api/v1/notes/', {'search': 'огурц'})
+        ids = [n['id'] for n in response.data['results']]
+        self.assertEqual(ids, [self.checklist.id])
+
+    def test_api_search_returns_highlighted_snippet(self):
+        response = self.client.get('/api/v1/notes/', {'search': 'quarterly'})
+        note = response.data['results'][0]
+        self.assertIn('<mark>quarterly</mark>', note['search_snippet'])
+
+        # Без поиска сниппета нет
+        response = self.client.get('/api/v1/notes/')
+        self.assertIsNone(response.data['results'][0]['search_snippet'])
+
+    def test_snippet_is_escaped(self):
+        Note.objects.create(user=self.user, title="xss", content="<script>alert(1)</script> payload")
+        response = self.client.get('/api/v1/notes/', {'search': 'payload'})
+        snippet = response.data['results'][0]['search_snippet']
+        self.assertNotIn('<script>', snippet)
+        self.assertIn('&lt;script&gt;', snippet)
+
+    def test_ranking_prefers_title_matches(self):
+        in_content = Note.objects.create(user=self.user, title="Разное", content="где-то тут report")
+        in_title = Note.objects.create(user=self.user, title="Report", content="")
+        response = self.client.get('/api/v1/notes/', {'search': 'report'})
+        ids = [n['id'] for n in response.data['results']]
+        self.assertEqual(ids[0], in_title.id)
+        self.assertIn(in_content.id, ids)
+
+    def test_index_follows_updates_and_deletes(self):
+        response = self.client.patch(f'/api/v1/notes/{self.work.id}/', {'content': 'Plan the offsite'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(search.filter_notes(Note.objects.all(), 'quarterly').exists())
+        self.assertTrue(search.filter_notes(Note.objects.all(), 'offsite').exists())
+
+        self.client.patch(f'/api/v1/notes/{self.checklist.id}/', {'checklist_items': [{'text': 'Собрать малину', 'order': 0}]}, format='json')
+        self.assertFalse(search.filter_notes(Note.objects.all(), 'огурцы').exists())
+        self.assertTrue(search.filter_notes(Note.objects.all(), 'малину').exists())
+
+        self.work.delete()
+        self.assertFalse(search.filter_notes(Note.objects.all(), 'offsite').exists())
+
+    def test_html_view_uses_index(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('index'), {'q': 'хлеб'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['notes']), [self.groceries])
+        self.assertContains(response, '<mark>хлеб</mark>')
+
+    def test_query_without_words_returns_everything(self):
+        response = self.client.get('/api/v1/notes/', {'search': '"*'})
+        self.assertEqual(response.data['count'], 3)
@@ -0,0 +1,221 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from . import shards
+from .models import ChecklistItem, Label, Note, ShardAssignment, Tombstone
+
+SHARD = 'shard_1'
+SHARDS = ['default', SHARD]
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Шард — отдельный файл SQLite рядом с тестовой базой')
+class ShardTests(TransactionTestCase):
+    """
+    Второй шард — файл SQLite со схемой из migrate --database shard_1:
+    схема собирается один раз, каждый тест получает свою копию.
+    """
+
+    @classmethod
+    def connect(cls, path):
+        default = connections['default']
+        connections[SHARD] = type(default)({**default.settings_dict, 'NAME': path}, alias=SHARD)
+
+    @classmethod
+    def disconnect(cls):
+        connections[SHARD].close()
+        delattr(connections._connections, SHARD)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        cls.template = os.path.join(cls.directory, 'template.sqlite3')
+        cls.connect(cls.template)
+        try:
+            with override_settings(DATABASE_SHARDS=SHARDS):
+                call_command('migrate', database=SHARD, verbosity=0)
+        finally:
+            cls.disconnect()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        path = os.path.join(self.directory, f'{self._testMethodName}.sqlite3')
+        shutil.copy(self.template, path)
+        self.connect(path)
+        self.addCleanup(self.disconnect)
+        shard_settings = self.settings(DATABASE_SHARDS=SHARDS)
+        shard_settings.enable()
+        self.addCleanup(shard_settings.disable)
+        caches[settings.SYNC_CACHE_ALIAS].clear()
+
+    def create_user(self, username, shard):
+        user = User.objects.create_user(username=username, password='password')
+        ShardAssignment.objects.filter(user=user).update(shard=shard)
+        shards.forget(user.pk)
+        return user
+
+    def api(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def test_hash_is_stable(self):
+        two = {user_id: shards.hashed(user_id, SHARDS) for user_id in range(1, 1001)}
+        self.assertEqual(two, {user_id: shards.hashed(user_id, SHARDS) for user_id in range(1, 1001)})
+        self.assertEqual(set(two.values()), set(SHARDS))
+        # Новый шард забирает пользователей только себе, остальные остаются на месте
+        three = {user_id: shards.hashed(user_id, [*SHARDS, 'shard_2']) for user_id in two}
+        moved = [user_id for user_id in two if three[user_id] != two[user_id]]
+        self.assertTrue(all(three[user_id] == 'shard_2' for user_id in moved))
+        self.assertLess(len(moved), 500)
+
+    def test_new_user_assigned(self):
+        user = User.objects.create_user(username='new', password='password')
+        self.assertEqual(ShardAssignment.objects.get(user=user).shard, shards.hashed(user.pk))
+        self.assertEqual(shards.placement(user.pk), (shards.hashed(user.pk), False))
+
+    def test_api_uses_user_shard(self):
+        user = self.create_user('sharded', SHARD)
+        client = self.api(user)
+        label = client.post('/api/v1/labels/', {'name': 'Работа'}, format='json').data
+        response = client.post('/api/v1/notes/', {
+            'title': 'Квартальный отчет', 'label_ids': [label['id']],
+            'checklist_items': [{'text': 'Собрать цифры'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        note = Note.objects.using(SHARD).get(pk=response.data['id'])
+        self.assertGreaterEqual(note.pk, shards.ID_STEP)
+        self.assertEqual(list(note.labels.values_list('name', flat=True)), ['Работа'])
+        self.assertEqual(note.checklist_items.get().text, 'Собрать цифры')
+        self.assertFalse(Note.objects.using('default').exists())
+
+        self.assertEqual([item['id'] for item in client.get('/api/v1/notes/').data['results']], [note.pk])
+        found = client.get('/api/v1/notes/', {'search': 'отчет'}).data['results']
+        self.assertEqual([item['id'] for item in found], [note.pk])
+        response = client.delete(f'/api/v1/notes/{note.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(Tombstone.objects.using(SHARD).filter(user=user, object_id=note.pk).exists())
+
+    def test_session_views_and_background_tasks(self):
+        user = self.create_user('session', SHARD)
+        # Без выбранного шарда база берется по пользователю (подсказка instance)
+        user.notes.create(title="В шарде")
+        user.notes.create(title="В корзине", is_trashed=True)
+        self.assertEqual(Note.objects.using(SHARD).count(), 2)
+
+        self.client.login(username='session', password='password')
+        response = self.client.get(reverse('index'))
+        self.assertEqual([note.title for note in response.context['notes']], ["В шарде"])
+
+        # Очистка корзины идет фоновой задачей — в базе того же шарда
+        self.client.post('/api/v1/notes/empty_trash/')
+        self.assertEqual(list(Note.objects.using(SHARD).values_list('title', flat=True)), ["В шарде"])
+
+    def test_writes_rejected_while_moving(self):
+        user = self.create_user('moving', SHARD)
+        ShardAssignment.objects.filter(user=user).update(moving=True)
+        shards.forget(user.pk)
+        client = self.api(user)
+        response = client.post('/api/v1/notes/', {'title': 'Новая'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(shards.RETRY_AFTER))
+        self.assertEqual(client.get('/api/v1/notes/').status_code, 200)
+
+        self.client.login(username='moving', password='password')
+        self.assertEqual(self.client.post(reverse('delete_account')).status_code, 503)
+
+    def test_rebalance_keeps_ids_and_timestamps(self):
+        user = self.create_user('legacy', SHARD)
+        ShardAssignment.objects.filter(user=user).delete()
+        shards.forget(user.pk)
+        # Пользователь, созданный до включения шардов: данные в 'default'
+        label = Label.objects.create(user=user, name="Дом")
+        note = Note.objects.create(user=user, title="Старая")
+        note.labels.add(label)
+        ChecklistItem.objects.create(note=note, text="Пункт")
+        Tombstone.objects.create(user=user, kind=Tombstone.KIND_NOTE, object_id=12345)
+        created_at = timezone.now() - timedelta(days=30)
+        Note.objects.filter(pk=note.pk).update(created_at=created_at, updated_at=created_at)
+
+        out = StringIO()
+        call_command('rebalance_shards', '--user', str(user.pk), '--to', SHARD, '--grace', '0', stdout=out)
+        self.assertIn(f'default → {SHARD}', out.getvalue())
+
+        self.assertEqual(shards.placement(user.pk), (SHARD, False))
+        moved = Note.objects.using(SHARD).get(pk=note.pk)
+        self.assertEqual((moved.created_at, moved.updated_at), (created_at, created_at))
+        self.assertEqual(list(moved.labels.values_list('pk', flat=True)), [label.pk])
+        self.assertEqual(moved.checklist_items.get().text, "Пункт")
+        self.assertTrue(Tombstone.objects.using(SHARD).filter(object_id=12345).exists())
+        for model in (Note, Label, ChecklistItem, Tombstone, Note.labels.through):
+            self.assertFalse(model.objects.using('default').exists(), model)
+
+        client = self.api(user)
+        found = client.get('/api/v1/notes/', {'search': 'Старая'}).data['results']
+        self.assertEqual([item['id'] for item in found], [note.pk])
+        # Новые строки — в диапазоне ID шарда
+        self.assertGreaterEqual(client.post('/api/v1/notes/', {'title': 'Новая'}, format='json').data['id'], shards.ID_STEP)
+
+    def test_rebalance_back_keeps_sequences(self):
+        user = self.create_user('back', SHARD)
+        note_id = self.api(user).post('/api/v1/notes/', {'title': 'Из шарда'}, format='json').data['id']
+
+        call_command('rebalance_shards', '--user', str(user.pk), '--to', 'default', '--grace', '0', stdout=StringIO())
+        self.assertEqual(Note.objects.using('default').get().pk, note_id)
+        self.assertFalse(Note.objects.using(SHARD).exists())
+        # Следующий ID в 'default' был бы из диапазона shard_1: таблица получила новый диапазон,
+        # не тот, с которого начнет добавленный потом shard_2
+        other = self.create_user('other', 'default')
+        other_id = self.api(other).post('/api/v1/notes/', {'title': 'Своя'}, format='json').data['id']
+        self.assertEqual(other_id // shards.ID_STEP, shards.MAX_SHARDS)
+        neighbour = self.create_user('neighbour', SHARD)
+        neighbour_id = self.api(neighbour).post('/api/v1/notes/', {'title': 'Соседа'}, format='json').data['id']
+        self.assertEqual(neighbour_id // shards.ID_STEP, 1)
+        self.assertGreater(neighbour_id, note_id)
+
+        # Добавляем shard_2: его ID не совпадают с выданными в 'default', перенос проходит
+        path = os.path.join(self.directory, f'{self._testMethodName}_2.sqlite3')
+        shutil.copy(self.template, path)
+        default = connections['default']
+        connections['shard_2'] = type(default)({**default.settings_dict, 'NAME': path}, alias='shard_2')
+        self.addCleanup(lambda: (connections['shard_2'].close(), delattr(connections._connections, 'shard_2')))
+        with self.settings(DATABASE_SHARDS=[*SHARDS, 'shard_2']):
+            shards.prepare_shard(None, using='shard_2')
+            newcomer = self.create_user('newcomer', 'shard_2')
+            newcomer_id = self.api(newcomer).post('/api/v1/notes/', {'title': 'Новичка'}, format='json').data['id']
+            self.assertEqual(newcomer_id // shards.ID_STEP, 2)
+            call_command('rebalance_shards', '--user', str(newcomer.pk), '--to', 'default', '--grace', '0', stdout=StringIO())
+        self.assertEqual(set(Note.objects.using('default').values_list('pk', flat=True)), {note_id, other_id, newcomer_id})
+
+    def test_rebalance_auto(self):
+        users = [self.create_user(f'user{index}', 'default') for index in range(6)]
+        expected = {user.pk: shards.hashed(user.pk) for user in users}
+        call_command('rebalance_shards', '--auto', '--grace', '0', stdout=StringIO())
+        self.assertEqual({user.pk: shards.placement(user.pk)[0] for user in users}, expected)
+
+    def test_purge_trash_all_shards(self):
+        old = timezone.now() - timedelta(days=30)
+        for username, shard in (('first', 'default'), ('second', SHARD)):
+            user = self.create_user(username, shard)
+            user.notes.create(title="Старая", is_trashed=True, trashed_at=old)
+        call_command('purge_trash', stdout=StringIO())
+        self.assertEqual(shards.count(Note.objects.all()), 0)
+        self.assertEqual(Tombstone.objects.using(SHARD).count(), 1)
@@ -0,0 +1,70 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from . import sidebar
+from .models import Note, Label
+
+class SidebarLabelsTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['shared'].clear()
+        self.user = User.objects.create_user(username='sidebar', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.work = Label.objects.create(user=self.user, name="Work")
+        self.home = Label.objects.create(user=self.user, name="Home")
+        active = Note.objects.create(user=self.user, title="Active")
+        archived = Note.objects.create(user=self.user, title="Archived", is_archived=True)
+        active.labels.add(self.work)
+        archived.labels.add(self.work, self.home)
+
+    def test_labels_with_active_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            labels = sidebar.get_labels(self.user.pk)
+        self.assertEqual(labels, [
+            {'id': self.home.id, 'name': 'Home', 'note_count': 0},
+            {'id': self.work.id, 'name': 'Work', 'note_count': 1},
+        ])
+        with self.assertNumQueries(0):
+            self.assertEqual(sidebar.get_labels(self.user.pk), labels)
+
+    def test_page_render_does_not_query_labels(self):
+        client = Client()
+        client.force_login(self.user)
+        def sidebar_queries(queries):
+            return [query for query in queries.captured_queries if '"note_count"' in query['sql']]
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('trash'))
+        self.assertEqual(len(sidebar_queries(queries)), 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('trash'))
+        self.assertEqual(sidebar_queries(queries), [])
+        self.assertContains(response, 'data-label-id="%d"' % self.work.id)
+
+    def test_api_changes_invalidate(self):
+        sidebar.get_labels(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/v1/labels/{self.work.id}/', {'name': 'Office'}, format='json')
+        self.assertEqual([label['name'] for label in sidebar.get_labels(self.user.pk)], ['Home', 'Office'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/v1/labels/{self.home.id}/')
+        self.assertEqual([label['name'] for label in sidebar.get_labels(self.user.pk)], ['Office'])
+
+        note = Note.objects.get(title="Active")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/notes/{note.id}/archive/')
+        self.assertEqual(sidebar.get_labels(self.user.pk)[0]['note_count'], 0)
+
+    def test_orm_changes_invalidate(self):
+        sidebar.get_labels(self.user.pk)
+        Label.objects.create(user=self.user, name="Ideas")
+        self.assertEqual(len(sidebar.get_labels(self.user.pk)), 3)
+        Note.objects.create(user=self.user, title="New").labels.add(self.home)
+        self.assertEqual(sidebar.get_labels(self.user.pk)[0]['note_count'], 1)
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
+from django.test import SimpleTestCase, override_settings
+from . import sqlite_tuning
+
+PRAGMAS = {**settings.SQLITE_PRAGMAS, 'busy_timeout': 50}
+
+
+@skipUnless(connection.vendor == 'sqlite' and settings.SQLITE_TUNING, 'Профиль SQLite')
+@override_settings(SQLITE_PRAGMAS=PRAGMAS, SQLITE_LOCK_RETRIES=3)
+class SQLiteTuningTests(SimpleTestCase):
+    """Проверяется на отдельной файловой базе: тестовая база в памяти, в ней нет WAL и конкуренции."""
+    alias = 'tuning'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tuning.sqlite3')
+        default = connections['default']
+        wrapper = type(default)({**default.settings_dict, 'NAME': self.path}, alias=self.alias)
+        connections[self.alias] = wrapper
+        self.addCleanup(delattr, connections._connections, self.alias)
+        self.addCleanup(wrapper.close)
+        self.connection = wrapper
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (value INTEGER)')
+            cursor.execute('INSERT INTO counter VALUES (0)')
+
+    def other(self):
+        # Второй "воркер": свое соединение без ожидания блокировки
+        db = sqlite3.connect(self.path, timeout=0, isolation_level=None, check_same_thread=False)
+        self.addCleanup(db.close)
+        return db
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def increment(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('UPDATE counter SET value = value + 1')
+        return 'ok'
+
+    def test_pragmas(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('busy_timeout'), 50)
+        self.assertEqual(self.pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_immediate_transactions(self):
+        other = self.other()
+        with transaction.atomic(using=self.alias):
+            # Блокировка записи взята уже при BEGIN, до первой записи
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+            # WAL: чтение другим соединением не ждет писателя
+            self.assertEqual(other.execute('SELECT value FROM counter').fetchone(), (0,))
+
+    def test_retry_until_lock_released(self):
+        other = self.other()
+        other.execute('BEGIN IMMEDIATE')
+        threading.Timer(0.15, other.execute, ['COMMIT']).start()
+
+        body = mock.Mock(side_effect=self.increment)
+        with self.assertLogs('todo_sql.sqlite_tuning', 'WARNING'):
+            result = sqlite_tuning.write_transaction(body, using=self.alias)()
+        self.assertEqual(result, 'ok')
+        body.assert_called_once_with()
+        self.assertEqual(other.execute('SELECT value FROM counter').fetchone(), (1,))
+
+    def test_retries_are_bounded(self):
+        other = self.other()
+        other.execute('BEGIN IMMEDIATE')
+        self.addCleanup(other.execute, 'ROLLBACK')
+
+        body = mock.Mock(side_effect=self.increment)
+        with mock.patch.object(sqlite_tuning.time, 'sleep') as sleep, self.assertLogs('todo_sql.sqlite_tuning', 'WARNING'):
+            with self.assertRaisesMessage(OperationalError, 'database is locked'):
+                sqlite_tuning.write_transaction(body, using=self.alias, retries=2)()
+        self.assertEqual(sleep.call_count, 2)
+        body.assert_not_called()
+
+    def test_errors_in_body_are_not_retried(self):
+        body = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            sqlite_tuning.write_transaction(body, using=self.alias)()
+        body.assert_called_once_with()
+
+    def test_inside_transaction(self):
+        body = mock.Mock(side_effect=self.increment)
+        with transaction.atomic(using=self.alias):
+            sqlite_tuning.write_transaction(body, using=self.alias)()
+            self.assertTrue(self.connection.in_atomic_block)
+        body.assert_called_once_with()
@@ -0,0 +1,81 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from .models import Note, Label, ChecklistItem
+from . import summaries
+
+class CardSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='summary', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.work = Label.objects.create(user=self.user, name="Work")
+        self.home = Label.objects.create(user=self.user, name="Home")
+
+    def summary(self, note):
+        note = Note.objects.get(pk=note.pk)
+        return note.label_summary, note.checklist_total, note.checklist_checked, [item['text'] for item in note.checklist_preview]
+
+    def test_content_preview(self):
+        note = Note.objects.create(user=self.user, content='x' * 500)
+        self.assertEqual(note.content_preview, 'x' * 299 + '…')
+        note.content = 'short'
+        note.save(update_fields=['content'])
+        self.assertEqual(Note.objects.get(pk=note.pk).content_preview, 'short')
+
+    def test_create_and_update_through_api(self):
+        response = self.client.post('/api/v1/notes/', {
+            'title': 'List', 'is_checklist': True, 'label_ids': [self.work.id, self.home.id],
+            'checklist_items': [{'text': f'Item {i}', 'order': i, 'is_checked': i == 0} for i in range(7)],
+        }, format='json')
+        note = Note.objects.get(pk=response.data['id'])
+        self.assertEqual(self.summary(note), (
+            [{'id': self.home.id, 'name': 'Home'}, {'id': self.work.id, 'name': 'Work'}],
+            7, 1, [f'Item {i}' for i in range(5)],
+        ))
+        self.assertEqual((response.data['checklist_total'], response.data['checklist_checked']), (7, 1))
+
+        items = response.data['checklist_items']
+        self.client.patch(f'/api/v1/notes/{note.id}/', {
+            'label_ids': [self.work.id],
+            'checklist_items': [{**items[1], 'is_checked': True}, {'text': 'New', 'order': 0}],
+        }, format='json')
+        self.assertEqual(self.summary(note), ([{'id': self.work.id, 'name': 'Work'}], 2, 1, ['New', 'Item 1']))
+
+    def test_item_endpoints(self):
+        note = Note.objects.create(user=self.user, is_checklist=True)
+        response = self.client.post('/api/v1/checklist-items/', {'note': note.id, 'text': 'Milk', 'order': 0}, format='json')
+        item_id = response.data['id']
+        self.client.patch(f'/api/v1/checklist-items/{item_id}/', {'is_checked': True}, format='json')
+        self.assertEqual(self.summary(note), ([], 1, 1, ['Milk']))
+        self.client.delete(f'/api/v1/checklist-items/{item_id}/')
+        self.assertEqual(self.summary(note), ([], 0, 0, []))
+
+    def test_label_rename_and_delete(self):
+        note = Note.objects.create(user=self.user)
+        note.labels.add(self.work)
+        self.client.patch(f'/api/v1/labels/{self.work.id}/', {'name': 'Office'}, format='json')
+        self.assertEqual(self.summary(note)[0], [{'id': self.work.id, 'name': 'Office'}])
+        self.client.delete(f'/api/v1/labels/{self.work.id}/')
+        self.assertEqual(self.summary(note)[0], [])
+
+    def test_reverse_relation_changes(self):
+        notes = [Note.objects.create(user=self.user) for _ in range(2)]
+        self.home.notes.add(*notes)
+        self.assertEqual(self.summary(notes[1])[0], [{'id': self.home.id, 'name': 'Home'}])
+        self.home.notes.clear()
+        self.assertEqual(self.summary(notes[1])[0], [])
+
+    def test_bulk_label_actions(self):
+        notes = [Note.objects.create(user=self.user, title=f'N{i}') for i in range(3)]
+        ids = [note.id for note in notes]
+        self.client.post('/api/v1/notes/bulk/', {'action': 'add_label', 'label_id': self.home.id, 'ids': ids}, format='json')
+        self.assertEqual(self.summary(notes[2])[0], [{'id': self.home.id, 'name': 'Home'}])
+        self.client.post('/api/v1/notes/bulk/', {'action': 'remove_label', 'label_id': self.home.id, 'ids': ids[:2]}, format='json')
+        self.assertEqual([self.summary(note)[0] for note in notes], [[], [], [{'id': self.home.id, 'name': 'Home'}]])
+
+    def test_refresh_matches_relations(self):
+        note = Note.objects.create(user=self.user)
+        ChecklistItem.objects.bulk_create([ChecklistItem(note=note, text=f'I{i}', order=9 - i) for i in range(9)])
+        summaries.refresh([note.id])
+        self.assertEqual(self.summary(note), ([], 9, 0, ['I8', 'I7', 'I6', 'I5', 'I4']))
@@ -0,0 +1,166 @@
+import base64
+import json
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note, Label, ChecklistItem, Tombstone
+from . import sync
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='syncer', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title="Old", is_checklist=True)
+        self.item = ChecklistItem.objects.create(note=self.note, text="Item", order=0)
+        self.label = Label.objects.create(user=self.user, name="Work")
+
+    def cursor_in_past(self, seconds=60):
+        return sync.encode_cursor(timezone.now() - timedelta(seconds=seconds))
+
+    def test_bootstrap_returns_only_cursor(self):
+        response = self.client.get('/api/v1/notes/changes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['cursor'])
+        self.assertEqual(response.data['notes'], [])
+
+    def test_unchanged_objects_are_not_returned(self):
+        Note.objects.filter(pk=self.note.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        ChecklistItem.objects.filter(pk=self.item.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        Label.objects.filter(pk=self.label.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        response = self.client.get('/api/v1/notes/changes/', {'cursor': self.cursor_in_past()})
+        self.assertEqual(response.data['notes'], [])
+        self.assertEqual(response.data['labels'], [])
+        self.assertEqual(response.data['checklist_items'], [])
+
+    def test_changed_objects_are_returned(self):
+        foreign = Note.objects.create(user=self.other, title="Foreign")
+        response = self.client.get('/api/v1/notes/changes/', {'cursor': self.cursor_in_past()})
+        self.assertEqual([n['id'] for n in response.data['notes']], [self.note.id])
+        self.assertNotIn(foreign.id, [n['id'] for n in response.data['notes']])
+        self.assertEqual([l['id'] for l in response.data['labels']], [self.label.id])
+        self.assertEqual([i['id'] for i in response.data['checklist_items']], [self.item.id])
+
+    def test_item_change_marks_note_as_changed(self):
+        Note.objects.filter(pk=self.note.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        cursor = self.cursor_in_past()
+        self.client.patch(f'/api/v1/checklist-items/{self.item.id}/', {'is_checked': True}, format='json')
+        response = self.client.get('/api/v1/notes/changes/', {'cursor': cursor})
+        self.assertEqual([n['id'] for n in response.data['notes']], [self.note.id])
+        self.assertTrue(response.data['notes'][0]['checklist_items'][0]['is_checked'])
+
+    def test_hard_deletes_produce_tombstones(self):
+        cursor = self.cursor_in_past()
+        trashed = Note.objects.create(user=self.user, title="Trashed", is_trashed=True)
+
+        self.client.delete(f'/api/v1/checklist-items/{self.item.id}/')
+        self.client.delete(f'/api/v1/labels/{self.label.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            # Очистка корзины идет в фоне после коммита (purge.py)
+            self.client.post('/api/v1/notes/empty_trash/')
+        self.client.delete(f'/api/v1/notes/{self.note.id}/')
+
+        response = self.client.get('/api/v1/notes/changes/', {'cursor': cursor})
+        deleted = response.data['deleted']
+        self.assertCountEqual(deleted['notes'], [trashed.id, self.note.id])
+        self.assertEqual(deleted['labels'], [self.label.id])
+        self.assertEqual(deleted['checklist_items'], [self.item.id])
+
+    def test_nested_item_removal_produces_tombstone(self):
+        cursor = self.cursor_in_past()
+        self.client.patch(f'/api/v1/notes/{self.note.id}/', {'checklist_items': []}, format='json')
+        response = self.client.get('/api/v1/notes/changes/', {'cursor': cursor})
+        self.assertEqual(response.data['deleted']['checklist_items'], [self.item.id])
+
+    def test_tombstones_are_per_user(self):
+        Tombstone.objects.create(user=self.other, kind=Tombstone.KIND_NOTE, object_id=999)
+        response = self.client.get('/api/v1/notes/changes/', {'cursor': self.cursor_in_past()})
+        self.assertEqual(response.data['deleted']['notes'], [])
+
+    def test_stale_cursor_requests_reset(self):
+        cursor = sync.encode_cursor(timezone.now() - sync.TOMBSTONE_RETENTION - timedelta(days=1))
+        response = self.client.get('/api/v1/notes/changes/', {'cursor': cursor})
+        self.assertTrue(response.data['reset'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/notes/changes/', {'cursor': 'garbage!'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_naive_cursor_is_rejected(self):
+        cursor = base64.urlsafe_b64encode(json.dumps({'t': '2026-01-01T00:00:00'}).encode()).decode()
+        response = self.client.get('/api/v1/notes/changes/', {'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune_tombstones_command(self):
+        old = Tombstone.objects.create(user=self.user, kind=Tombstone.KIND_NOTE, object_id=1)
+        Tombstone.objects.filter(pk=old.pk).update(deleted_at=timezone.now() - sync.TOMBSTONE_RETENTION - timedelta(days=1))
+        fresh = Tombstone.objects.create(user=self.user, kind=Tombstone.KIND_NOTE, object_id=2)
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertEqual(list(Tombstone.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertIn('дн.: 1.', out.getvalue())
+
+class DataVersionTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = User.objects.create_user(username='versioned', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title="Note", is_checklist=True)
+        self.item = ChecklistItem.objects.create(note=self.note, text="Item", order=0)
+
+    def assert_bumps(self, method, url, data=None):
+        before = sync.get_version(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400)
+        self.assertGreater(sync.get_version(self.user.id), before)
+
+    def test_mutations_bump_version(self):
+        self.assert_bumps('post', f'/api/v1/notes/{self.note.id}/archive/')
+        self.assert_bumps('post', f'/api/v1/notes/{self.note.id}/pin/')
+        self.assert_bumps('post', '/api/v1/notes/reorder/', {'pinned_ids': [self.note.id], 'other_ids': []})
+        self.assert_bumps('patch', f'/api/v1/notes/{self.note.id}/', {
+            'checklist_items': [{'id': self.item.id, 'text': 'Changed', 'is_checked': True, 'order': 0}],
+        })
+        self.assert_bumps('post', '/api/v1/labels/', {'name': 'Work'})
+        self.assert_bumps('patch', f'/api/v1/checklist-items/{self.item.id}/', {'is_checked': False})
+
+    def test_check_updates_reads_only_cache(self):
+        version = sync.get_version(self.user.id)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/notes/check_updates/', {'version': version})
+        self.assertFalse(response.data['has_updates'])
+        self.assertEqual(response.data['version'], version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/notes/{self.note.id}/pin/')
+        response = self.client.get('/api/v1/notes/check_updates/', {'version': version})
+        self.assertTrue(response.data['has_updates'])
+        self.assertEqual(response.data['version'], version + 1)
+
+    def test_check_updates_by_last_sync(self):
+        sync.bump_version(self.user.id)
+        response = self.client.get('/api/v1/notes/check_updates/', {'last_sync': (timezone.now() - timedelta(minutes=1)).isoformat()})
+        self.assertTrue(response.data['has_updates'])
+        response = self.client.get('/api/v1/notes/check_updates/', {'last_sync': (timezone.now() + timedelta(seconds=1)).isoformat()})
+        self.assertFalse(response.data['has_updates'])
+
+    def test_lost_version_restarts_above_previous(self):
+        version = sync.bump_version(self.user.id)
+        caches['shared'].clear()
+        self.assertGreater(sync.get_version(self.user.id), version)
+
+    def test_poll_interval_backs_off_when_idle(self):
+        now = 1_000_000
+        self.assertEqual(sync.poll_interval(now - 10, now=now), 5)
+        self.assertEqual(sync.poll_interval(now - 300, now=now), 15)
+        self.assertEqual(sync.poll_interval(now - 86400, now=now), sync.MAX_POLL_INTERVAL)
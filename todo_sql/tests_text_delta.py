@@ -0,0 +1,92 @@
+from django.test import SimpleTestCase, TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from .models import Note, ChecklistItem
+from .serializers import EditConflict, NoteSerializer
+from . import search, text_delta
+
+class TextDeltaTests(SimpleTestCase):
+    def test_apply(self):
+        ops = text_delta.parse([[0, 0, '» '], [6, 11, 'мир'], [12, 13, '']])
+        self.assertEqual(text_delta.apply('Hello world!?', ops), '» Hello мир!')
+
+    def test_diff_roundtrip(self):
+        for old, new in [('', 'abc'), ('abc', ''), ('привет 🙂 мир', 'привет 🙃 мир'), ('aaa', 'aaaa'), ('same', 'same')]:
+            self.assertEqual(text_delta.apply(old, text_delta.parse(text_delta.diff(old, new))), new)
+        self.assertEqual(text_delta.diff('x' * 5000 + 'a' + 'y' * 5000, 'x' * 5000 + 'b' + 'y' * 5000), [[5000, 5001, 'b']])
+
+    def test_invalid(self):
+        for delta in ['abc', [[0, 1]], [[0, 'a', 'x']], [[True, 1, 'x']]]:
+            with self.assertRaises(text_delta.DeltaError):
+                text_delta.parse(delta)
+        for ops in [[(2, 1, '')], [(0, 10, '')], [(3, 4, ''), (1, 2, '')]]:
+            with self.assertRaises(text_delta.DeltaError):
+                text_delta.apply('abcde', ops)
+
+class ContentDeltaApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='delta', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.content = 'начало ' + 'текст ' * 2000 + 'конец'
+        self.note = Note.objects.create(user=self.user, title="Длинная", content=self.content, is_checklist=True)
+        ChecklistItem.objects.create(note=self.note, text="Пункт")
+        self.url = f'/api/v1/notes/{self.note.id}/'
+        self.version = self.client.get(self.url).data['updated_at']
+
+    def patch(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(self.url, data, format='json')
+
+    def test_delta_applied(self):
+        delta = text_delta.diff(self.content, self.content.replace('конец', 'финал'))
+        response = self.patch({'content_delta': delta, 'base_updated_at': self.version})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'id', 'updated_at', 'content_length'})
+        self.assertNotEqual(response.data['updated_at'], self.version)
+
+        self.note.refresh_from_db()
+        self.assertTrue(self.note.content.endswith('финал'))
+        self.assertEqual(response.data['content_length'], len(self.note.content))
+        # Пункты не переданы — не тронуты; индекс обновлен
+        self.assertEqual(self.note.checklist_items.count(), 1)
+        self.assertEqual(list(search.filter_notes(Note.objects.all(), 'финал')), [self.note])
+
+        # Следующая дельта — от новой версии
+        response = self.patch({'content_delta': [[0, 6, 'старт']], 'base_updated_at': response.data['updated_at']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.note.refresh_from_db()
+        self.assertTrue(self.note.content.startswith('старт '))
+
+    def test_stale_base_conflict(self):
+        self.patch({'title': 'Переименована'})
+        response = self.patch({'content_delta': [[0, 0, 'x']], 'base_updated_at': self.version})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn('updated_at', response.data)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, self.content)
+
+    def test_base_version_for_field_updates(self):
+        response = self.patch({'title': 'Новое', 'base_updated_at': self.version})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.patch({'title': 'Еще новее', 'base_updated_at': self.version})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.title, 'Новое')
+
+    def test_claim_is_atomic(self):
+        # Версия изменилась между проверкой в validate() и записью
+        serializer = NoteSerializer(self.note, data={'title': 'A', 'base_updated_at': self.version}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        Note.objects.filter(pk=self.note.pk).update(title='B', updated_at=self.note.updated_at.replace(year=2030))
+        with self.assertRaises(EditConflict):
+            serializer.save()
+        self.assertEqual(Note.objects.get(pk=self.note.pk).title, 'B')
+
+    def test_invalid_delta(self):
+        self.assertEqual(self.patch({'content_delta': [[0, 0, 'x']]}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.patch({'content_delta': [[0, 10 ** 6, '']], 'base_updated_at': self.version})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.patch({'content': 'x', 'content_delta': [], 'base_updated_at': self.version})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,65 @@
+"""
+Дельта текста заметки для PATCH длинных заметок.
+
+Дельта — список замен [start, end, text] относительно базовой версии текста:
+фрагмент base[start:end] заменяется на text. Диапазоны идут по возрастанию и
+не пересекаются, позиции — в символах Unicode (code points, как индексы str
+в Python; в JS — Array.from(text)). Вставка — [pos, pos, "..."], удаление —
+[start, end, ""].
+
+Клиент шлет только измененные фрагменты, сервер собирает новый текст за один
+проход. Какой версии соответствует база, проверяет NoteSerializer по
+base_updated_at.
+"""
+
+MAX_OPS = 1000
+
+
+class DeltaError(ValueError):
+    pass
+
+
+def parse(delta):
+    """Проверяет форму дельты из JSON и возвращает список кортежей (start, end, text)."""
+    if not isinstance(delta, list):
+        raise DeltaError('Ожидается список замен [start, end, text].')
+    if len(delta) > MAX_OPS:
+        raise DeltaError(f'Не больше {MAX_OPS} замен за раз.')
+    ops = []
+    for op in delta:
+        if not (
+            isinstance(op, list) and len(op) == 3
+            and all(isinstance(pos, int) and not isinstance(pos, bool) for pos in op[:2])
+            and isinstance(op[2], str)
+        ):
+            raise DeltaError('Каждая замена — [start, end, text] с целыми позициями.')
+        ops.append(tuple(op))
+    return ops
+
+
+def apply(text, ops):
+    """Собирает новый текст из базового и замен (см. parse)."""
+    parts = []
+    pos = 0
+    for start, end, insert in ops:
+        if start < pos or end < start or end > len(text):
+            raise DeltaError(f'Диапазон [{start}, {end}] вне текста или пересекается с предыдущим.')
+        parts.append(text[pos:start])
+        parts.append(insert)
+        pos = end
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+
+def diff(old, new):
+    """Минимальная дельта из одной замены: общие начало и конец не передаются."""
+    if old == new:
+        return []
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-suffix - 1] == new[-suffix - 1]:
+        suffix += 1
+    return [[prefix, len(old) - suffix, new[prefix:len(new) - suffix]]]
@@ -25,5 +25,7 @@ urlpatterns = [
     path('debug-panel/', views.debug_panel, name='debug_panel'),
 
     # API
+    path('api/v1/events/', views.note_events, name='note_events'),
+    path('api/v1/events/poll/', views.note_events_poll, name='note_events_poll'),
     path('api/v1/', include(router.urls)),
 ]
\ No newline at end of file
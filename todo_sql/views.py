@@ -4,12 +4,21 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
-from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.views.decorators.http import require_GET
+import asyncio
+import math
 import random
 
+from asgiref.sync import sync_to_async
+
+from . import accounts, push, search, shards, summaries, sync
+from .replicas import ReplicaReadMixin, replica_reads
 from .models import Note
+from .pagination import KeysetListMixin
 from .forms import UserRegistrationForm
 
 # ТИМЛИД: API для "живой" проверки занятости никнейма
@@ -41,21 +50,98 @@ def delete_account(request):
     if request.method == 'POST':
         user = request.user
         logout(request)
-        user.delete() # Каскадное удаление сотрет все заметки
+        # Аккаунт выключается сразу, данные удаляются в фоне пачками (accounts.py)
+        accounts.request_deletion(user)
         return redirect('login')
     return redirect('index')
 
 # ТИМЛИД: Дебаг панель только для админов (staff)
 @user_passes_test(lambda u: u.is_staff)
+@replica_reads
 def debug_panel(request):
     total_users = cache.get_or_set('debug_total_users', User.objects.count, 60)
-    total_notes = cache.get_or_set('debug_total_notes', Note.objects.count, 60)
+    # По всем шардам: в запросе выбрана только база самого администратора
+    total_notes = cache.get_or_set('debug_total_notes', lambda: shards.count(Note.objects.all()), 60)
     context = {
         'total_users': total_users,
         'total_notes': total_notes,
     }
     return render(request, 'debug_panel.html', context)
 
+# ТИМЛИД: Push-канал вместо опроса check_updates каждые 5 секунд.
+# SSE работает только под ASGI (config/asgi.py): под WSGI бесконечный поток занял бы воркер
+# целиком, поэтому там отвечаем 503 и клиент переходит на long-poll.
+SSE_RETRY_MS = 3000
+SSE_HEARTBEAT_SECONDS = 25
+LONG_POLL_TIMEOUT = 25
+
+def _release_connections():
+    # Проверка пользователя (request.auser) взяла соединение в потоке запроса, и
+    # вернулось бы оно только по request_finished — через всю жизнь потока событий.
+    # Внутри транзакции (тесты) соединение не трогаем.
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close()
+
+async def _event_stream(user_id):
+    broker = push.get_broker()
+    subscription = await broker.asubscribe(user_id)
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+            else:
+                yield push.format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+@require_GET
+async def note_events(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Требуется авторизация.'}, status=403)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'SSE доступен только под ASGI.'}, status=503)
+    await sync_to_async(_release_connections)()
+    response = StreamingHttpResponse(_event_stream(user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@require_GET
+async def note_events_poll(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Требуется авторизация.'}, status=403)
+    await sync_to_async(_release_connections)()
+
+    broker = push.get_broker()
+    # Подписываемся до чтения версии, чтобы не пропустить событие между ними
+    subscription = await broker.asubscribe(user.pk)
+    try:
+        version, changed_at = await sync_to_async(sync.get_state)(user.pk)
+        since = request.GET.get('since')
+        if since is None or since != str(version):
+            # Первый запрос или клиент отстал (в т.ч. пока переподключался к другому воркеру)
+            return JsonResponse({'changed': since is not None, 'version': version})
+        try:
+            timeout = float(request.GET.get('timeout', LONG_POLL_TIMEOUT))
+        except ValueError:
+            timeout = LONG_POLL_TIMEOUT
+        if not math.isfinite(timeout):
+            return JsonResponse({'detail': 'Некорректный timeout.'}, status=400)
+        timeout = min(max(timeout, 1), LONG_POLL_TIMEOUT)
+        try:
+            event = await asyncio.wait_for(subscription.get(), timeout)
+        except asyncio.TimeoutError:
+            return JsonResponse({'changed': False, 'version': version})
+        return JsonResponse({'changed': True, 'version': event.get('version', version)})
+    finally:
+        broker.unsubscribe(subscription)
+
 def register(request):
     if request.method == 'POST':
         form = UserRegistrationForm(request.POST)
@@ -68,18 +154,22 @@ def register(request):
         form = UserRegistrationForm()
     return render(request, 'registration/register.html', {'form': form})
 
-class NoteListView(LoginRequiredMixin, ListView):
+# ТИМЛИД: Все списки листаются по курсору (см. pagination.py) и сортируются так же,
+# как NoteViewSet, поэтому курсор из API подходит и для HTML-страниц.
+class NoteListView(LoginRequiredMixin, ReplicaReadMixin, KeysetListMixin, ListView):
     model = Note
     template_name = 'index.html'
     context_object_name = 'notes'
-    paginate_by = 12
 
     def get_queryset(self):
         queryset = Note.objects.filter(user=self.request.user, is_archived=False, is_trashed=False)
+        queryset = summaries.for_cards(queryset)
         query = self.request.GET.get('q')
         if query:
-            queryset = queryset.filter(Q(title__icontains=query) | Q(content__icontains=query))
-        return queryset.prefetch_related('labels', 'checklist_items').order_by('-is_pinned', '-updated_at')
+            queryset = search.filter_notes(queryset, query)
+            if 'search_rank' in queryset.query.annotations:
+                return queryset.order_by('-search_rank', *Note._meta.ordering)
+        return queryset.order_by(*Note._meta.ordering)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -87,13 +177,13 @@ class NoteListView(LoginRequiredMixin, ListView):
         context['active_tab'] = 'notes'
         return context
 
-class ArchiveView(LoginRequiredMixin, ListView):
+class ArchiveView(LoginRequiredMixin, ReplicaReadMixin, KeysetListMixin, ListView):
     model = Note
     template_name = 'index.html'
     context_object_name = 'notes'
 
     def get_queryset(self):
-        return Note.objects.filter(user=self.request.user, is_archived=True, is_trashed=False).prefetch_related('labels', 'checklist_items').order_by('-updated_at')
+        return summaries.for_cards(Note.objects.filter(user=self.request.user, is_archived=True, is_trashed=False))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -101,13 +191,13 @@ class ArchiveView(LoginRequiredMixin, ListView):
         context['active_tab'] = 'archive'
         return context
 
-class TrashView(LoginRequiredMixin, ListView):
+class TrashView(LoginRequiredMixin, ReplicaReadMixin, KeysetListMixin, ListView):
     model = Note
     template_name = 'index.html'
     context_object_name = 'notes'
 
     def get_queryset(self):
-        return Note.objects.filter(user=self.request.user, is_trashed=True).prefetch_related('labels', 'checklist_items').order_by('-updated_at')
+        return summaries.for_cards(Note.objects.filter(user=self.request.user, is_trashed=True))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -115,15 +205,15 @@ class TrashView(LoginRequiredMixin, ListView):
         context['active_tab'] = 'trash'
         return context
 
-class RemindersView(LoginRequiredMixin, ListView):
+class RemindersView(LoginRequiredMixin, ReplicaReadMixin, KeysetListMixin, ListView):
     model = Note
     template_name = 'index.html'
     context_object_name = 'notes'
 
     def get_queryset(self):
-        return Note.objects.filter(
+        return summaries.for_cards(Note.objects.filter(
             user=self.request.user, reminder_date__isnull=False, is_archived=False, is_trashed=False
-        ).prefetch_related('labels', 'checklist_items').order_by('reminder_date')
+        )).order_by('reminder_date')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -131,14 +221,14 @@ class RemindersView(LoginRequiredMixin, ListView):
         context['active_tab'] = 'reminders'
         return context
 
-class LabelNoteView(LoginRequiredMixin, ListView):
+class LabelNoteView(LoginRequiredMixin, ReplicaReadMixin, KeysetListMixin, ListView):
     model = Note
     template_name = 'index.html'
     context_object_name = 'notes'
 
     def get_queryset(self):
         label_name = self.kwargs['label']
-        return Note.objects.filter(user=self.request.user, labels__name=label_name, is_archived=False, is_trashed=False).prefetch_related('labels', 'checklist_items').order_by('-updated_at')
+        return summaries.for_cards(Note.objects.filter(user=self.request.user, labels__name=label_name, is_archived=False, is_trashed=False))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)